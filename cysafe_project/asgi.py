@@ -5,6 +5,12 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+
+Serve the project through this module (e.g. ``uvicorn cysafe_project.asgi:application``)
+so the chatbot streaming endpoint ``/api/chatbot/stream/`` flushes each Server-Sent
+Event as it is generated instead of holding a worker for the whole Gemini reply, and
+the admin live activity stream ``/admin/live/stream/`` can stay open without tying up a
+thread (under WSGI the dashboards poll ``/admin/live/`` instead).
 """
 
 import os
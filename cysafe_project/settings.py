@@ -160,6 +160,9 @@ X_FRAME_OPTIONS = 'DENY'
 SECURE_HSTS_SECONDS = 31536000
 SECURE_HSTS_INCLUDE_SUBDOMAINS = True
 SECURE_HSTS_PRELOAD = True
+# Reverse proxies in front of the app that append to X-Forwarded-For (e.g. 1 behind nginx);
+# with 0 the client IP used for rate limits and logs is REMOTE_ADDR
+TRUSTED_PROXY_COUNT = config('TRUSTED_PROXY_COUNT', default=0, cast=int)
 
 # Session Settings
 SESSION_COOKIE_SECURE = not DEBUG
@@ -186,6 +189,59 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Chatbot Settings
+CHATBOT_CACHE_TTL = config('CHATBOT_CACHE_TTL', default=3600, cast=int)  # seconds
+CHATBOT_CACHE_MAX_CHARS = config('CHATBOT_CACHE_MAX_CHARS', default=2000000, cast=int)
+CHATBOT_GROUNDING_ENABLED = config('CHATBOT_GROUNDING_ENABLED', default=True, cast=bool)
+CHATBOT_GROUNDING_TOP_K = config('CHATBOT_GROUNDING_TOP_K', default=3, cast=int)
+CHATBOT_GROUNDING_REFRESH = config('CHATBOT_GROUNDING_REFRESH', default=300, cast=int)  # seconds
+CHATBOT_RATE_LIMIT_BURST = config('CHATBOT_RATE_LIMIT_BURST', default=5, cast=int)
+CHATBOT_RATE_LIMIT_REFILL = config('CHATBOT_RATE_LIMIT_REFILL', default=0.2, cast=float)  # tokens per second
+CHATBOT_MAX_CONCURRENT_UPSTREAM = config('CHATBOT_MAX_CONCURRENT_UPSTREAM', default=8, cast=int)
+# Alias from CACHES holding rate limit state; set it to a shared cache (e.g. Redis)
+# so limits hold across gunicorn workers. Empty keeps limits per process.
+CHATBOT_RATE_LIMIT_CACHE = config('CHATBOT_RATE_LIMIT_CACHE', default='') or None
+CHATBOT_HISTORY_TOKENS = config('CHATBOT_HISTORY_TOKENS', default=800, cast=int)  # recent turns kept verbatim
+CHATBOT_SUMMARY_TOKENS = config('CHATBOT_SUMMARY_TOKENS', default=300, cast=int)  # rolling summary of older turns
+CHATBOT_SESSION_TTL = config('CHATBOT_SESSION_TTL', default=86400, cast=int)  # seconds a chat session may sit idle
+# Override the Gemini API endpoint, e.g. http://127.0.0.1:8765 for `manage.py fake_gemini`
+CHATBOT_GEMINI_ENDPOINT = config('CHATBOT_GEMINI_ENDPOINT', default='')
+CHATBOT_UPSTREAM_TIMEOUT = config('CHATBOT_UPSTREAM_TIMEOUT', default=20, cast=float)  # seconds
+CHATBOT_BREAKER_THRESHOLD = config('CHATBOT_BREAKER_THRESHOLD', default=5, cast=int)
+CHATBOT_BREAKER_COOLDOWN = config('CHATBOT_BREAKER_COOLDOWN', default=30, cast=float)  # seconds
+CHATBOT_LOG_BUFFERED = config('CHATBOT_LOG_BUFFERED', default=True, cast=bool)
+CHATBOT_LOG_BATCH_SIZE = config('CHATBOT_LOG_BATCH_SIZE', default=50, cast=int)
+CHATBOT_LOG_FLUSH_INTERVAL = config('CHATBOT_LOG_FLUSH_INTERVAL', default=2.0, cast=float)  # seconds
+CHATBOT_LOG_MAX_QUEUE = config('CHATBOT_LOG_MAX_QUEUE', default=5000, cast=int)
+
+# Crime Catalog Settings
+CRIME_SUGGEST_REFRESH = config('CRIME_SUGGEST_REFRESH', default=300, cast=int)  # seconds
+# Catalog pages and fragments are keyed on a version bumped by crime edits; the timeout
+# only bounds how stale learn-more click counts get
+CATALOG_CACHE_TIMEOUT = config('CATALOG_CACHE_TIMEOUT', default=300, cast=int)  # seconds
+# The version lives in the database so every worker sees it whatever CACHES is; each worker
+# re-reads it at most this often, so edits reach other workers within this many seconds
+CATALOG_VERSION_POLL = config('CATALOG_VERSION_POLL', default=1.0, cast=float)  # seconds
+RELATED_CRIMES_COUNT = config('RELATED_CRIMES_COUNT', default=3, cast=int)  # shown on each crime page
+
+# Learn-more clicks are counted in memory and added to the database in bulk
+CRIME_CLICK_BUFFERED = config('CRIME_CLICK_BUFFERED', default=True, cast=bool)
+CRIME_CLICK_FLUSH_INTERVAL = config('CRIME_CLICK_FLUSH_INTERVAL', default=5.0, cast=float)  # seconds
+CRIME_CLICK_MAX_PENDING = config('CRIME_CLICK_MAX_PENDING', default=10000, cast=int)  # distinct crimes
+
+# Trending ranks crimes by views whose weight halves every TRENDING_HALF_LIFE_HOURS
+TRENDING_HALF_LIFE_HOURS = config('TRENDING_HALF_LIFE_HOURS', default=24.0, cast=float)
+TRENDING_REFRESH = config('TRENDING_REFRESH', default=300, cast=int)  # seconds
+TRENDING_TOP_K = config('TRENDING_TOP_K', default=20, cast=int)
+
+# Repeat clicks by the same visitor (IP and user agent) on the same crime within this many
+# seconds are ignored, per worker, using Bloom filters sized for the capacity; 0 turns it off
+UNIQUE_VIEW_DEDUP_WINDOW = config('UNIQUE_VIEW_DEDUP_WINDOW', default=300, cast=int)
+UNIQUE_VIEW_DEDUP_CAPACITY = config('UNIQUE_VIEW_DEDUP_CAPACITY', default=100000, cast=int)  # views per window
+
+# Live activity counts are added to shared per-minute database rows by each worker this often
+LIVE_ACTIVITY_FLUSH_INTERVAL = config('LIVE_ACTIVITY_FLUSH_INTERVAL', default=1.0, cast=float)  # seconds
+
 # Messages
 MESSAGE_STORAGE = 'django.contrib.messages.storage.session.SessionStorage'
 
@@ -206,6 +262,11 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        'main': {
+            'handlers': ['file'],
+            'level': 'INFO',
+            'propagate': True,
+        },
     },
 }
 
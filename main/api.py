@@ -0,0 +1,101 @@
+from django.utils.decorators import method_decorator
+from django.views.decorators.gzip import gzip_page
+from rest_framework import generics
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from .models import CyberCrime
+from .page_cache import catalog_cache
+from .pagination import keyset_paginate
+from .serializers import CrimeSerializer
+
+
+class CrimeCursorPagination(BasePagination):
+    """DRF wrapper around the listings' (created_at, id) keyset pagination"""
+    page_size = 50
+    max_page_size = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        try:
+            page_size = min(max(int(request.query_params.get('page_size', self.page_size)), 1), self.max_page_size)
+        except ValueError:
+            raise ValidationError({'page_size': 'Must be a whole number.'})
+        self.request = request
+        self.page = keyset_paginate(queryset, request, page_size)
+        return list(self.page)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self._link(self.page.next_query()) if self.page.has_next else None,
+            'previous': self._link(self.page.previous_query()) if self.page.has_previous else None,
+            'results': data,
+        })
+
+    def _link(self, query):
+        return self.request.build_absolute_uri(f'{self.request.path}?{query}')
+
+
+class CatalogAPIMixin:
+    """Public, read-only access with sparse fieldsets and responses cached per catalog version"""
+    serializer_class = CrimeSerializer
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def requested_fields(self):
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return None
+        fields = [name.strip() for name in fields.split(',') if name.strip()]
+        unknown = sorted(set(fields) - set(CrimeSerializer.COLUMNS))
+        if unknown:
+            raise ValidationError({'fields': f"Unknown fields: {', '.join(unknown)}"})
+        return fields
+
+    def get_queryset(self):
+        fields = self.requested_fields() or list(CrimeSerializer.COLUMNS)
+        # created_at and id are always needed for the cursor
+        columns = {'id', 'created_at'}.union(*(CrimeSerializer.COLUMNS[name] for name in fields))
+        crimes = CyberCrime.objects.only(*columns)
+        if 'prevention_tips' in fields or 'reporting_steps' in fields:
+            crimes = crimes.prefetch_related('guidance')
+        return crimes
+
+    def get_serializer(self, *args, **kwargs):
+        return super().get_serializer(*args, fields=self.requested_fields(), **kwargs)
+
+    def cached_response(self, build):
+        # The absolute URI covers filters, fields and cursor plus the scheme and host the
+        # next/previous links are built with; the catalog version covers admin edits
+        data = catalog_cache.get_or_set('api', lambda: build().data, self.request.build_absolute_uri())
+        return Response(data)
+
+
+@method_decorator(gzip_page, name='dispatch')
+class CrimeListAPIView(CatalogAPIMixin, generics.ListAPIView):
+    """GET /api/crimes/?category=&severity=&fields=&page_size=&cursor="""
+    pagination_class = CrimeCursorPagination
+
+    def get_queryset(self):
+        crimes = super().get_queryset()
+        for name, choices in (('category', CyberCrime.CATEGORY_CHOICES), ('severity', CyberCrime.SEVERITY_CHOICES)):
+            value = self.request.query_params.get(name)
+            if not value:
+                continue
+            if value not in dict(choices):
+                raise ValidationError({name: f"Must be one of: {', '.join(dict(choices))}"})
+            crimes = crimes.filter(**{name: value})
+        return crimes
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(lambda: super(CrimeListAPIView, self).list(request, *args, **kwargs))
+
+
+@method_decorator(gzip_page, name='dispatch')
+class CrimeDetailAPIView(CatalogAPIMixin, generics.RetrieveAPIView):
+    """GET /api/crimes/<id>/?fields="""
+    lookup_url_kwarg = 'crime_id'
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(lambda: super(CrimeDetailAPIView, self).retrieve(request, *args, **kwargs))
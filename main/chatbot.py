@@ -0,0 +1,283 @@
+import hashlib
+import json
+import re
+import threading
+import time
+
+import google.generativeai as genai
+from cachetools import TTLCache
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from google.ai import generativelanguage as glm
+
+from .retrieval import catalog_index
+
+
+def build_chatbot_prompt(system_prompt, user_message, context='', summary='', history=()):
+    """Build the full prompt sent to Gemini from the system prompt, catalog context,
+    earlier conversation (summary plus recent turns) and user text"""
+    parts = [system_prompt]
+    if context:
+        parts.append(
+            "Relevant entries from the CySafe cyber crime catalog (prefer these details when they answer the question):\n"
+            f"{context}"
+        )
+    if summary:
+        parts.append(f"Summary of earlier conversation:\n{summary}")
+    for turn in history:
+        parts.append(f"User: {turn['user']}\n\nAssistant: {turn['assistant']}")
+    parts.append(f"User: {user_message}\n\nAssistant:")
+    return '\n\n'.join(parts)
+
+
+def chatbot_error_message(error):
+    """Map an upstream Gemini error to a user-facing chatbot reply"""
+    if "429" in str(error) or "quota" in str(error).lower():
+        return 'I\'m currently experiencing high demand. Please wait a moment and try again, or contact support if this persists.'
+    elif "400" in str(error) or "invalid" in str(error).lower():
+        return 'I encountered an issue with your request. Please try rephrasing your question.'
+    return f'Sorry, I encountered an error: {str(error)}. Please try again or check the server logs.'
+
+
+def chunk_text(chunk):
+    """Get the text of a streamed Gemini chunk, or '' if it has no text parts"""
+    try:
+        return chunk.text or ''
+    except (ValueError, AttributeError):
+        # Chunks without parts (e.g. safety or finish metadata) raise on .text
+        return ''
+
+
+def sse_event(event, data):
+    """Format a single Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def normalize_chatbot_message(message):
+    """Normalize a user message for cache lookups (case, whitespace, punctuation)"""
+    message = re.sub(r'[^\w\s]', ' ', message.lower())
+    return ' '.join(message.split())
+
+
+class ChatbotResponseCache:
+    """Thread-safe LRU + TTL cache of chatbot replies for repeated questions.
+
+    Entries are keyed on the model, a hash of the system prompt and a hash of the
+    normalized user message, and the cache is bounded by the total number of
+    characters of cached replies rather than by entry count.
+    """
+
+    def __init__(self, max_chars, ttl):
+        self._cache = TTLCache(maxsize=max_chars, ttl=ttl, getsizeof=len)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model_id, system_prompt, user_message):
+        prompt_hash = hashlib.sha256(system_prompt.encode('utf-8')).hexdigest()
+        message_hash = hashlib.sha256(normalize_chatbot_message(user_message).encode('utf-8')).hexdigest()
+        return (model_id, prompt_hash, message_hash)
+
+    def get(self, key):
+        with self._lock:
+            response = self._cache.get(key)
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return response
+
+    def set(self, key, response):
+        if len(response) > self._cache.maxsize:
+            return
+        with self._lock:
+            self._cache[key] = response
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups * 100) if lookups else 0,
+                'entries': len(self._cache),
+            }
+
+
+response_cache = ChatbotResponseCache(
+    max_chars=settings.CHATBOT_CACHE_MAX_CHARS,
+    ttl=settings.CHATBOT_CACHE_TTL,
+)
+
+
+class GeminiClientRegistry:
+    """Process-wide registry of Gemini model handles keyed by API key and model.
+
+    genai.configure() drops the library's cached clients, so configuring it per
+    request rebuilds the gRPC client and channel every time. The registry builds one
+    GenerativeServiceClient per API key, binds it to a GenerativeModel per model id
+    and reuses both across requests and threads until the bot config changes.
+    """
+
+    def __init__(self):
+        self._clients = {}
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def get_model(self, api_key, model_id):
+        key = (api_key, model_id)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                client = self._clients.get(api_key)
+                if client is None:
+                    client = self._build_client(api_key)
+                    self._clients[api_key] = client
+
+                model = self._bind(genai.GenerativeModel(model_id), client)
+                self._models[key] = model
+            return model
+
+    @staticmethod
+    def _bind(model, client):
+        # GenerativeModel has no public way to take a client and otherwise picks up the
+        # global one lazily on first use. It keeps it in _client, an attribute of the
+        # google-generativeai version pinned in requirements.txt; fail loudly if that
+        # changes rather than quietly sending requests through an unconfigured client.
+        if getattr(model, '_client', False) is not None:
+            raise ImproperlyConfigured(
+                'This google-generativeai version does not keep its client in GenerativeModel._client; '
+                'install the version pinned in requirements.txt'
+            )
+        model._client = client
+        return model
+
+    @staticmethod
+    def _build_client(api_key):
+        if settings.CHATBOT_GEMINI_ENDPOINT:
+            # Alternate endpoints (e.g. the fake_gemini server) are plain HTTP, so use REST
+            return glm.GenerativeServiceClient(
+                transport='rest',
+                client_options={'api_key': api_key, 'api_endpoint': settings.CHATBOT_GEMINI_ENDPOINT},
+            )
+        return glm.GenerativeServiceClient(client_options={'api_key': api_key})
+
+    def clear(self):
+        # In-flight requests keep their own references; channels close once released
+        with self._lock:
+            self._clients.clear()
+            self._models.clear()
+
+
+gemini_clients = GeminiClientRegistry()
+
+
+class CircuitBreaker:
+    """Circuit breaker for upstream Gemini calls.
+
+    After `threshold` consecutive failures (errors, timeouts or 429s) the breaker
+    opens and allow() returns False for `cooldown` seconds, so requests can be
+    answered with an offline fallback instead of waiting on a failing upstream.
+    It then lets a single trial call through (half-open): success closes the
+    breaker, failure opens it again. A trial that never reports back stops
+    blocking new trials after another cooldown period.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.opened_at = None
+        self._trial_started_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                now = time.monotonic()
+                if self._trial_started_at is None or now - self._trial_started_at >= self.cooldown:
+                    self._trial_started_at = now
+                    return True
+            return False
+
+    def release_trial(self):
+        """Give back a call allowed by allow() that was never made, so the next request can try"""
+        with self._lock:
+            self._trial_started_at = None
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_started_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self._trial_started_at = None
+
+    def stats(self):
+        with self._lock:
+            retry_in = 0
+            if self.state == self.OPEN:
+                retry_in = max(0, round(self.cooldown - (time.monotonic() - self.opened_at)))
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'trips': self.trips,
+                'retry_in': retry_in,
+            }
+
+
+gemini_breaker = CircuitBreaker(
+    threshold=settings.CHATBOT_BREAKER_THRESHOLD,
+    cooldown=settings.CHATBOT_BREAKER_COOLDOWN,
+)
+
+
+def upstream_request_options():
+    """Request options giving every Gemini call an explicit deadline"""
+    return {'timeout': settings.CHATBOT_UPSTREAM_TIMEOUT}
+
+
+def offline_fallback_answer(system_prompt, user_message):
+    """Answer built from the crime catalog and official links while Gemini is unavailable"""
+    links = re.findall(r'https?://[^\s)]+', system_prompt) or [
+        'https://cybercrime.gov.in/',
+        'https://www.cert-in.org.in/',
+    ]
+    entries = catalog_index.search(user_message, limit=settings.CHATBOT_GROUNDING_TOP_K)
+
+    parts = ['The AI assistant is temporarily unavailable, so here is guidance from the CySafe catalog.']
+    if entries:
+        parts.append('**Related cyber crimes:**\n' + '\n'.join(entries))
+    parts.append(
+        '**Report cybercrime through official channels:**\n'
+        + '\n'.join(f'• {link}' for link in dict.fromkeys(links))
+        + '\n• Cyber fraud helpline: 1930'
+    )
+    return '\n\n'.join(parts)
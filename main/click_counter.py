@@ -0,0 +1,163 @@
+import atexit
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CyberCrime
+from .live import live_counters
+from .page_cache import catalog_cache
+from .trending import add_views, record_view_buckets
+from .viewers import HyperLogLog, RecentViews, record_viewers
+
+
+def crime_exists(crime_id):
+    """Whether crime_id is a crime, checked against the catalog's ids cached until the next edit"""
+    crime_ids = catalog_cache.get_or_set('crime-ids', lambda: frozenset(CyberCrime.objects.values_list('pk', flat=True)))
+    return crime_id in crime_ids
+
+
+class BufferedClickCounter:
+    """Accumulate learn-more clicks in memory and add them to the database in bulk.
+
+    increment() only bumps an in-process counter; a background thread flushes
+    the pending counts every flush_interval seconds (and at process exit) as
+    UPDATE ... SET learn_more_clicks = learn_more_clicks + n, one statement per
+    distinct n, which also adds the views to the crimes' trending scores,
+    hourly view buckets and daily unique viewer sketches. The database adds the increments itself, so concurrent
+    workers never lose clicks, and since no model is saved updated_at and the
+    catalog version stay put. At most max_pending crimes are tracked between flushes;
+    clicks for further crimes are dropped and counted.
+    """
+
+    def __init__(self, flush_interval, max_pending, enabled=True, recent_views=None):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.enabled = enabled
+        self.recent_views = recent_views
+        self.written = 0
+        self.dropped = 0
+        self.duplicates = 0
+        self._reset()
+        atexit.register(self.flush)
+
+    def _reset(self):
+        self._pending = Counter()
+        self._viewers = {}  # (crime_id, day) -> {HyperLogLog register: rank}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._pid = os.getpid()
+
+    def increment(self, crime_id, clicks=1, visitor=None):
+        """Count clicks for a crime; never touches the database while buffered.
+
+        visitor is a visitor_fingerprint() hash: it is added to the crime's
+        unique viewer sketch for today, and with recent_views set, a repeat
+        click on the same crime by the same visitor is not counted at all.
+        clicks=0 records only the visitor. Returns whether anything was counted.
+        """
+        viewers = {}
+        if visitor is not None:
+            if clicks and self.recent_views is not None and self.recent_views.seen(visitor, crime_id):
+                self.duplicates += 1
+                return False
+            index, rank = HyperLogLog.register_rank(visitor)
+            viewers = {(crime_id, timezone.localdate()): {index: rank}}
+        live_counters.add('clicks' if clicks else 'views', clicks or 1)
+
+        if not self.enabled:
+            self._write({crime_id: clicks}, viewers)
+            return True
+
+        # A forked worker inherits the parent's counts but not its flush thread
+        if os.getpid() != self._pid:
+            self._reset()
+
+        with self._lock:
+            if crime_id not in self._pending and len(self._pending) >= self.max_pending:
+                self.dropped += clicks
+                return False
+            self._pending[crime_id] += clicks
+            for key, ranks in viewers.items():
+                registers = self._viewers.setdefault(key, {})
+                for index, rank in ranks.items():
+                    if rank > registers.get(index, 0):
+                        registers[index] = rank
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='click-counter', daemon=True)
+                self._thread.start()
+        return True
+
+    def pending(self, crime_id):
+        """Clicks counted for a crime but not yet written"""
+        with self._lock:
+            return self._pending.get(crime_id, 0)
+
+    def flush(self):
+        """Add all pending clicks to the database"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, Counter()
+                viewers, self._viewers = self._viewers, {}
+            if pending:
+                self._write(pending, viewers)
+
+    def _write(self, pending, viewers):
+        now = timezone.now()
+        try:
+            # Crimes deleted since their clicks were counted would fail the view buckets' and sketches' foreign keys
+            existing = set()
+            crime_ids = list(pending)
+            for start in range(0, len(crime_ids), 500):
+                existing.update(CyberCrime.objects.filter(pk__in=crime_ids[start:start + 500]).values_list('pk', flat=True))
+            pending = {crime_id: clicks for crime_id, clicks in pending.items() if crime_id in existing}
+
+            by_count = defaultdict(list)
+            for crime_id, clicks in pending.items():
+                # Zero when only views were recorded
+                if clicks:
+                    by_count[clicks].append(crime_id)
+            with transaction.atomic():
+                for clicks, crime_ids in by_count.items():
+                    for start in range(0, len(crime_ids), 500):
+                        CyberCrime.objects.filter(pk__in=crime_ids[start:start + 500]).update(
+                            learn_more_clicks=F('learn_more_clicks') + clicks, **add_views(clicks, now)
+                        )
+                record_view_buckets({crime_id: clicks for crime_id, clicks in pending.items() if clicks}, now)
+                record_viewers({key: ranks for key, ranks in viewers.items() if key[0] in existing})
+            self.written += sum(pending.values())
+        except Exception as e:
+            print(f"Failed to write learn more clicks: {e}")
+            self.dropped += sum(pending.values())
+
+    def stats(self):
+        with self._lock:
+            queued = sum(self._pending.values())
+        return {
+            'queued': queued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'duplicates': self.duplicates,
+        }
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            close_old_connections()
+            self.flush()
+
+
+click_counter = BufferedClickCounter(
+    flush_interval=settings.CRIME_CLICK_FLUSH_INTERVAL,
+    max_pending=settings.CRIME_CLICK_MAX_PENDING,
+    enabled=settings.CRIME_CLICK_BUFFERED,
+    recent_views=RecentViews(
+        window=settings.UNIQUE_VIEW_DEDUP_WINDOW, capacity=settings.UNIQUE_VIEW_DEDUP_CAPACITY
+    ) if settings.UNIQUE_VIEW_DEDUP_WINDOW else None,
+)
@@ -0,0 +1,130 @@
+import atexit
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .live import live_counters
+from .metrics import apply_deltas, merge_deltas, rollup_deltas
+from .models import ChatbotConversation
+
+
+class BufferedConversationLogger:
+    """Queue chatbot conversation records in memory and write them in bulk.
+
+    Chat views call log() and return immediately; a background thread flushes
+    the queue with bulk_create once it reaches batch_size records or every
+    flush_interval seconds, and remaining records are flushed at process exit.
+    The queue is bounded: when it is full, new records are dropped and counted
+    so a slow or locked database never adds latency to the chat path.
+    Each written batch is also added to the hourly and daily metrics rollups;
+    if that fails, its counts are kept and retried with the next batch.
+    """
+
+    def __init__(self, batch_size, flush_interval, max_queue, enabled=True):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.enabled = enabled
+        self.written = 0
+        self.dropped = 0
+        self._pending_metrics = {}
+        self._metrics_lock = threading.Lock()
+        self._reset()
+        atexit.register(self.flush)
+
+    def _reset(self):
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = os.getpid()
+
+    def log(self, **fields):
+        """Queue one ChatbotConversation record; never touches the database"""
+        fields.setdefault('created_at', timezone.now())
+        conversation = ChatbotConversation(**fields)
+        live_counters.conversation(conversation.success)
+
+        if not self.enabled:
+            conversation.save()
+            self.written += 1
+            self._record_metrics([conversation])
+            return
+
+        # A forked worker inherits the parent's queue but not its flush thread
+        if os.getpid() != self._pid:
+            self._reset()
+
+        with self._lock:
+            if len(self._queue) >= self.max_queue:
+                self.dropped += 1
+                return
+            self._queue.append(conversation)
+            queued = len(self._queue)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='conversation-logger', daemon=True
+                )
+                self._thread.start()
+
+        if queued >= self.batch_size:
+            self._wake.set()
+
+    def flush(self):
+        """Write all queued records to the database"""
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                if not batch:
+                    return
+
+                try:
+                    ChatbotConversation.objects.bulk_create(batch)
+                    self.written += len(batch)
+                except Exception as e:
+                    print(f"Failed to write chatbot conversations: {e}")
+                    self.dropped += len(batch)
+                    return
+
+                self._record_metrics(batch)
+
+    def _record_metrics(self, conversations):
+        with self._metrics_lock:
+            merge_deltas(self._pending_metrics, rollup_deltas(conversations))
+            try:
+                apply_deltas(self._pending_metrics)
+            except Exception as e:
+                print(f"Failed to update chatbot metrics rollups, will retry: {e}")
+                return
+            self._pending_metrics = {}
+
+    def stats(self):
+        with self._lock:
+            queued = len(self._queue)
+        return {
+            'queued': queued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'metrics_pending': len(self._pending_metrics),
+        }
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            close_old_connections()
+            self.flush()
+
+
+conversation_logger = BufferedConversationLogger(
+    batch_size=settings.CHATBOT_LOG_BATCH_SIZE,
+    flush_interval=settings.CHATBOT_LOG_FLUSH_INTERVAL,
+    max_queue=settings.CHATBOT_LOG_MAX_QUEUE,
+    enabled=settings.CHATBOT_LOG_BUFFERED,
+)
@@ -0,0 +1,81 @@
+import json
+import uuid
+
+from django.db import transaction
+
+from .click_counter import click_counter, crime_exists
+from .live import live_counters
+from .metrics import record_widget_opens
+
+
+# Event type -> whether it names a crime
+EVENT_TYPES = {
+    'view': True,
+    'click': True,
+    'chatbot_open': False,
+}
+MAX_EVENTS = 100
+MAX_BODY_BYTES = 32 * 1024
+
+
+def parse_events(body):
+    """Validate a beacon batch ({"events": [...]} or a bare list).
+
+    Returns (events, errors); a batch with any error is rejected as a whole
+    so a client retry can never apply part of it twice.
+    """
+    if len(body) > MAX_BODY_BYTES:
+        return [], [f'Batch is larger than {MAX_BODY_BYTES} bytes']
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return [], ['Body is not valid JSON']
+    events = data.get('events') if isinstance(data, dict) else data
+    if not isinstance(events, list) or not events:
+        return [], ['Expected a non-empty list of events']
+    if len(events) > MAX_EVENTS:
+        return [], [f'At most {MAX_EVENTS} events per batch']
+
+    parsed = []
+    errors = []
+    for position, event in enumerate(events):
+        event_type = event.get('type') if isinstance(event, dict) else None
+        if event_type not in EVENT_TYPES:
+            errors.append(f"Event {position}: type must be one of {', '.join(EVENT_TYPES)}")
+            continue
+        crime_id = None
+        if EVENT_TYPES[event_type]:
+            try:
+                crime_id = uuid.UUID(str(event.get('crime_id')))
+            except ValueError:
+                errors.append(f'Event {position}: crime_id must be a crime UUID')
+                continue
+        parsed.append((event_type, crime_id))
+    return (parsed, []) if not errors else ([], errors)
+
+
+def apply_events(events, visitor):
+    """Record a validated batch; returns how many events were counted.
+
+    Clicks and views go to the buffered click counter, which writes them in
+    one transaction per flush; views only add the visitor to the crime's
+    unique viewer sketch, since the learn-more click that usually precedes
+    them is already counted. Clicks and views of ids that aren't crimes are
+    skipped. Chatbot opens are summed and written to the metrics rollups in
+    one transaction.
+    """
+    counted = 0
+    opens = 0
+    for event_type, crime_id in events:
+        if event_type == 'chatbot_open':
+            opens += 1
+            counted += 1
+        elif crime_exists(crime_id) and click_counter.increment(
+            crime_id, clicks=1 if event_type == 'click' else 0, visitor=visitor
+        ):
+            counted += 1
+    if opens:
+        live_counters.add('widget_opens', opens)
+        with transaction.atomic():
+            record_widget_opens(opens)
+    return counted
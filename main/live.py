@@ -0,0 +1,248 @@
+import asyncio
+import atexit
+import os
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+
+from .chatbot import sse_event
+from .models import AuditLog, LiveActivityMinute
+
+
+FAILURE_WINDOW_MINUTES = 15
+# Minute rows older than this are deleted; a dashboard open longer counts from this far back
+RETENTION_MINUTES = 24 * 60
+RECENT_AUDIT_EVENTS = 5
+# Stored minutes are re-read in full this often; in between only the last two minutes are
+FULL_RELOAD_SECONDS = 60
+
+
+def current_minute():
+    """Whole minutes since the Unix epoch"""
+    return int(time.time() // 60)
+
+
+class LiveCounters:
+    """Activity counts for the admin live activity strip, shared by every worker.
+
+    Views and loggers call add() as events happen, which only touches a dict
+    in memory; a background thread adds the counts to per-minute
+    LiveActivityMinute rows every flush_interval seconds with F() updates, so
+    dashboards see every worker's activity for at most one write per worker
+    per interval. Counts that fail to write are kept and retried.
+    """
+
+    NAMES = ('conversations', 'conversation_failures', 'clicks', 'views', 'widget_opens', 'audit_events')
+
+    def __init__(self, flush_interval=1.0):
+        self.flush_interval = flush_interval
+        self._reset()
+        atexit.register(self.flush)
+
+    def _reset(self):
+        self._pending = {}  # minute -> {name: count}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._pruned_at = None
+        self._pid = os.getpid()
+
+    def add(self, name, count=1):
+        if not count:
+            return
+        # A forked worker inherits the parent's counts but not its flush thread
+        if os.getpid() != self._pid:
+            self._reset()
+
+        with self._lock:
+            counts = self._pending.setdefault(current_minute(), {})
+            counts[name] = counts.get(name, 0) + count
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='live-activity', daemon=True)
+                self._thread.start()
+
+    def conversation(self, success):
+        """Count one logged chatbot conversation towards the totals and the failure rate"""
+        self.add('conversations')
+        if not success:
+            self.add('conversation_failures')
+
+    def pending(self):
+        """Counts added in this process that are not written yet, {minute: {name: count}}"""
+        if os.getpid() != self._pid:
+            return {}
+        with self._lock:
+            return {minute: dict(counts) for minute, counts in self._pending.items()}
+
+    def flush(self):
+        """Add the pending counts to their minute rows"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return
+
+            try:
+                self._write(pending)
+            except Exception as e:
+                print(f"Failed to write live activity counts, will retry: {e}")
+                with self._lock:
+                    for minute, counts in pending.items():
+                        merged = self._pending.setdefault(minute, {})
+                        for name, count in counts.items():
+                            merged[name] = merged.get(name, 0) + count
+                return
+
+            minute = current_minute()
+            if self._pruned_at != minute:
+                LiveActivityMinute.objects.filter(minute__lt=minute - RETENTION_MINUTES).delete()
+                self._pruned_at = minute
+
+    @staticmethod
+    def _write(pending):
+        with transaction.atomic():
+            for minute, counts in sorted(pending.items()):
+                rows = LiveActivityMinute.objects.filter(minute=minute)
+                changes = {name: F(name) + count for name, count in counts.items()}
+                if rows.update(**changes):
+                    continue
+                try:
+                    with transaction.atomic():
+                        LiveActivityMinute.objects.create(minute=minute, **counts)
+                except IntegrityError:
+                    rows.update(**changes)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            close_old_connections()
+            self.flush()
+
+
+class LiveBoard:
+    """Live activity for every dashboard served by this process, read from the database once per tick.
+
+    Streams and polls all take their snapshot from the same in-memory minute
+    buckets, so a tick costs one small query however many dashboards are open:
+    the last two stored minutes are re-read (all retained minutes every
+    FULL_RELOAD_SECONDS, to pick up late flushes from other workers), and this
+    worker's unflushed counts from `counters` are added on top. The latest
+    admin actions are re-read only when the audit count changes or every
+    audit_ttl seconds.
+    """
+
+    def __init__(self, counters, tick=2.0, audit_ttl=30.0):
+        self.counters = counters
+        self.tick = tick
+        self.audit_ttl = audit_ttl
+        self._lock = threading.Lock()
+        self._stored = {}  # minute -> {name: count}, as written by every worker
+        self._minutes = {}  # _stored plus this worker's pending counts
+        self._read_at = None
+        self._reloaded_at = None
+        self._audit = []
+        self._audit_read_at = None
+        self._audit_count = None
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._read_at is not None and now - self._read_at < self.tick:
+            return
+        minute = current_minute()
+        if self._reloaded_at is None or now - self._reloaded_at >= FULL_RELOAD_SECONDS:
+            self._stored, start = {}, minute - RETENTION_MINUTES
+            self._reloaded_at = now
+        else:
+            start = minute - 1
+        for row in LiveActivityMinute.objects.filter(minute__gte=start).values_list('minute', *LiveCounters.NAMES):
+            self._stored[row[0]] = dict(zip(LiveCounters.NAMES, row[1:]))
+        for old in [m for m in self._stored if m < minute - RETENTION_MINUTES]:
+            del self._stored[old]
+
+        minutes = {m: dict(counts) for m, counts in self._stored.items()}
+        for m, counts in self.counters.pending().items():
+            merged = minutes.setdefault(m, dict.fromkeys(LiveCounters.NAMES, 0))
+            for name, count in counts.items():
+                merged[name] += count
+        self._minutes = minutes
+        self._read_at = now
+
+        audit_count = sum(counts['audit_events'] for counts in minutes.values())
+        if (self._audit_read_at is None or audit_count != self._audit_count
+                or now - self._audit_read_at >= self.audit_ttl):
+            audit = AuditLog.objects.select_related('admin_user').order_by('-timestamp')[:RECENT_AUDIT_EVENTS]
+            self._audit = [
+                {
+                    'user': event.admin_user.email,
+                    'action': event.action,
+                    'resource_type': event.resource_type,
+                    'timestamp': event.timestamp.isoformat(),
+                }
+                for event in audit
+            ]
+            self._audit_count = audit_count
+            self._audit_read_at = now
+
+    def snapshot(self, since):
+        """Activity totals from minute `since` on, the conversation failure rate over the last
+        FAILURE_WINDOW_MINUTES minutes and the latest admin actions"""
+        with self._lock:
+            self._refresh()
+            minutes, audit = self._minutes, self._audit
+
+        now = current_minute()
+        since = min(max(since, now - RETENTION_MINUTES), now)
+        totals = dict.fromkeys(LiveCounters.NAMES, 0)
+        conversations = failures = 0
+        for minute, counts in minutes.items():
+            if minute >= since:
+                for name in LiveCounters.NAMES:
+                    totals[name] += counts[name]
+            if minute > now - FAILURE_WINDOW_MINUTES:
+                conversations += counts['conversations']
+                failures += counts['conversation_failures']
+        return {
+            'since': since,
+            'totals': totals,
+            'failure_rate': round(failures / conversations * 100, 1) if conversations else 0.0,
+            'audit': list(audit),
+        }
+
+
+class LiveStream:
+    """Server-Sent Events for one dashboard under ASGI: a snapshot on connect, then one whenever it changes.
+
+    Each tick takes the process-wide live_board snapshot, which only touches
+    the database when the board's own tick is due, so open streams share one
+    query loop. The stream ends after max_duration seconds and the browser's
+    EventSource reconnects on its own, so no connection is held forever.
+    """
+
+    def __init__(self, since, interval=2.0, heartbeat=15.0, max_duration=300.0):
+        self.since = since
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self.max_duration = max_duration
+
+    async def __aiter__(self):
+        started = sent_at = time.monotonic()
+        last = None
+        yield 'retry: 2000\n\n'
+        while time.monotonic() - started < self.max_duration:
+            snapshot = await sync_to_async(live_board.snapshot)(self.since)
+            if snapshot != last:
+                last = snapshot
+                sent_at = time.monotonic()
+                yield sse_event('snapshot', snapshot)
+            elif time.monotonic() - sent_at >= self.heartbeat:
+                sent_at = time.monotonic()
+                yield ': heartbeat\n\n'
+            await asyncio.sleep(self.interval)
+
+
+live_counters = LiveCounters(flush_interval=settings.LIVE_ACTIVITY_FLUSH_INTERVAL)
+live_board = LiveBoard(live_counters)
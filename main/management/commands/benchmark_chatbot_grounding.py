@@ -0,0 +1,93 @@
+import time
+from django.core.management.base import BaseCommand
+from main.chatbot import build_chatbot_prompt, gemini_clients
+from main.models import ChatbotConfig, CyberCrime
+from main.retrieval import CatalogIndex, format_crime_context
+
+
+SAMPLE_QUESTIONS = [
+    'How do I report UPI fraud?',
+    'What is phishing and how can I spot a phishing email?',
+    'Someone hacked my Instagram account, what should I do?',
+    'I got a job offer that asks for a registration fee. Is it a scam?',
+    'My files are encrypted and someone is asking for bitcoin.',
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare chatbot prompt size and latency with and without catalog grounding'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=3)
+        parser.add_argument(
+            '--live', action='store_true',
+            help='Count tokens and time replies with the configured Gemini model (uses API quota)'
+        )
+
+    def handle(self, *args, **options):
+        config = ChatbotConfig.objects.first()
+        if not config:
+            self.stdout.write(self.style.ERROR('No chatbot configuration found.'))
+            return
+
+        model = None
+        if options['live']:
+            if not config.gemini_api_key:
+                self.stdout.write(self.style.ERROR('--live needs a Gemini API key in the chatbot settings.'))
+                return
+            model = gemini_clients.get_model(config.gemini_api_key, config.gemini_model or 'gemini-1.5-flash')
+
+        start = time.perf_counter()
+        index = CatalogIndex()
+        index.build()
+        build_time = time.perf_counter() - start
+
+        full_catalog = '\n'.join(format_crime_context(crime) for crime in CyberCrime.objects.all())
+
+        self.stdout.write(f'Catalog: {CyberCrime.objects.count()} crimes, index built in {build_time * 1000:.1f} ms')
+        self.stdout.write('Token counts are approximate (chars / 4) unless --live is used.\n')
+
+        totals = {'static': 0, 'grounded': 0, 'full catalog': 0}
+        latencies = {'static': [], 'grounded': []}
+
+        for question in SAMPLE_QUESTIONS:
+            start = time.perf_counter()
+            context = '\n'.join(index.search(question, limit=options['top_k']))
+            retrieval_time = time.perf_counter() - start
+
+            prompts = {
+                'static': build_chatbot_prompt(config.system_prompt, question),
+                'grounded': build_chatbot_prompt(config.system_prompt, question, context),
+                'full catalog': build_chatbot_prompt(config.system_prompt, question, full_catalog),
+            }
+
+            self.stdout.write(f'Q: {question}')
+            self.stdout.write(f'  retrieval: {retrieval_time * 1000:.3f} ms')
+            for mode, prompt in prompts.items():
+                tokens = self.count_tokens(model, prompt)
+                totals[mode] += tokens
+                line = f'  {mode:<13} {tokens:>6} tokens'
+
+                if model and mode in latencies:
+                    start = time.perf_counter()
+                    model.generate_content(prompt)
+                    elapsed = time.perf_counter() - start
+                    latencies[mode].append(elapsed)
+                    line += f'  {elapsed:.2f} s'
+                self.stdout.write(line)
+
+        count = len(SAMPLE_QUESTIONS)
+        self.stdout.write('\nAverage prompt size:')
+        for mode, total in totals.items():
+            self.stdout.write(f'  {mode:<13} {total / count:>8.0f} tokens')
+        for mode, values in latencies.items():
+            if values:
+                self.stdout.write(f'  {mode:<13} {sum(values) / len(values):>8.2f} s average reply latency')
+
+        saved = 1 - totals['grounded'] / totals['full catalog'] if totals['full catalog'] else 0
+        self.stdout.write(self.style.SUCCESS(f'Grounded prompts are {saved:.0%} smaller than sending the full catalog'))
+
+    def count_tokens(self, model, prompt):
+        if model:
+            return model.count_tokens(prompt).total_tokens
+        return len(prompt) // 4
@@ -0,0 +1,112 @@
+import random
+import time
+import uuid
+from django.core.management.base import BaseCommand
+from main.models import CrimeGuidance, CyberCrime
+from main.search import SuggestIndex
+from .load_test_chatbot import percentile
+
+
+WORDS = [
+    'phishing', 'email', 'upi', 'payment', 'fraud', 'scam', 'ransomware', 'malware', 'account',
+    'hacking', 'password', 'identity', 'theft', 'sextortion', 'deepfake', 'investment', 'crypto',
+    'wallet', 'loan', 'app', 'job', 'offer', 'lottery', 'otp', 'sim', 'swap', 'card', 'skimming',
+    'romance', 'matrimonial', 'courier', 'customs', 'kyc', 'update', 'bank', 'impersonation',
+    'stalking', 'bullying', 'trolling', 'spyware', 'keylogger', 'botnet', 'ddos', 'trojan',
+]
+SYLLABLES = ['ka', 'ri', 'to', 'nen', 'sha', 'vo', 'mi', 'lu', 'dra', 'pe', 'gor', 'zi', 'tha', 'bex', 'qua']
+
+
+def attach_tips(crime, tips):
+    """Give an unsaved crime prevention tips the way prefetch_related('guidance') would"""
+    guidance = CrimeGuidance.objects.none()
+    guidance._result_cache = [
+        CrimeGuidance(kind=CrimeGuidance.TIP, position=position, text=text)
+        for position, text in enumerate(tips, 1)
+    ]
+    guidance._prefetch_done = True
+    crime._prefetched_objects_cache = {'guidance': guidance}
+    return crime
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark the crime typeahead index on synthetic catalogs (nothing is written to the database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000', help='Comma-separated catalog sizes')
+        parser.add_argument('--queries', type=int, default=5000, help='Queries per size')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        # A long tail of made-up words so the vocabulary grows with the catalog like real tip text
+        vocabulary = WORDS + [
+            ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(20000)
+        ]
+        categories = [value for value, _ in CyberCrime.CATEGORY_CHOICES]
+        severities = [value for value, _ in CyberCrime.SEVERITY_CHOICES]
+
+        def word():
+            # Zipf-like: common cyber words far more often than tail words
+            return vocabulary[min(int(rng.paretovariate(0.8)) - 1, len(vocabulary) - 1)] if rng.random() < 0.7 \
+                else rng.choice(vocabulary)
+
+        for size in [int(value) for value in options['sizes'].split(',')]:
+            crimes = []
+            for _ in range(size):
+                tips = [' '.join(word() for _ in range(rng.randint(4, 10))) for _ in range(3)]
+                crimes.append(attach_tips(CyberCrime(
+                    id=uuid.UUID(int=rng.getrandbits(128)),
+                    type=' '.join(word().capitalize() for _ in range(rng.randint(2, 3))),
+                    description='',
+                    category=rng.choice(categories),
+                    severity=rng.choice(severities),
+                    learn_more_clicks=rng.randint(0, 5000),
+                ), tips))
+
+            index = SuggestIndex()
+            start = time.perf_counter()
+            index.build(crimes)
+            build_time = time.perf_counter() - start
+            postings = sum(len(keys) for keys in index._postings.values())
+
+            queries = []
+            for _ in range(options['queries']):
+                kind = rng.random()
+                term = word()
+                if kind < 0.2:
+                    queries.append(term[:1])
+                elif kind < 0.5:
+                    queries.append(term[:rng.randint(2, 3)])
+                elif kind < 0.8:
+                    queries.append(term)
+                else:
+                    queries.append(f'{term} {word()[:rng.randint(1, 4)]}')
+
+            self.stdout.write(
+                f'{size} crimes: build {build_time:.2f} s, {len(index._vocab)} tokens, {postings} postings'
+            )
+
+            # The first pass fills the short-prefix caches; the second shows steady state
+            for label in ('cold', 'warm'):
+                latencies = []
+                for query in queries:
+                    start = time.perf_counter()
+                    index.suggest(query)
+                    latencies.append(time.perf_counter() - start)
+
+                self.stdout.write(
+                    f'  suggest latency ({label}): p50 {percentile(latencies, 0.50) * 1000:.3f} ms, '
+                    f'p95 {percentile(latencies, 0.95) * 1000:.3f} ms, '
+                    f'p99 {percentile(latencies, 0.99) * 1000:.3f} ms, '
+                    f'max {max(latencies) * 1000:.3f} ms'
+                )
+
+            # Incremental maintenance cost: re-index a crime as a save signal would
+            start = time.perf_counter()
+            for crime in crimes[:200]:
+                crime.learn_more_clicks += 1
+                index.update(crime)
+            self.stdout.write(f'  incremental update: {(time.perf_counter() - start) / 200 * 1000:.3f} ms per crime')
+
+        self.stdout.write(self.style.SUCCESS('Benchmark finished'))
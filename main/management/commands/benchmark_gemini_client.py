@@ -0,0 +1,46 @@
+import time
+from django.core.management.base import BaseCommand
+import google.generativeai as genai
+from google.generativeai import client as genai_client
+from main.chatbot import GeminiClientRegistry
+
+
+class Command(BaseCommand):
+    help = 'Measure per-request Gemini client setup time with and without the client registry'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--model', default='gemini-1.5-flash')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        model_id = options['model']
+        api_key = 'benchmark-key'  # No request is sent, only client setup is timed
+
+        # Previous behaviour: configure the library and build a model on every request
+        start = time.perf_counter()
+        for _ in range(iterations):
+            genai.configure(api_key=api_key)
+            genai.GenerativeModel(model_id)
+            genai_client.get_default_generative_client()
+        per_request_setup = (time.perf_counter() - start) / iterations
+
+        # Registry: the first lookup builds the client, later lookups reuse it
+        registry = GeminiClientRegistry()
+        start = time.perf_counter()
+        registry.get_model(api_key, model_id)
+        first_lookup = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            registry.get_model(api_key, model_id)
+        warm_lookup = (time.perf_counter() - start) / iterations
+
+        self.stdout.write(f'Iterations: {iterations}')
+        self.stdout.write(f'Configure + build per request: {per_request_setup * 1000:.3f} ms')
+        self.stdout.write(f'Registry first lookup:         {first_lookup * 1000:.3f} ms')
+        self.stdout.write(f'Registry warm lookup:          {warm_lookup * 1000:.4f} ms')
+        if warm_lookup > 0:
+            self.stdout.write(
+                self.style.SUCCESS(f'Setup overhead reduced {per_request_setup / warm_lookup:.0f}x per request')
+            )
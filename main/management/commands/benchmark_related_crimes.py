@@ -0,0 +1,89 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from main.related import RelatedCrimeIndex
+from .benchmark_crime_suggest import SYLLABLES, WORDS
+from .load_test_chatbot import percentile
+
+
+def exact_neighbours(index, crime_id, k):
+    """Brute-force cosine over every crime, for measuring the pruned index's recall"""
+    vector = index._vectors[crime_id]
+    scores = []
+    for other_id, other in index._vectors.items():
+        if other_id != crime_id:
+            score = sum(weight * other.get(token, 0) for token, weight in vector.items())
+            if score > 0:
+                scores.append((score, other_id))
+    return [other_id for _, other_id in sorted(scores, reverse=True)[:k]]
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark the related crimes index on synthetic catalogs (nothing is written to the database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,50000', help='Comma-separated catalog sizes')
+        parser.add_argument('--count', type=int, default=3, help='Related crimes per crime')
+        parser.add_argument('--recall-sample', type=int, default=200, help='Crimes checked against exact search')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = WORDS + [
+            ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(20000)
+        ]
+        count = options['count']
+
+        def word():
+            return vocabulary[min(int(rng.paretovariate(0.8)) - 1, len(vocabulary) - 1)] if rng.random() < 0.7 \
+                else rng.choice(vocabulary)
+
+        def text():
+            # Type, description and three tips, as crime_texts() joins them
+            return ' '.join(word() for _ in range(rng.randint(30, 60)))
+
+        for size in [int(value) for value in options['sizes'].split(',')]:
+            index = RelatedCrimeIndex()
+            start = time.perf_counter()
+            for crime_id in range(size):
+                index.add(crime_id, text())
+            count_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            index.build()
+            prepare_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            neighbours = index.all_neighbours(count)
+            query_time = time.perf_counter() - start
+            self.stdout.write(
+                f'{size} crimes: tokenize {count_time:.2f} s, vectors {prepare_time:.2f} s, '
+                f'all neighbours {query_time:.2f} s ({query_time / size * 1000:.3f} ms per crime), '
+                f'{len(index._df)} tokens'
+            )
+
+            sample = rng.sample(range(size), min(options['recall_sample'], size))
+            found = expected = 0
+            latencies = []
+            for crime_id in sample:
+                start = time.perf_counter()
+                exact = exact_neighbours(index, crime_id, count)
+                latencies.append(time.perf_counter() - start)
+                approximate = {other_id for other_id, _ in neighbours[crime_id]}
+                found += len(approximate.intersection(exact))
+                expected += len(exact)
+            self.stdout.write(
+                f'  recall@{count} vs exact search: {found / expected * 100 if expected else 100:.1f}% '
+                f'(exact search p50 {percentile(latencies, 0.50) * 1000:.1f} ms per crime)'
+            )
+
+            # Incremental maintenance cost: re-count one edited crime and recompute its list
+            start = time.perf_counter()
+            for crime_id in range(20):
+                index.add(crime_id, text())
+                index.neighbours(crime_id, count)
+            self.stdout.write(
+                f'  incremental refresh: {(time.perf_counter() - start) / 20 * 1000:.1f} ms per edited crime'
+            )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark finished'))
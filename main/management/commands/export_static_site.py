@@ -0,0 +1,179 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings
+
+from main.models import CyberCrime, RelatedCrime
+from main.page_cache import CSRF_INPUT
+from main.pagination import decode_cursor, encode_cursor
+from main.views import CRIMES_PER_PAGE
+
+
+STATE_FILE = '.export-state.json'
+CURSOR_LINK = re.compile(rb'href="\?cursor=([^"&]+)"')
+
+
+def export_settings(output):
+    """Render as an anonymous visitor with content-hashed static file URLs"""
+    return override_settings(
+        DEBUG=False,
+        ALLOWED_HOSTS=['testserver'],
+        STATIC_ROOT=str(output / 'static'),
+        STORAGES={
+            **settings.STORAGES,
+            'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'},
+        },
+    )
+
+
+def listing_path(number):
+    return 'cyber-crimes/index.html' if number == 1 else f'cyber-crimes/page/{number}/index.html'
+
+
+def listing_link(match, number):
+    """Point a Newer/Older cursor link at the neighbouring exported listing page"""
+    position = decode_cursor(match.group(1).decode(), CyberCrime)
+    if position is None:
+        return match.group(0)
+    target = number - 1 if position[0] == 'p' else number + 1
+    return b'href="/' + listing_path(target).replace('index.html', '').encode() + b'"'
+
+
+def render_pages(output, pages):
+    """Render (url, relative path, listing page number or None) tuples into output"""
+    client = Client()
+    failed = []
+    for url, path, number in pages:
+        response = client.get(url)
+        if response.status_code != 200:
+            failed.append(f'{url} ({response.status_code})')
+            continue
+        # Static pages have no per-visitor CSRF token; the public JSON endpoints are CSRF exempt
+        html = CSRF_INPUT.sub(rb'\g<1>\g<2>', response.content)
+        if number is not None:
+            html = CURSOR_LINK.sub(lambda match: listing_link(match, number), html)
+
+        target = output / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temporary = target.with_name(target.name + '.tmp')
+        temporary.write_bytes(html)
+        os.replace(temporary, target)
+    return len(pages) - len(failed), failed
+
+
+def start_worker(output):
+    # Forked workers must not share the parent's database connections
+    connections.close_all()
+    export_settings(output).enable()
+
+
+class Command(BaseCommand):
+    help = 'Pre-render the public pages (home, listings, crime details, contact, report) into a static directory for CDN hosting'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=str(settings.BASE_DIR / 'site_export'), help='Export directory')
+        parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='Rendering processes')
+        parser.add_argument('--force', action='store_true', help='Re-render every page, not just changed ones')
+
+    def handle(self, *args, **options):
+        start_time = time.perf_counter()
+        output = Path(options['output']).resolve()
+        output.mkdir(parents=True, exist_ok=True)
+        state_path = output / STATE_FILE
+        state = {} if options['force'] or not state_path.exists() else json.loads(state_path.read_text())
+
+        # Static files under content-hashed names; collectstatic itself skips unchanged files
+        with export_settings(output):
+            call_command('collectstatic', interactive=False, verbosity=0)
+        assets = hashlib.md5((output / 'static' / 'staticfiles.json').read_bytes()).hexdigest()
+        if state.get('assets') != assets:
+            # New asset hashes change every page's links
+            state = {}
+
+        # A crime page also changes when its related crimes are recomputed
+        related = {}
+        for crime_id, related_id in RelatedCrime.objects.values_list('crime_id', 'related_id'):
+            related.setdefault(crime_id, []).append(str(related_id))
+        crimes = {
+            str(crime_id): ' '.join([updated_at.isoformat(), *related.get(crime_id, [])])
+            for crime_id, updated_at in CyberCrime.objects.values_list('id', 'updated_at')
+        }
+        exported = state.get('crimes', {})
+
+        # Crime pages: only those changed since the last export, plus any missing from disk
+        pages = [
+            (f'/crime/{crime_id}/', f'crime/{crime_id}/index.html', None)
+            for crime_id, version in crimes.items()
+            if exported.get(crime_id) != version or not (output / 'crime' / crime_id / 'index.html').exists()
+        ]
+        crime_pages = len(pages)
+
+        # Listing pages change whenever any crime does; the cursor for each page comes from the
+        # last row of the page before it, the same as following the Older links
+        listing = hashlib.md5(json.dumps(sorted(crimes.items())).encode()).hexdigest()
+        rows = list(CyberCrime.objects.order_by('-created_at', '-id').values_list('created_at', 'id'))
+        page_count = max(1, -(-len(rows) // CRIMES_PER_PAGE))
+        if state.get('listing') != listing or not (output / listing_path(1)).exists():
+            pages.append(('/cyber-crimes/', listing_path(1), 1))
+            for number in range(2, page_count + 1):
+                created_at, crime_id = rows[(number - 1) * CRIMES_PER_PAGE - 1]
+                cursor = encode_cursor('n', SimpleNamespace(created_at=created_at, id=crime_id))
+                pages.append((f'/cyber-crimes/?cursor={cursor}', listing_path(number), number))
+        listing_pages = len(pages) - crime_pages
+
+        # Home shows view counts, which change without updated_at; these few pages always re-render
+        pages += [
+            ('/', 'index.html', None),
+            ('/contact/', 'contact/index.html', None),
+            ('/report/', 'report/index.html', None),
+        ]
+
+        rendered, failed = self.render(output, pages, options['jobs'])
+
+        removed = 0
+        for crime_id in set(exported) - set(crimes):
+            shutil.rmtree(output / 'crime' / crime_id, ignore_errors=True)
+            removed += 1
+        extra_page = page_count + 1
+        while (output / listing_path(extra_page)).exists():
+            shutil.rmtree((output / listing_path(extra_page)).parent)
+            extra_page += 1
+            removed += 1
+
+        if failed:
+            raise CommandError(f"{len(failed)} pages failed to render: {', '.join(failed[:10])}")
+
+        state_path.write_text(json.dumps({'assets': assets, 'listing': listing, 'crimes': crimes}))
+        self.stdout.write(
+            f'Rendered {rendered} pages ({crime_pages} crime pages, {listing_pages} listing pages) '
+            f'and removed {removed} in {time.perf_counter() - start_time:.1f} s'
+        )
+        self.stdout.write(self.style.SUCCESS(f'Static site exported to {output}'))
+
+    def render(self, output, pages, jobs):
+        jobs = max(1, min(jobs, len(pages) // 50 or 1))
+        if jobs == 1 or 'fork' not in multiprocessing.get_all_start_methods():
+            with export_settings(output):
+                return render_pages(output, pages)
+
+        connections.close_all()
+        chunks = [pages[index::jobs] for index in range(jobs)]
+        with ProcessPoolExecutor(
+            max_workers=jobs, mp_context=multiprocessing.get_context('fork'),
+            initializer=start_worker, initargs=(output,)
+        ) as pool:
+            results = list(pool.map(render_pages, [output] * jobs, chunks))
+        return sum(count for count, _ in results), [url for _, failed in results for url in failed]
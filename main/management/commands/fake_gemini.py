@@ -0,0 +1,164 @@
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.core.management.base import BaseCommand
+
+
+SAMPLE_REPLY = (
+    "**Stay calm and act quickly.** Stop all contact with the fraudster and do not share any "
+    "OTP, UPI PIN or card details.\n\n"
+    "• Call the national cyber fraud helpline **1930** as soon as possible.\n"
+    "• File a complaint at https://cybercrime.gov.in/ with screenshots and transaction IDs.\n"
+    "• Ask your bank to block the affected account or card.\n\n"
+    "Under the IT Act 2000, online fraud and identity theft are punishable offences."
+)
+
+
+class FakeGemini:
+    """Behaviour of the fake server: latency distribution and injected failures"""
+
+    def __init__(self, latency, jitter, distribution, error_rate, rate_limit_rate, chunks, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.distribution = distribution
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.chunks = chunks
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {'generate': 0, 'stream': 0, 'errors': 0, 'rate_limited': 0}
+
+    def sample_latency(self):
+        with self.lock:
+            if self.distribution == 'uniform':
+                value = self.random.uniform(self.latency - self.jitter, self.latency + self.jitter)
+            elif self.distribution == 'lognormal':
+                # Median `latency`, long right tail controlled by `jitter`
+                value = self.latency * self.random.lognormvariate(0, self.jitter / max(self.latency, 1e-6))
+            else:
+                value = self.latency
+        return max(0.0, value)
+
+    def pick_failure(self):
+        with self.lock:
+            roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            return 429, 'RESOURCE_EXHAUSTED', 'Resource has been exhausted (e.g. check quota).'
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 500, 'INTERNAL', 'An internal error has occurred.'
+        return None
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+
+def reply_payload(text, finish=True):
+    candidate = {'content': {'parts': [{'text': text}], 'role': 'model'}, 'index': 0}
+    if finish:
+        candidate['finishReason'] = 'STOP'
+    return {'candidates': [candidate]}
+
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        # Close-delimited bodies let streamed chunks flush without chunked encoding
+        protocol_version = 'HTTP/1.0'
+
+        def do_POST(self):
+            match = re.match(r'^/v1beta/(models|tunedModels)/[^:]+:(generateContent|streamGenerateContent)', self.path)
+            if not match:
+                self.send_json(404, {'error': {'code': 404, 'message': 'Not found', 'status': 'NOT_FOUND'}})
+                return
+
+            length = int(self.headers.get('Content-Length') or 0)
+            self.rfile.read(length)
+            streaming = match.group(2) == 'streamGenerateContent'
+            fake.count('stream' if streaming else 'generate')
+
+            failure = fake.pick_failure()
+            latency = fake.sample_latency()
+            if failure:
+                status, code, message = failure
+                fake.count('rate_limited' if status == 429 else 'errors')
+                time.sleep(latency / 4)
+                self.send_json(status, {'error': {'code': status, 'message': message, 'status': code}})
+                return
+
+            if not streaming:
+                time.sleep(latency)
+                self.send_json(200, reply_payload(SAMPLE_REPLY))
+                return
+
+            # Spread the latency over the chunks: time to first token, then the rest
+            words = SAMPLE_REPLY.split(' ')
+            size = max(1, len(words) // fake.chunks)
+            pieces = [' '.join(words[i:i + size]) + ' ' for i in range(0, len(words), size)]
+            delay = latency / (len(pieces) + 1)
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(b'[')
+            for index, piece in enumerate(pieces):
+                time.sleep(delay * (2 if index == 0 else 1))
+                payload = json.dumps(reply_payload(piece, finish=index == len(pieces) - 1))
+                self.wfile.write((',' if index else '').encode() + payload.encode())
+                self.wfile.flush()
+            self.wfile.write(b']')
+
+        def send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class Command(BaseCommand):
+    help = 'Run a local stand-in for the Gemini API (set CHATBOT_GEMINI_ENDPOINT to use it)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=1.5, help='Mean/median reply latency in seconds')
+        parser.add_argument('--jitter', type=float, default=0.5, help='Spread of the latency distribution in seconds')
+        parser.add_argument('--distribution', choices=['fixed', 'uniform', 'lognormal'], default='lognormal')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of calls failing with 500')
+        parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Fraction of calls failing with 429')
+        parser.add_argument('--chunks', type=int, default=6, help='Number of chunks in streamed replies')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        fake = FakeGemini(
+            latency=options['latency'],
+            jitter=options['jitter'],
+            distribution=options['distribution'],
+            error_rate=options['error_rate'],
+            rate_limit_rate=options['rate_limit_rate'],
+            chunks=options['chunks'],
+            seed=options['seed'],
+        )
+        server = ThreadingHTTPServer((options['host'], options['port']), make_handler(fake))
+        server.daemon_threads = True
+
+        endpoint = f"http://{options['host']}:{options['port']}"
+        self.stdout.write(self.style.SUCCESS(f'Fake Gemini API listening on {endpoint}'))
+        self.stdout.write(f'Start the app with CHATBOT_GEMINI_ENDPOINT={endpoint} to use it. Ctrl+C to stop.')
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f'Calls served: {fake.counts}')
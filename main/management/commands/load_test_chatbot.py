@@ -0,0 +1,215 @@
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+from main.models import ChatbotConversation, ChatbotMetricsRollup, ChatSession
+
+
+QUESTIONS = [
+    'How do I report UPI fraud?',
+    'What is phishing?',
+    'Someone hacked my Instagram account, what should I do?',
+    'Is a job offer asking for a registration fee a scam?',
+    'What should I do after a ransomware attack?',
+    'How can I protect my parents from OTP scams?',
+]
+
+
+class SourceAddressAdapter(HTTPAdapter):
+    """Open connections from a given local address, so the server sees it as REMOTE_ADDR"""
+
+    def __init__(self, source_address, **kwargs):
+        self.source_address = source_address
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['source_address'] = (self.source_address, 0)
+        super().init_poolmanager(*args, **kwargs)
+
+
+def client_address(client):
+    """Loopback address of simulated client number `client` (127.0.0.2 and up)"""
+    number = client + 2
+    return f'127.{number // 65536 % 256}.{number // 256 % 256}.{number % 256}'
+
+
+class WriteCounter:
+    """Database wrapper counting the INSERT, UPDATE and DELETE statements run on a connection"""
+
+    WRITES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+    def __init__(self):
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        verb = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ''
+        if verb in self.WRITES:
+            with self.lock:
+                self.counts[verb] += 1
+        return execute(sql, params, many, context)
+
+    def install(self, sender=None, connection=None, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_in_background(host, port):
+    """Run the project's WSGI app in this process, like runserver without the autoreloader"""
+    server = ThreadedWSGIServer((host, port), QuietRequestHandler)
+    server.daemon_threads = True
+    server.set_app(get_internal_wsgi_application())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def rows_written_since(moment):
+    """Rows of each table on the chat path that were inserted or updated since moment.
+
+    A row updated several times counts once, so this is a lower bound on writes
+    made by a server running in another process.
+    """
+    return {
+        'conversations': ChatbotConversation.objects.filter(created_at__gte=moment).count(),
+        'chat sessions': ChatSession.objects.filter(updated_at__gte=moment).count(),
+        'metrics rollups': ChatbotMetricsRollup.objects.filter(updated_at__gte=moment).count(),
+    }
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(fraction * len(values)) - 1))
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = 'Drive the chatbot API at a target request rate and report latency, throughput and DB writes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000/api/chatbot/')
+        parser.add_argument(
+            '--serve', action='store_true',
+            help="Serve the app from this process on --url's host and port, so every database "
+                 "write statement it runs (request threads and background flushes) is counted"
+        )
+        parser.add_argument('--rps', type=float, default=10.0, help='Target requests per second')
+        parser.add_argument('--duration', type=float, default=30.0, help='Test length in seconds')
+        parser.add_argument('--concurrency', type=int, default=64, help='Maximum requests in flight')
+        parser.add_argument(
+            '--clients', type=int, default=100,
+            help='Number of simulated clients, each connecting from its own loopback address '
+                 '(127.0.0.2 and up) so rate limits apply per client; needs the server on '
+                 'a loopback address and an OS that routes all of 127.0.0.0/8 (e.g. Linux). '
+                 'Use 0 to send everything from the default address'
+        )
+        parser.add_argument(
+            '--unique', action='store_true',
+            help='Make every message unique so the response cache is bypassed'
+        )
+        parser.add_argument(
+            '--settle', type=float, default=5.0,
+            help='Seconds to wait after the run for buffered conversation logs to flush'
+        )
+
+    def handle(self, *args, **options):
+        url = options['url']
+        rps = options['rps']
+        total = int(rps * options['duration'])
+        started_at = timezone.now()
+
+        writes = None
+        if options['serve']:
+            address = urlsplit(url)
+            writes = WriteCounter()
+            connection_created.connect(writes.install)
+            for connection in connections.all():
+                writes.install(connection=connection)
+            server = serve_in_background(address.hostname, address.port or 80)
+
+        results = []
+        results_lock = threading.Lock()
+        local = threading.local()
+
+        def session_for(index):
+            # One session per simulated client in each thread, bound to the client's address
+            if not hasattr(local, 'sessions'):
+                local.sessions = {}
+            client = index % options['clients'] if options['clients'] else None
+            if client not in local.sessions:
+                session = requests.Session()
+                if client is not None:
+                    adapter = SourceAddressAdapter(client_address(client))
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                local.sessions[client] = session
+            return local.sessions[client]
+
+        def send(index):
+            session = session_for(index)
+            message = random.choice(QUESTIONS)
+            if options['unique']:
+                message = f'{message} (#{index})'
+
+            start = time.perf_counter()
+            try:
+                response = session.post(url, json={'message': message}, timeout=120)
+                status = response.status_code
+            except requests.RequestException as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+
+            with results_lock:
+                results.append((status, elapsed))
+
+        self.stdout.write(f'Sending {total} requests to {url} at {rps:g} req/s...')
+        run_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            # Open loop: requests are scheduled on time even if earlier ones are still running
+            for index in range(total):
+                delay = run_start + index / rps - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(send, index)
+        run_time = time.perf_counter() - run_start
+
+        time.sleep(options['settle'])
+        if writes:
+            server.shutdown()
+            connection_created.disconnect(writes.install)
+        rows_written = rows_written_since(started_at)
+
+        latencies = [elapsed for status, elapsed in results if status == 200]
+        statuses = Counter(status for status, _ in results)
+
+        self.stdout.write(f'\nCompleted {len(results)} requests in {run_time:.1f} s')
+        self.stdout.write(f'Throughput: {len(results) / run_time:.1f} req/s (target {rps:g})')
+        self.stdout.write('Status codes: ' + ', '.join(f'{status}: {count}' for status, count in statuses.most_common()))
+        self.stdout.write(
+            f'Latency (200 responses): p50 {percentile(latencies, 0.50) * 1000:.0f} ms, '
+            f'p95 {percentile(latencies, 0.95) * 1000:.0f} ms, '
+            f'p99 {percentile(latencies, 0.99) * 1000:.0f} ms'
+        )
+        if writes:
+            self.stdout.write(
+                f'DB write statements: {sum(writes.counts.values())} ('
+                + ', '.join(f'{verb}: {writes.counts[verb]}' for verb in WriteCounter.WRITES if writes.counts[verb])
+                + ')'
+            )
+        self.stdout.write('Rows written: ' + ', '.join(f'{table}: {count}' for table, count in rows_written.items()))
+        self.stdout.write(self.style.SUCCESS('Load test finished'))
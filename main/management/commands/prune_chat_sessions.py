@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from main.models import ChatSession
+
+
+class Command(BaseCommand):
+    help = 'Delete chatbot sessions idle for longer than CHATBOT_SESSION_TTL (run it daily, e.g. from cron)'
+
+    def handle(self, *args, **options):
+        # Conversation log rows keep their history; their session link is cleared
+        deleted, _ = ChatSession.objects.filter(updated_at__lt=ChatSession.expiry_cutoff()).delete()
+        self.stdout.write(self.style.SUCCESS(f'Removed {deleted} expired chat sessions'))
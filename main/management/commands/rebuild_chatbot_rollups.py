@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from main.metrics import record_conversations
+from main.models import ChatbotConversation, ChatbotMetricsRollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the hourly and daily chatbot metrics rollups from the conversation log'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        # Conversations flushed while this runs may be counted twice; run it while the chatbot is quiet.
+        # Widget opens only exist in the rollups, so rows keep them and lose just the conversation counts
+        with transaction.atomic():
+            reset = ChatbotMetricsRollup.objects.update(
+                **{field: 0 for field in ChatbotMetricsRollup.CONVERSATION_FIELDS}
+            )
+            deleted, _ = ChatbotMetricsRollup.objects.filter(widget_opens=0).delete()
+        self.stdout.write(f'Reset {reset} rollup rows, removing {deleted} without widget opens')
+
+        conversations = ChatbotConversation.objects.only(
+            'created_at', 'success', 'response_time', 'prompt_tokens'
+        ).order_by('created_at').iterator(chunk_size=options['batch_size'])
+
+        batch = []
+        total = 0
+        for conversation in conversations:
+            batch.append(conversation)
+            if len(batch) >= options['batch_size']:
+                record_conversations(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            record_conversations(batch)
+            total += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rolled up {total} conversations into {ChatbotMetricsRollup.objects.count()} rows'
+        ))
@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+from main.related import related_crimes
+
+
+class Command(BaseCommand):
+    help = 'Recompute the related crimes shown on every crime page (e.g. after bulk imports that skip model signals)'
+
+    def handle(self, *args, **options):
+        start_time = time.perf_counter()
+        count = related_crimes.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored up to {related_crimes.count} related crimes for each of {count} crimes '
+            f'in {time.perf_counter() - start_time:.1f} s'
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from main.search import search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for cyber crimes (e.g. after bulk imports that skip model signals)'
+
+    def handle(self, *args, **options):
+        if not search_index.available():
+            self.stdout.write(self.style.WARNING(
+                'No full-text search index on this database; searches use LIKE filters'
+            ))
+            return
+
+        count = search_index.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} crimes'))
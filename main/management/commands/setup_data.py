@@ -161,15 +161,14 @@ class Command(BaseCommand):
 
         for crime_data in sample_crimes:
             try:
-                crime = CyberCrime.objects.create(
+                crime = CyberCrime(
                     id=uuid.uuid4(),
                     type=crime_data['type'],
                     description=crime_data['description'],
                     category=crime_data['category'],
                     severity=crime_data['severity'],
-                    prevention_tips=crime_data['prevention_tips'],
-                    reporting_steps=crime_data['reporting_steps']
                 )
+                crime.save_with_guidance(crime_data['prevention_tips'], crime_data['reporting_steps'])
                 self.stdout.write(f'Created crime: {crime.type}')
             except Exception as e:
                 self.stdout.write(f'Error creating crime {crime_data["type"]}: {e}')
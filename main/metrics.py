@@ -0,0 +1,139 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ChatbotMetricsRollup
+
+
+def bucket_starts(moment):
+    """Start of the hour and day rollup buckets containing moment, in the site time zone"""
+    hour = timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+    return {'hour': hour, 'day': hour.replace(hour=0)}
+
+
+def rollup_deltas(conversations):
+    """Fold ChatbotConversation records into {(period, bucket_start): {field: amount}}"""
+    deltas = {}
+    for conversation in conversations:
+        for period, start in bucket_starts(conversation.created_at).items():
+            delta = deltas.setdefault((period, start), {})
+            add_delta(delta, 'conversations', 1)
+            if conversation.success:
+                add_delta(delta, 'successes', 1)
+                add_delta(delta, 'latency_sum', conversation.response_time)
+                bucket = ChatbotMetricsRollup.latency_bucket(conversation.response_time)
+                add_delta(delta, ChatbotMetricsRollup.HISTOGRAM_FIELDS[bucket], 1)
+            if conversation.prompt_tokens is not None:
+                add_delta(delta, 'prompt_tokens_sum', conversation.prompt_tokens)
+                add_delta(delta, 'prompt_turns', 1)
+    return deltas
+
+
+def add_delta(delta, field, amount):
+    delta[field] = delta.get(field, 0) + amount
+
+
+def merge_deltas(deltas, more):
+    """Add the rollup deltas in `more` into `deltas`"""
+    for key, delta in more.items():
+        merged = deltas.setdefault(key, {})
+        for field, amount in delta.items():
+            add_delta(merged, field, amount)
+
+
+def apply_deltas(deltas):
+    """Add rollup deltas to their rows in one transaction.
+
+    Each row is changed with a single UPDATE of F() expressions, so workers
+    flushing at the same time never overwrite each other's counts; a row that
+    does not exist yet is created, falling back to the update if another
+    worker created it first.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        for (period, start), delta in sorted(deltas.items()):
+            rows = ChatbotMetricsRollup.objects.filter(period=period, bucket_start=start)
+            changes = {field: F(field) + amount for field, amount in delta.items()}
+            if rows.update(updated_at=now, **changes):
+                continue
+            try:
+                with transaction.atomic():
+                    ChatbotMetricsRollup.objects.create(period=period, bucket_start=start, **delta)
+            except IntegrityError:
+                rows.update(updated_at=now, **changes)
+
+
+def record_conversations(conversations):
+    """Add logged ChatbotConversation records to their hourly and daily rollups.
+
+    The batch is folded in memory first, so each flush touches at most two rows
+    per hour it spans.
+    """
+    apply_deltas(rollup_deltas(conversations))
+
+
+def record_widget_opens(opens, moment=None):
+    """Add chatbot widget opens to their hourly and daily rollups"""
+    apply_deltas({
+        (period, start): {'widget_opens': opens}
+        for period, start in bucket_starts(moment or timezone.now()).items()
+    })
+
+
+def summarize(rollups):
+    """Combine rollup rows into counts, rates and latency percentiles"""
+    conversations = successes = prompt_tokens_sum = prompt_turns = widget_opens = 0
+    latency_sum = 0.0
+    histogram = [0] * (len(ChatbotMetricsRollup.LATENCY_BOUNDS) + 1)
+    for rollup in rollups:
+        conversations += rollup.conversations
+        successes += rollup.successes
+        latency_sum += rollup.latency_sum
+        prompt_tokens_sum += rollup.prompt_tokens_sum
+        prompt_turns += rollup.prompt_turns
+        widget_opens += rollup.widget_opens
+        for index, count in enumerate(rollup.latency_histogram):
+            histogram[index] += count
+
+    return {
+        'conversations': conversations,
+        'success_rate': round(successes / conversations * 100) if conversations else 100,
+        'avg_response_time': round(latency_sum / successes, 1) if successes else 0.0,
+        'p50': round(ChatbotMetricsRollup.latency_percentile(histogram, 0.50), 1),
+        'p95': round(ChatbotMetricsRollup.latency_percentile(histogram, 0.95), 1),
+        'avg_prompt_tokens': round(prompt_tokens_sum / prompt_turns) if prompt_turns else 0,
+        'widget_opens': widget_opens,
+    }
+
+
+def chatbot_metrics(days=14):
+    """Admin chatbot page metrics read from the rollup tables.
+
+    Returns month-to-date conversations, a summary of the last 24 hours and a
+    per-day trend for the last `days` days, newest first.
+    """
+    now = timezone.localtime()
+    this_hour = bucket_starts(now)['hour']
+    today = this_hour.replace(hour=0)
+    month_start = today.replace(day=1)
+    trend_start = today - timedelta(days=days - 1)
+
+    daily = list(ChatbotMetricsRollup.objects.filter(
+        period='day', bucket_start__gte=min(month_start, trend_start)
+    ))
+    hourly = ChatbotMetricsRollup.objects.filter(
+        period='hour', bucket_start__gt=this_hour - timedelta(hours=24)
+    )
+
+    trend = []
+    for rollup in daily:
+        if rollup.bucket_start >= trend_start:
+            trend.append({'date': rollup.bucket_start, **summarize([rollup])})
+
+    return {
+        'month_conversations': sum(r.conversations for r in daily if r.bucket_start >= month_start),
+        'last_24h': summarize(hourly),
+        'trend': trend,
+    }
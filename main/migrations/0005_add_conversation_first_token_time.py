@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_add_chatbot_conversations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatbotconversation',
+            name='first_token_time',
+            field=models.FloatField(blank=True, help_text='Time to first streamed token in seconds', null=True),
+        ),
+    ]
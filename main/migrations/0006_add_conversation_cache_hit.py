@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_add_conversation_first_token_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatbotconversation',
+            name='cache_hit',
+            field=models.BooleanField(default=False),
+        ),
+    ]
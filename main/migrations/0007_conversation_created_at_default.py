@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_add_conversation_cache_hit'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chatbotconversation',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+import main.models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_conversation_created_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('token', models.CharField(default=main.models.generate_session_token, max_length=64, unique=True)),
+                ('summary', models.TextField(blank=True, default='')),
+                ('turns', models.JSONField(default=list)),
+                ('turn_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'chatbot_sessions',
+            },
+        ),
+        migrations.AddField(
+            model_name='chatbotconversation',
+            name='prompt_tokens',
+            field=models.IntegerField(blank=True, help_text='Estimated prompt size in tokens', null=True),
+        ),
+        migrations.AddField(
+            model_name='chatbotconversation',
+            name='session',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='conversations', to='main.chatsession'),
+        ),
+    ]
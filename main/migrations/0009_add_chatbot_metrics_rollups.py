@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_add_chat_sessions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatbotMetricsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=10)),
+                ('bucket_start', models.DateTimeField()),
+                ('conversations', models.IntegerField(default=0)),
+                ('successes', models.IntegerField(default=0)),
+                ('latency_sum', models.FloatField(default=0, help_text='Sum of successful response times in seconds')),
+                ('latency_histogram', models.JSONField(default=list, help_text='Successful response counts per latency bucket')),
+                ('prompt_tokens_sum', models.IntegerField(default=0)),
+                ('prompt_turns', models.IntegerField(default=0, help_text='Conversations with a recorded prompt size')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'chatbot_metrics_rollups',
+                'ordering': ['-bucket_start'],
+                'unique_together': {('period', 'bucket_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+from django.db import migrations
+
+
+def body_sql(connection):
+    """Body text built from the real columns; the historical model state predates some tip fields"""
+    with connection.cursor() as cursor:
+        existing = {column.name for column in connection.introspection.get_table_description(cursor, 'cybercrime_data')}
+    return "description" + "".join(
+        f" || ' ' || COALESCE({field}_{index}, '')"
+        for field in ('prevention_tip', 'reporting_step')
+        for index in range(1, 7)
+        if f'{field}_{index}' in existing
+    )
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    BODY_SQL = body_sql(connection)
+
+    if connection.vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                "CREATE VIRTUAL TABLE cybercrime_search USING fts5("
+                "crime_id UNINDEXED, type, category, body, tokenize='porter unicode61')"
+            )
+        except Exception as e:
+            print(f"SQLite FTS5 is not available, crime search will use LIKE filters: {e}")
+            return
+        schema_editor.execute(
+            "INSERT INTO cybercrime_search (crime_id, type, category, body) "
+            f"SELECT id, type, REPLACE(category, '_', ' '), {BODY_SQL} FROM cybercrime_data"
+        )
+
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE TABLE cybercrime_search ("
+            "crime_id uuid PRIMARY KEY REFERENCES cybercrime_data (id) ON DELETE CASCADE, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            "CREATE INDEX cybercrime_search_document_idx ON cybercrime_search USING GIN (document)"
+        )
+        schema_editor.execute(
+            "INSERT INTO cybercrime_search (crime_id, document) "
+            "SELECT id, setweight(to_tsvector('english', type), 'A') "
+            "|| setweight(to_tsvector('english', REPLACE(category, '_', ' ')), 'B') "
+            f"|| setweight(to_tsvector('english', {BODY_SQL}), 'C') FROM cybercrime_data"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute("DROP TABLE IF EXISTS cybercrime_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_add_chatbot_metrics_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_add_crime_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='cybercrime',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='cybercrime',
+            index=models.Index(fields=['-created_at', '-id'], name='cybercrime_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cybercrime',
+            index=models.Index(fields=['category', '-created_at', '-id'], name='cybercrime_cat_created_idx'),
+        ),
+    ]
@@ -0,0 +1,147 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:05
+
+import json
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+# Depending on how a database was set up, cybercrime_data holds some of the numbered
+# tip/step columns and possibly the original JSON lists; the migration state only
+# knows part of that, so the columns are read and dropped by introspection
+NUMBERED_COLUMNS = [f'{field}_{index}' for field in ('prevention_tip', 'reporting_step') for index in range(1, 7)]
+JSON_COLUMNS = ['prevention_tips', 'reporting_steps']
+
+
+def legacy_columns(schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        existing = {column.name for column in connection.introspection.get_table_description(cursor, 'cybercrime_data')}
+    return [column for column in NUMBERED_COLUMNS + JSON_COLUMNS if column in existing]
+
+
+def copy_guidance(apps, schema_editor):
+    CrimeGuidance = apps.get_model('main', 'CrimeGuidance')
+    columns = legacy_columns(schema_editor)
+    if not columns:
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"SELECT id, {', '.join(columns)} FROM cybercrime_data")
+        rows = cursor.fetchall()
+
+    items = []
+    for crime_id, *values in rows:
+        values = dict(zip(columns, values))
+        for kind, field in (('tip', 'prevention_tip'), ('step', 'reporting_step')):
+            listed = values.get(f'{field}s')
+            if isinstance(listed, str):
+                listed = json.loads(listed or '[]')
+            texts = list(listed or []) + [values.get(f'{field}_{index}') for index in range(1, 7)]
+            texts = [str(text).strip() for text in texts if text and str(text).strip()]
+            items += [
+                CrimeGuidance(crime_id=crime_id, kind=kind, position=position, text=text[:500])
+                for position, text in enumerate(texts, 1)
+            ]
+    CrimeGuidance.objects.bulk_create(items, batch_size=1000)
+
+
+def drop_legacy_columns(apps, schema_editor):
+    table = schema_editor.quote_name('cybercrime_data')
+    for column in legacy_columns(schema_editor):
+        schema_editor.execute(f'ALTER TABLE {table} DROP COLUMN {schema_editor.quote_name(column)}')
+
+
+def restore_legacy_columns(apps, schema_editor):
+    # Reversing brings back the columns the migration state knows about, with the
+    # guidance written into the JSON lists
+    CyberCrime = apps.get_model('main', 'CyberCrime')
+    CrimeGuidance = apps.get_model('main', 'CrimeGuidance')
+    table = schema_editor.quote_name('cybercrime_data')
+    for name in JSON_COLUMNS + ['prevention_tip_5', 'prevention_tip_6', 'reporting_step_5', 'reporting_step_6']:
+        # The historical model already has every one of these fields, so add_field() would
+        # copy the ones not yet restored from the old table; add the bare columns instead
+        field = CyberCrime._meta.get_field(name)
+        definition, params = schema_editor.column_sql(CyberCrime, field, include_default=True)
+        schema_editor.execute(f'ALTER TABLE {table} ADD COLUMN {schema_editor.quote_name(field.column)} {definition}', params)
+
+    lists = {}
+    for item in CrimeGuidance.objects.order_by('crime', 'kind', 'position'):
+        field = 'prevention_tips' if item.kind == 'tip' else 'reporting_steps'
+        lists.setdefault(item.crime_id, {}).setdefault(field, []).append(item.text)
+    for crime_id, values in lists.items():
+        CyberCrime.objects.filter(pk=crime_id).update(**values)
+
+
+def store_tip_counts(apps, schema_editor):
+    CyberCrime = apps.get_model('main', 'CyberCrime')
+    CrimeGuidance = apps.get_model('main', 'CrimeGuidance')
+    tips = CrimeGuidance.objects.filter(crime=OuterRef('pk'), kind='tip').order_by().values('crime')
+    CyberCrime.objects.update(
+        prevention_tip_count=Coalesce(Subquery(tips.annotate(count=Count('id')).values('count')), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_cybercrime_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrimeGuidance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('tip', 'Prevention Tip'), ('step', 'Reporting Step')], max_length=4)),
+                ('position', models.PositiveSmallIntegerField()),
+                ('text', models.CharField(max_length=500)),
+                ('crime', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='guidance', to='main.cybercrime')),
+            ],
+            options={
+                'db_table': 'cybercrime_guidance',
+                'ordering': ['kind', 'position'],
+                'unique_together': {('crime', 'kind', 'position')},
+            },
+        ),
+        migrations.RunPython(copy_guidance, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(drop_legacy_columns, restore_legacy_columns),
+            ],
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='cybercrime',
+                    name='prevention_tips',
+                ),
+                migrations.RemoveField(
+                    model_name='cybercrime',
+                    name='reporting_steps',
+                ),
+                migrations.RemoveField(
+                    model_name='cybercrime',
+                    name='prevention_tip_5',
+                ),
+                migrations.RemoveField(
+                    model_name='cybercrime',
+                    name='prevention_tip_6',
+                ),
+                migrations.RemoveField(
+                    model_name='cybercrime',
+                    name='reporting_step_5',
+                ),
+                migrations.RemoveField(
+                    model_name='cybercrime',
+                    name='reporting_step_6',
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='cybercrime',
+            name='prevention_tip_count',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(store_tip_counts, migrations.RunPython.noop),
+    ]
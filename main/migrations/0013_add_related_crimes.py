@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_crime_guidance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedCrime',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('crime', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_crimes', to='main.cybercrime')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.cybercrime')),
+            ],
+            options={
+                'db_table': 'cybercrime_related',
+                'ordering': ['rank'],
+                'unique_together': {('crime', 'rank')},
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_add_related_crimes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cybercrime',
+            name='trending_hour',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='cybercrime',
+            name='trending_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.CreateModel(
+            name='CrimeViewBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('crime', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_buckets', to='main.cybercrime')),
+            ],
+            options={
+                'db_table': 'cybercrime_view_buckets',
+                'ordering': ['-hour'],
+                'unique_together': {('crime', 'hour')},
+            },
+        ),
+    ]
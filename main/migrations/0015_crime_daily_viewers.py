@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0014_crime_view_buckets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrimeDailyViewers',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('registers', models.BinaryField(default=bytes, help_text='One byte per HyperLogLog register')),
+                ('crime', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_viewers', to='main.cybercrime')),
+            ],
+            options={
+                'db_table': 'cybercrime_daily_viewers',
+                'ordering': ['-day'],
+                'unique_together': {('crime', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_crime_daily_viewers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatbotmetricsrollup',
+            name='widget_opens',
+            field=models.IntegerField(default=0, help_text='Chatbot widget opens reported by the analytics beacon'),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:40
+
+from django.db import migrations, models
+
+
+def copy_histograms(apps, schema_editor):
+    ChatbotMetricsRollup = apps.get_model('main', 'ChatbotMetricsRollup')
+    for rollup in ChatbotMetricsRollup.objects.all():
+        for index, count in enumerate(rollup.latency_histogram[:11]):
+            setattr(rollup, f'latency_{index}', count)
+        rollup.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0017_chat_session_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatbotmetricsrollup',
+            name='latency_0',
+            field=models.IntegerField(default=0, help_text='Responses up to 0.25 s'),
+        ),
+        migrations.AddField(
+            model_name='chatbotmetricsrollup',
+            name='latency_1',
+            field=models.IntegerField(default=0, help_text='Responses up to 0.5 s'),
+        ),
+        migrations.AddField(
+            model_name='chatbotmetricsrollup',
+            name='latency_2',
+            field=models.IntegerField(default=0, help_text='Responses up to 1 s'),
+        ),
+        migrations.AddField(
+            model_name='chatbotmetricsrollup',
+            name='latency_3',
+            field=models.IntegerField(default=0, help_text='Responses up to 2 s'),
+        ),
+        migrations.AddField(
+            model_name='chatbotmetricsrollup',
+            name='latency_4',
+            field=models.IntegerField(default=0, help_text='Responses up to 3 s'),
+        ),
+        migrations.AddField(
+            model_name='chatbotmetricsrollup',
+            name='latency_5',
+            field=models.IntegerField(default=0, help_text='Responses up to 5 s'),
+        ),
+        migrations.AddField(
+            model_name='chatbotmetricsrollup',
+            name='latency_6',
+            field=models.IntegerField(default=0, help_text='Responses up to 8 s'),
+        ),
+        migrations.AddField(
+            model_name='chatbotmetricsrollup',
+            name='latency_7',
+            field=models.IntegerField(default=0, help_text='Responses up to 13 s'),
+        ),
+        migrations.AddField(
+            model_name='chatbotmetricsrollup',
+            name='latency_8',
+            field=models.IntegerField(default=0, help_text='Responses up to 20 s'),
+        ),
+        migrations.AddField(
+            model_name='chatbotmetricsrollup',
+            name='latency_9',
+            field=models.IntegerField(default=0, help_text='Responses up to 30 s'),
+        ),
+        migrations.AddField(
+            model_name='chatbotmetricsrollup',
+            name='latency_10',
+            field=models.IntegerField(default=0, help_text='Responses over 30 s'),
+        ),
+        migrations.RunPython(copy_histograms, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='chatbotmetricsrollup',
+            name='latency_histogram',
+        ),
+    ]
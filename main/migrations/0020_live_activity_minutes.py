@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0019_catalog_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiveActivityMinute',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minute', models.IntegerField(help_text='Minutes since the Unix epoch', unique=True)),
+                ('conversations', models.IntegerField(default=0)),
+                ('conversation_failures', models.IntegerField(default=0)),
+                ('clicks', models.IntegerField(default=0)),
+                ('views', models.IntegerField(default=0)),
+                ('widget_opens', models.IntegerField(default=0)),
+                ('audit_events', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'live_activity_minutes',
+            },
+        ),
+    ]
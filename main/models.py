@@ -1,6 +1,13 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.conf import settings
+from django.core import signing
+from django.db import IntegrityError, transaction
+from django.db.models import F, prefetch_related_objects
 from django.utils import timezone
+from datetime import timedelta
+import re
+import secrets
 import uuid
 
 
@@ -42,82 +49,167 @@ class CyberCrime(models.Model):
         ('cryptocurrency', 'Cryptocurrency Fraud'),
     ]
 
+    # Columns the listing pages render, loaded with only() instead of whole rows
+    LISTING_FIELDS = (
+        'id', 'type', 'description', 'category', 'severity',
+        'prevention_tip_count', 'learn_more_clicks', 'created_at',
+    )
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     type = models.CharField(max_length=200)
     description = models.TextField()
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES)
     severity = models.CharField(max_length=20, choices=SEVERITY_CHOICES)
     
-    # Prevention Tips - Individual fields
-    prevention_tip_1 = models.CharField(max_length=500, blank=True, null=True)
-    prevention_tip_2 = models.CharField(max_length=500, blank=True, null=True)
-    prevention_tip_3 = models.CharField(max_length=500, blank=True, null=True)
-    prevention_tip_4 = models.CharField(max_length=500, blank=True, null=True)
-    prevention_tip_5 = models.CharField(max_length=500, blank=True, null=True)
-    prevention_tip_6 = models.CharField(max_length=500, blank=True, null=True)
-    
-    # Reporting Steps - Individual fields
-    reporting_step_1 = models.CharField(max_length=500, blank=True, null=True)
-    reporting_step_2 = models.CharField(max_length=500, blank=True, null=True)
-    reporting_step_3 = models.CharField(max_length=500, blank=True, null=True)
-    reporting_step_4 = models.CharField(max_length=500, blank=True, null=True)
-    reporting_step_5 = models.CharField(max_length=500, blank=True, null=True)
-    reporting_step_6 = models.CharField(max_length=500, blank=True, null=True)
+    # Stored so listings can show it without loading the tips themselves
+    prevention_tip_count = models.PositiveSmallIntegerField(default=0)
     
     learn_more_clicks = models.IntegerField(default=0)
+    # Exponentially decayed view count as of trending_hour (hours since the Unix epoch); see main.trending
+    trending_score = models.FloatField(default=0)
+    trending_hour = models.IntegerField(default=0, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'cybercrime_data'
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # Keyset pagination of the listings, newest first, overall and per category
+            models.Index(fields=['-created_at', '-id'], name='cybercrime_created_idx'),
+            models.Index(fields=['category', '-created_at', '-id'], name='cybercrime_cat_created_idx'),
+        ]
 
     def __str__(self):
         return self.type
     
-    def get_prevention_tips_count(self):
-        """Count non-empty prevention tips"""
-        count = 0
-        if self.prevention_tip_1: count += 1
-        if self.prevention_tip_2: count += 1
-        if self.prevention_tip_3: count += 1
-        if self.prevention_tip_4: count += 1
-        if self.prevention_tip_5: count += 1
-        if self.prevention_tip_6: count += 1
-        return count
-    
-    def get_reporting_steps_count(self):
-        """Count non-empty reporting steps"""
-        count = 0
-        if self.reporting_step_1: count += 1
-        if self.reporting_step_2: count += 1
-        if self.reporting_step_3: count += 1
-        if self.reporting_step_4: count += 1
-        if self.reporting_step_5: count += 1
-        if self.reporting_step_6: count += 1
-        return count
-    
     def get_prevention_tips_list(self):
-        """Get prevention tips as a list"""
-        tips = []
-        if self.prevention_tip_1: tips.append(self.prevention_tip_1)
-        if self.prevention_tip_2: tips.append(self.prevention_tip_2)
-        if self.prevention_tip_3: tips.append(self.prevention_tip_3)
-        if self.prevention_tip_4: tips.append(self.prevention_tip_4)
-        if self.prevention_tip_5: tips.append(self.prevention_tip_5)
-        if self.prevention_tip_6: tips.append(self.prevention_tip_6)
-        return tips
+        """Get prevention tips as a list (prefetch 'guidance' to avoid a query per crime)"""
+        return self._guidance_texts(CrimeGuidance.TIP)
     
     def get_reporting_steps_list(self):
-        """Get reporting steps as a list"""
-        steps = []
-        if self.reporting_step_1: steps.append(self.reporting_step_1)
-        if self.reporting_step_2: steps.append(self.reporting_step_2)
-        if self.reporting_step_3: steps.append(self.reporting_step_3)
-        if self.reporting_step_4: steps.append(self.reporting_step_4)
-        if self.reporting_step_5: steps.append(self.reporting_step_5)
-        if self.reporting_step_6: steps.append(self.reporting_step_6)
-        return steps
+        """Get reporting steps as a list (prefetch 'guidance' to avoid a query per crime)"""
+        return self._guidance_texts(CrimeGuidance.STEP)
+
+    def _guidance_texts(self, kind):
+        # One query loads both tips and steps unless they were prefetched already
+        prefetch_related_objects([self], 'guidance')
+        return [item.text for item in self.guidance.all() if item.kind == kind]
+
+    def save_with_guidance(self, prevention_tips, reporting_steps):
+        """Save the crime together with its ordered prevention tips and reporting steps"""
+        adding = self._state.adding
+        items = [
+            CrimeGuidance(crime=self, kind=kind, position=position, text=text)
+            for kind, texts in ((CrimeGuidance.TIP, prevention_tips), (CrimeGuidance.STEP, reporting_steps))
+            for position, text in enumerate(texts, 1)
+        ]
+        with transaction.atomic():
+            self.prevention_tip_count = len(prevention_tips)
+            self.save()
+            if not adding:
+                self.guidance.all().delete()
+            CrimeGuidance.objects.bulk_create(items)
+        # Drop any stale prefetched rows; the next read loads the new ones
+        getattr(self, '_prefetched_objects_cache', {}).pop('guidance', None)
+
+
+class CrimeGuidance(models.Model):
+    """One prevention tip or reporting step of a crime, in display order"""
+    TIP = 'tip'
+    STEP = 'step'
+    KIND_CHOICES = [
+        (TIP, 'Prevention Tip'),
+        (STEP, 'Reporting Step'),
+    ]
+
+    crime = models.ForeignKey(CyberCrime, on_delete=models.CASCADE, related_name='guidance')
+    kind = models.CharField(max_length=4, choices=KIND_CHOICES)
+    position = models.PositiveSmallIntegerField()
+    text = models.CharField(max_length=500)
+
+    class Meta:
+        db_table = 'cybercrime_guidance'
+        ordering = ['kind', 'position']
+        unique_together = [('crime', 'kind', 'position')]
+
+    def __str__(self):
+        return f"{self.crime_id} {self.kind} {self.position}"
+
+
+class RelatedCrime(models.Model):
+    """One of a crime's precomputed most similar crimes (TF-IDF cosine over type, description and tips)"""
+    crime = models.ForeignKey(CyberCrime, on_delete=models.CASCADE, related_name='related_crimes')
+    related = models.ForeignKey(CyberCrime, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        db_table = 'cybercrime_related'
+        ordering = ['rank']
+        unique_together = [('crime', 'rank')]
+
+    def __str__(self):
+        return f"{self.crime_id} -> {self.related_id} ({self.score:.3f})"
+
+
+class CrimeViewBucket(models.Model):
+    """Learn-more views of one crime during one hour, added as clicks are flushed"""
+    crime = models.ForeignKey(CyberCrime, on_delete=models.CASCADE, related_name='view_buckets')
+    hour = models.DateTimeField()
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'cybercrime_view_buckets'
+        ordering = ['-hour']
+        unique_together = [('crime', 'hour')]
+
+    def __str__(self):
+        return f"{self.crime_id} at {self.hour:%Y-%m-%d %H:%M}: {self.views} views"
+
+
+class CrimeDailyViewers(models.Model):
+    """HyperLogLog sketch of the distinct visitors who viewed one crime on one day (see main.viewers)"""
+    crime = models.ForeignKey(CyberCrime, on_delete=models.CASCADE, related_name='daily_viewers')
+    day = models.DateField()
+    registers = models.BinaryField(default=bytes, help_text="One byte per HyperLogLog register")
+
+    class Meta:
+        db_table = 'cybercrime_daily_viewers'
+        ordering = ['-day']
+        unique_together = [('crime', 'day')]
+
+    def __str__(self):
+        return f"{self.crime_id} on {self.day:%Y-%m-%d}"
+
+
+class CatalogVersion(models.Model):
+    """Single row counting crime catalog changes, shared by every worker (see main.page_cache)"""
+    version = models.BigIntegerField(default=0)
+    bumped_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'cybercrime_catalog_version'
+
+    def __str__(self):
+        return f"Catalog version {self.version}"
+
+
+class LiveActivityMinute(models.Model):
+    """Site activity during one minute, summed for the admin live activity strip (see main.live)"""
+    minute = models.IntegerField(unique=True, help_text="Minutes since the Unix epoch")
+    conversations = models.IntegerField(default=0)
+    conversation_failures = models.IntegerField(default=0)
+    clicks = models.IntegerField(default=0)
+    views = models.IntegerField(default=0)
+    widget_opens = models.IntegerField(default=0)
+    audit_events = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'live_activity_minutes'
+
+    def __str__(self):
+        return f"Live activity for minute {self.minute}"
 
 
 class ChatbotConfig(models.Model):
@@ -137,17 +229,142 @@ class ChatbotConfig(models.Model):
         return f"Chatbot Config - {self.gemini_model}"
 
 
+def generate_session_token():
+    return secrets.token_urlsafe(32)
+
+
+def estimate_tokens(text):
+    """Rough token count for prompt budgeting (about four characters per token)"""
+    return len(text) // 4 + 1
+
+
+class ChatSession(models.Model):
+    """Server-side chatbot session with a bounded conversation history.
+
+    Recent turns are kept verbatim up to CHATBOT_HISTORY_TOKENS; older turns are
+    compacted into a rolling summary capped at CHATBOT_SUMMARY_TOKENS, so the
+    prompt stays roughly the same size however long the conversation runs.
+
+    A session is only written once it has a follow-up question: until then its
+    first turn travels in a signed client token, so one-off questions cost no
+    write. Sessions idle for CHATBOT_SESSION_TTL seconds expire.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    token = models.CharField(max_length=64, unique=True, default=generate_session_token)
+    summary = models.TextField(blank=True, default='')
+    turns = models.JSONField(default=list)
+    turn_count = models.IntegerField(default=0)
+    version = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    SIGNING_SALT = 'chatbot-session'
+    SAVE_ATTEMPTS = 5
+
+    class Meta:
+        db_table = 'chatbot_sessions'
+
+    def __str__(self):
+        return f"Chat session {self.id} ({self.turn_count} turns)"
+
+    @staticmethod
+    def expiry_cutoff():
+        """Sessions last updated before this have expired"""
+        return timezone.now() - timedelta(seconds=settings.CHATBOT_SESSION_TTL)
+
+    @classmethod
+    def from_client_token(cls, client_token):
+        """Session for a token sent by the client, or a new unsaved one if it is unknown or expired"""
+        try:
+            pending = signing.loads(client_token, salt=cls.SIGNING_SALT, max_age=settings.CHATBOT_SESSION_TTL)
+        except signing.BadSignature:
+            pending = None
+        token = pending['token'] if pending else client_token
+        session = cls.objects.filter(token=token, updated_at__gte=cls.expiry_cutoff()).first()
+        if session:
+            return session
+        if pending:
+            return cls(token=token, summary=pending['summary'], turns=pending['turns'], turn_count=pending['turn_count'])
+        return cls()
+
+    @property
+    def client_token(self):
+        """Token to send back to the client: the session token, or the signed history while unsaved"""
+        if not self._state.adding:
+            return self.token
+        return signing.dumps(
+            {'token': self.token, 'summary': self.summary, 'turns': self.turns, 'turn_count': self.turn_count},
+            salt=self.SIGNING_SALT, compress=True
+        )
+
+    def add_turn(self, user_message, bot_response):
+        """Record a completed turn, compact old turns and save once the session has a follow-up.
+
+        Saved sessions are updated with a compare-and-set on version; if
+        another request updated the session first, its turns are reloaded and
+        this turn is applied on top, so concurrent turns are never lost.
+        """
+        for _ in range(self.SAVE_ATTEMPTS):
+            turns, summary, turn_count = list(self.turns), self.summary, self.turn_count
+            self._append(user_message, bot_response)
+            if self._state.adding:
+                if self.turn_count < 2:
+                    return
+                try:
+                    with transaction.atomic():
+                        self.version = 1
+                        self.save()
+                    return
+                except IntegrityError:
+                    # Another follow-up from the same first turn saved the session first
+                    self.pk = ChatSession.objects.get(token=self.token).pk
+                    self._state.adding = False
+            elif ChatSession.objects.filter(pk=self.pk, version=self.version).update(
+                summary=self.summary, turns=self.turns, turn_count=self.turn_count,
+                version=F('version') + 1, updated_at=timezone.now()
+            ):
+                self.version += 1
+                return
+            self.turns, self.summary, self.turn_count = turns, summary, turn_count
+            self.refresh_from_db(fields=['summary', 'turns', 'turn_count', 'version'])
+        raise RuntimeError(f'Chat session {self.pk} kept changing; turn not saved')
+
+    def _append(self, user_message, bot_response):
+        self.turns = self.turns + [{'user': user_message, 'assistant': bot_response}]
+        self.turn_count += 1
+
+        while len(self.turns) > 1 and sum(
+            estimate_tokens(turn['user']) + estimate_tokens(turn['assistant']) for turn in self.turns
+        ) > settings.CHATBOT_HISTORY_TOKENS:
+            self._compact(self.turns.pop(0))
+
+    def _compact(self, turn):
+        # Keep the question and the opening sentence of the answer
+        answer = re.split(r'(?<=[.!?])\s', turn['assistant'].strip(), maxsplit=1)[0]
+        line = f"- User asked: {turn['user'][:200]} / Assistant: {answer[:200]}"
+        lines = [entry for entry in self.summary.split('\n') if entry] + [line]
+
+        # Drop the oldest summary lines once the summary is over budget
+        while len(lines) > 1 and estimate_tokens('\n'.join(lines)) > settings.CHATBOT_SUMMARY_TOKENS:
+            lines.pop(0)
+        self.summary = '\n'.join(lines)
+
+
 class ChatbotConversation(models.Model):
     """Model for tracking chatbot conversations"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user_message = models.TextField()
     bot_response = models.TextField()
     response_time = models.FloatField(help_text="Response time in seconds")
+    first_token_time = models.FloatField(blank=True, null=True, help_text="Time to first streamed token in seconds")
     success = models.BooleanField(default=True)
+    cache_hit = models.BooleanField(default=False)
+    session = models.ForeignKey(ChatSession, on_delete=models.SET_NULL, blank=True, null=True, related_name='conversations')
+    prompt_tokens = models.IntegerField(blank=True, null=True, help_text="Estimated prompt size in tokens")
     error_message = models.TextField(blank=True, null=True)
     ip_address = models.GenericIPAddressField(blank=True, null=True)
     user_agent = models.TextField(blank=True, null=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         db_table = 'chatbot_conversations'
@@ -157,6 +374,84 @@ class ChatbotConversation(models.Model):
         return f"Conversation {self.id} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
 
 
+class ChatbotMetricsRollup(models.Model):
+    """Hourly and daily chatbot conversation aggregates, updated as conversations are logged"""
+    PERIOD_CHOICES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+    # Upper bounds (seconds) of the response time histogram buckets; one more bucket holds slower replies
+    LATENCY_BOUNDS = [0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30]
+
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    bucket_start = models.DateTimeField()
+    conversations = models.IntegerField(default=0)
+    successes = models.IntegerField(default=0)
+    latency_sum = models.FloatField(default=0, help_text="Sum of successful response times in seconds")
+    # Successful responses per LATENCY_BOUNDS bucket, one column each so flushes can add to them with F()
+    latency_0 = models.IntegerField(default=0, help_text="Responses up to 0.25 s")
+    latency_1 = models.IntegerField(default=0, help_text="Responses up to 0.5 s")
+    latency_2 = models.IntegerField(default=0, help_text="Responses up to 1 s")
+    latency_3 = models.IntegerField(default=0, help_text="Responses up to 2 s")
+    latency_4 = models.IntegerField(default=0, help_text="Responses up to 3 s")
+    latency_5 = models.IntegerField(default=0, help_text="Responses up to 5 s")
+    latency_6 = models.IntegerField(default=0, help_text="Responses up to 8 s")
+    latency_7 = models.IntegerField(default=0, help_text="Responses up to 13 s")
+    latency_8 = models.IntegerField(default=0, help_text="Responses up to 20 s")
+    latency_9 = models.IntegerField(default=0, help_text="Responses up to 30 s")
+    latency_10 = models.IntegerField(default=0, help_text="Responses over 30 s")
+    prompt_tokens_sum = models.IntegerField(default=0)
+    prompt_turns = models.IntegerField(default=0, help_text="Conversations with a recorded prompt size")
+    widget_opens = models.IntegerField(default=0, help_text="Chatbot widget opens reported by the analytics beacon")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'chatbot_metrics_rollups'
+        ordering = ['-bucket_start']
+        unique_together = [('period', 'bucket_start')]
+
+    def __str__(self):
+        return f"{self.get_period_display()} from {self.bucket_start:%Y-%m-%d %H:%M}: {self.conversations} conversations"
+
+    HISTOGRAM_FIELDS = [f'latency_{index}' for index in range(len(LATENCY_BOUNDS) + 1)]
+    # Columns derived from ChatbotConversation records, which rebuild_chatbot_rollups recomputes
+    CONVERSATION_FIELDS = [
+        'conversations', 'successes', 'latency_sum', *HISTOGRAM_FIELDS, 'prompt_tokens_sum', 'prompt_turns',
+    ]
+
+    @property
+    def latency_histogram(self):
+        """Successful response counts per latency bucket"""
+        return [getattr(self, name) for name in self.HISTOGRAM_FIELDS]
+
+    @classmethod
+    def latency_bucket(cls, seconds):
+        """Index of the histogram bucket for a response time"""
+        for index, bound in enumerate(cls.LATENCY_BOUNDS):
+            if seconds <= bound:
+                return index
+        return len(cls.LATENCY_BOUNDS)
+
+    @classmethod
+    def latency_percentile(cls, histogram, fraction):
+        """Estimate a response time percentile from histogram counts, interpolating within a bucket"""
+        total = sum(histogram)
+        if not total:
+            return 0.0
+
+        target = fraction * total
+        seen = 0
+        for index, count in enumerate(histogram):
+            if count and seen + count >= target:
+                lower = cls.LATENCY_BOUNDS[index - 1] if index else 0.0
+                if index >= len(cls.LATENCY_BOUNDS):
+                    return float(lower)
+                upper = cls.LATENCY_BOUNDS[index]
+                return lower + (upper - lower) * (target - seen) / count
+            seen += count
+        return float(cls.LATENCY_BOUNDS[-1])
+
+
 class AuditLog(models.Model):
     """Model for storing admin action audit logs"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
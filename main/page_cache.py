@@ -0,0 +1,177 @@
+import hashlib
+import re
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db.models import F
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .models import CatalogVersion, CyberCrime
+
+
+# The CSRF token rendered into cached pages is swapped for the visitor's own on every hit
+CSRF_INPUT = re.compile(rb'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+CSRF_PLACEHOLDER = b'__catalog_csrf_token__'
+
+
+class CatalogCache:
+    """Page and fragment cache for views built from the crime catalog.
+
+    Every key includes the catalog version, a counter in a single database row
+    (CatalogVersion) that CyberCrime save/delete signals bump, so an admin edit
+    retires all cached pages and fragments at once in every worker, whatever
+    cache backend CACHES uses. Each worker re-reads the row at most every
+    `poll` seconds and at once after its own bumps. The timeout only bounds
+    how stale learn-more click counts, which don't bump the version, can get
+    in the trending block.
+    """
+
+    def __init__(self, timeout=300, poll=1.0):
+        self.timeout = timeout
+        self.poll = poll
+        self._state = None  # (version, bumped_at, read at)
+        self._lock = threading.Lock()
+        self._hits = Counter()
+        self._misses = Counter()
+
+    def state(self):
+        """(version, time of the last bump) of the catalog"""
+        state = self._state
+        if state is None or time.monotonic() - state[2] >= self.poll:
+            row = CatalogVersion.objects.filter(pk=1).values_list('version', 'bumped_at').first()
+            if row is None:
+                # Start from the clock so a recreated row never brings back entries cached under old numbers
+                created = CatalogVersion.objects.get_or_create(pk=1, defaults={'version': int(time.time() * 1000)})[0]
+                row = (created.version, created.bumped_at)
+            state = (*row, time.monotonic())
+            self._state = state
+        return state[:2]
+
+    def version(self):
+        return self.state()[0]
+
+    def bumped_at(self):
+        return self.state()[1]
+
+    def bump(self):
+        self._state = None
+        if not CatalogVersion.objects.filter(pk=1).update(version=F('version') + 1, bumped_at=timezone.now()):
+            self.state()  # Creating the row starts a new version too
+
+    def key(self, section, *parts):
+        digest = hashlib.md5(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+        return f'catalog:{self.version()}:{section}:{digest}'
+
+    def get(self, section, *parts):
+        value = cache.get(self.key(section, *parts))
+        with self._lock:
+            if value is None:
+                self._misses[section] += 1
+            else:
+                self._hits[section] += 1
+        return value
+
+    def set(self, section, value, *parts):
+        cache.set(self.key(section, *parts), value, self.timeout)
+
+    def get_or_set(self, section, build, *parts):
+        value = self.get(section, *parts)
+        if value is None:
+            value = build()
+            self.set(section, value, *parts)
+        return value
+
+    def stats(self):
+        """Per-process hits, misses and hit rate for each cached section"""
+        with self._lock:
+            sections = sorted(set(self._hits) | set(self._misses))
+            stats = []
+            for section in sections:
+                lookups = self._hits[section] + self._misses[section]
+                stats.append({
+                    'section': section,
+                    'hits': self._hits[section],
+                    'misses': self._misses[section],
+                    'hit_rate': round(self._hits[section] / lookups * 100) if lookups else 0,
+                })
+            return stats
+
+
+catalog_cache = CatalogCache(timeout=settings.CATALOG_CACHE_TIMEOUT, poll=settings.CATALOG_VERSION_POLL)
+
+
+def cache_catalog_page(view):
+    """Serve whole pages from the catalog cache to anonymous GET requests"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        # Signed-in admins see their own navigation, and flash messages belong to one visitor
+        if request.method != 'GET' or request.user.is_authenticated or len(get_messages(request)):
+            return view(request, *args, **kwargs)
+
+        cached = catalog_cache.get('page', request.get_full_path())
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(
+                content.replace(CSRF_PLACEHOLDER, get_token(request).encode()), content_type=content_type
+            )
+
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            content = CSRF_INPUT.sub(rb'\g<1>' + CSRF_PLACEHOLDER + rb'\g<2>', response.content)
+            catalog_cache.set('page', (content, response['Content-Type']), request.get_full_path())
+        return response
+    return wrapper
+
+
+def conditional_crime_view(*fields):
+    """Answer conditional GETs for a crime view (crime_id URL argument) with 304 Not Modified.
+
+    The ETag hashes the crime's updated_at plus any extra fields, the catalog
+    version and whether the visitor is signed in. Last-Modified is the later of
+    updated_at and the last catalog version bump, since the page also shows
+    catalog-wide content such as related crimes. Both come from one query for
+    just those columns, and responses ask clients to revalidate each time so
+    repeat requests become cheap 304s.
+    """
+    columns = ('updated_at', *fields)
+
+    def crime_state(request, crime_id):
+        # condition() asks for the ETag and Last-Modified separately; look the row up once
+        if not hasattr(request, '_crime_state'):
+            request._crime_state = CyberCrime.objects.filter(pk=crime_id).values_list(*columns).first()
+        return request._crime_state
+
+    def etag(request, crime_id):
+        state = crime_state(request, crime_id)
+        if state is None:
+            return None
+        parts = [crime_id, catalog_cache.version(), request.user.is_authenticated, *state]
+        # Weak: the page body differs per visitor by its CSRF token
+        return 'W/"%s"' % hashlib.md5(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+    def last_modified(request, crime_id):
+        state = crime_state(request, crime_id)
+        return max(state[0], catalog_cache.bumped_at()) if state else None
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
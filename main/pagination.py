@@ -0,0 +1,144 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+
+# Newest first; every ordering must end in a unique column so each row has one position
+DEFAULT_ORDER = ('-created_at', '-id')
+
+
+def _cursor_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def encode_cursor(direction, row, order=DEFAULT_ORDER):
+    """Opaque cursor for the position just after ('n') or before ('p') row in `order`"""
+    values = [_cursor_value(getattr(row, name.lstrip('-'))) for name in order]
+    payload = json.dumps([direction, *values])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, model, order=DEFAULT_ORDER):
+    """Return (direction, values in `order`) or None for a missing or malformed cursor.
+
+    Values of model fields are parsed with the field's to_python(); values of
+    annotations in `order` are used as they came.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, *raw_values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if direction not in ('n', 'p') or len(raw_values) != len(order):
+            return None
+        values = []
+        for name, raw in zip(order, raw_values):
+            try:
+                field = model._meta.get_field(name.lstrip('-'))
+            except FieldDoesNotExist:
+                values.append(raw)
+                continue
+            value = field.to_python(raw)
+            if value is None:
+                return None
+            values.append(value)
+    except (ValueError, TypeError, AttributeError, ValidationError):
+        return None
+    return direction, values
+
+
+class KeysetPage:
+    """One page of an ordered listing, addressed by cursor instead of page number"""
+
+    def __init__(self, object_list, has_next, has_previous, query, order=DEFAULT_ORDER):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self._query = query
+        self._order = order
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    @property
+    def next_cursor(self):
+        return encode_cursor('n', self.object_list[-1], self._order) if self.has_next else None
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor('p', self.object_list[0], self._order) if self.has_previous else None
+
+    def next_query(self):
+        return self._query_with(self.next_cursor)
+
+    def previous_query(self):
+        return self._query_with(self.previous_cursor)
+
+    def _query_with(self, cursor):
+        query = self._query.copy()
+        query.pop('page', None)
+        query['cursor'] = cursor
+        return query.urlencode()
+
+
+def _after(order, values):
+    """Filter for rows after `values` in `order` (a row-value comparison spelled out with Q)"""
+    first, value = order[0], values[0]
+    # The plain range on the first column lets the database seek an index on it to the
+    # cursor; the OR alone would make it walk the index from the start
+    condition = Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": value})
+    either = Q()
+    equal = Q()
+    for name, value in zip(order, values):
+        field = name.lstrip('-')
+        either |= equal & Q(**{f"{field}__{'lt' if name.startswith('-') else 'gt'}": value})
+        equal &= Q(**{field: value})
+    return condition & either
+
+
+def _reverse(order):
+    return tuple(name[1:] if name.startswith('-') else f'-{name}' for name in order)
+
+
+def keyset_paginate(queryset, request, per_page, order=DEFAULT_ORDER):
+    """Page through queryset in `order` (newest first by default) using the request's cursor.
+
+    Each page is a single range query of per_page + 1 rows, so deep pages
+    cost the same as the first and no COUNT(*) is needed. Columns in `order`
+    may be annotations on queryset.
+    """
+    position = decode_cursor(request.GET.get('cursor'), queryset.model, order)
+
+    if position is None:
+        return _first_page(queryset, request, per_page, order)
+
+    direction, values = position
+    if direction == 'n':
+        rows = list(queryset.filter(_after(order, values)).order_by(*order)[:per_page + 1])
+        return KeysetPage(rows[:per_page], len(rows) > per_page, True, request.GET, order)
+
+    backwards = _reverse(order)
+    rows = list(queryset.filter(_after(backwards, values)).order_by(*backwards)[:per_page + 1])
+    if len(rows) <= per_page:
+        # Paging back reached the first rows; show a full first page instead of a short one
+        return _first_page(queryset, request, per_page, order)
+    return KeysetPage(rows[:per_page][::-1], True, True, request.GET, order)
+
+
+def _first_page(queryset, request, per_page, order):
+    rows = list(queryset.order_by(*order)[:per_page + 1])
+    return KeysetPage(rows[:per_page], len(rows) > per_page, False, request.GET, order)
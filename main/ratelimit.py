@@ -0,0 +1,145 @@
+import math
+import random
+import threading
+import time
+import uuid
+from functools import wraps
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.http import JsonResponse
+
+from .utils import get_client_ip
+
+
+class TokenBucketLimiter:
+    """Per-client token bucket, stored as a GCRA "theoretical arrival time".
+
+    Each client may burst up to `burst` requests and then gets one more every
+    1 / refill_rate seconds. Keeping a single timestamp per client makes a
+    check one dictionary (or cache) read and write. With cache_alias set the
+    state lives in that Django cache so limits hold across worker processes;
+    concurrent requests from one client may race between the read and write,
+    which can let a request or two past the limit but never blocks one unfairly.
+    """
+
+    def __init__(self, burst, refill_rate, cache_alias=None, max_clients=10000):
+        if burst < 1 or refill_rate <= 0:
+            raise ImproperlyConfigured(
+                'CHATBOT_RATE_LIMIT_BURST must be at least 1 and CHATBOT_RATE_LIMIT_REFILL greater than 0'
+            )
+        self.burst = burst
+        self.interval = 1.0 / refill_rate
+        self.cache_alias = cache_alias
+        # Buckets idle for burst * interval are full again, so they can expire
+        self._ttl = burst * self.interval
+        self._local = TTLCache(maxsize=max_clients, ttl=self._ttl)
+        self._lock = threading.Lock()
+
+    def check(self, client_key):
+        """Take a token for client_key; return 0 if allowed, else seconds to wait"""
+        key = f'chatbot-ratelimit:{client_key}'
+
+        if self.cache_alias:
+            cache = caches[self.cache_alias]
+            retry_after, tat = self._take(cache.get(key), time.time())
+            if not retry_after:
+                cache.set(key, tat, timeout=math.ceil(self._ttl) + 1)
+            return retry_after
+
+        with self._lock:
+            retry_after, tat = self._take(self._local.get(key), time.time())
+            if not retry_after:
+                self._local[key] = tat
+            return retry_after
+
+    def _take(self, tat, now):
+        tat = max(tat or now, now) + self.interval
+        allow_at = tat - self.burst * self.interval
+        if now < allow_at:
+            return allow_at - now, None
+        return 0, tat
+
+
+class UpstreamSlots:
+    """Cap on concurrent upstream Gemini calls.
+
+    Uses a per-process semaphore, or, when cache_alias is set so the cap
+    applies across workers, one lease key per slot in that shared Django
+    cache. acquire() claims a free slot key with cache.add() and returns a
+    handle that release() deletes, so there is no shared counter to drift. A
+    lease expires after lease_timeout seconds, which frees the slots of a
+    worker that died while holding them; a call outliving its lease may let
+    one extra call through, but never blocks a slot for good.
+    """
+
+    cache_key = 'chatbot-upstream-slot'
+
+    def __init__(self, limit, cache_alias=None, lease_timeout=120):
+        if limit < 1:
+            raise ImproperlyConfigured('CHATBOT_MAX_CONCURRENT_UPSTREAM must be at least 1')
+        self.limit = limit
+        self.cache_alias = cache_alias
+        self.lease_timeout = lease_timeout
+        self._semaphore = threading.BoundedSemaphore(limit)
+
+    def acquire(self):
+        """Claim a slot without waiting; return a handle for release(), or None if all slots are busy"""
+        if not self.cache_alias:
+            return True if self._semaphore.acquire(blocking=False) else None
+
+        cache = caches[self.cache_alias]
+        lease = uuid.uuid4().hex
+        # Start at a random slot so concurrent callers rarely race for the same key
+        first = random.randrange(self.limit)
+        for offset in range(self.limit):
+            key = f'{self.cache_key}:{(first + offset) % self.limit}'
+            if cache.add(key, lease, timeout=self.lease_timeout):
+                return key, lease
+        return None
+
+    def release(self, slot):
+        if not self.cache_alias:
+            self._semaphore.release()
+            return
+
+        key, lease = slot
+        cache = caches[self.cache_alias]
+        # An expired lease may have been claimed by another call since; leave that one alone
+        if cache.get(key) == lease:
+            cache.delete(key)
+
+
+chatbot_limiter = TokenBucketLimiter(
+    burst=settings.CHATBOT_RATE_LIMIT_BURST,
+    refill_rate=settings.CHATBOT_RATE_LIMIT_REFILL,
+    cache_alias=settings.CHATBOT_RATE_LIMIT_CACHE,
+)
+
+upstream_slots = UpstreamSlots(
+    limit=settings.CHATBOT_MAX_CONCURRENT_UPSTREAM,
+    cache_alias=settings.CHATBOT_RATE_LIMIT_CACHE,
+)
+
+
+def too_many_requests(message, retry_after):
+    """429 JSON reply in the chatbot's response format with a Retry-After header"""
+    response = JsonResponse({'response': message}, status=429)
+    response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def chatbot_rate_limit(view):
+    """Reject chatbot requests from clients that have used up their token bucket"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        retry_after = chatbot_limiter.check(get_client_ip(request) or 'unknown')
+        if retry_after:
+            return too_many_requests(
+                'You are sending messages too quickly. Please wait a moment and try again.',
+                retry_after
+            )
+        return view(request, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,284 @@
+import math
+import threading
+from collections import Counter, defaultdict
+from heapq import nlargest
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from .models import CrimeGuidance, CyberCrime, RelatedCrime
+from .page_cache import catalog_cache
+from .retrieval import tokenize
+
+
+def crime_texts(crime_ids):
+    """Type, description and prevention tips of each crime, as one text per crime id"""
+    texts = {
+        crime_id: f'{crime_type} {description}'
+        for crime_id, crime_type, description in
+        CyberCrime.objects.filter(pk__in=crime_ids).values_list('id', 'type', 'description')
+    }
+    tips = CrimeGuidance.objects.filter(crime_id__in=crime_ids, kind=CrimeGuidance.TIP).values_list('crime_id', 'text')
+    for crime_id, text in tips:
+        texts[crime_id] += f' {text}'
+    return texts
+
+
+class RelatedCrimeIndex:
+    """TF-IDF vectors of crime text with cosine nearest-neighbour search.
+
+    Term counts are kept per crime and re-counted only for crimes whose
+    updated_at changed, so incremental refreshes don't re-read the catalog.
+    Candidates come from a pruned inverted index (each crime is matched
+    through its highest-weighted terms, and each term keeps only its
+    highest-weighted crimes) and the best of them are rescored with the full
+    vectors, which bounds the work per crime regardless of catalog size.
+    Once built, edits re-weight only the edited crime; the other vectors
+    keep their slightly older idf until the next full build.
+    """
+
+    terms_per_crime = 16
+    postings_per_term = 200
+    rescore = 50
+
+    def __init__(self):
+        self._counts = {}      # crime_id -> Counter of tokens
+        self._updated = {}     # crime_id -> updated_at the counts were taken at
+        self._df = Counter()   # token -> number of crimes containing it
+        self._vectors = None   # crime_id -> {token: tf-idf weight}, unit length; None until built
+        self._postings = None  # token -> [(weight, crime_id)], highest weights only
+        self._synced_at = None  # when the last sync started; None until a full sync
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __contains__(self, crime_id):
+        return crime_id in self._counts
+
+    def sync(self, crime_ids=None):
+        """Re-count crimes added or edited since the last sync and drop deleted ones.
+
+        With crime_ids, once a first full sync has loaded the catalog, only
+        those crimes and the ones updated since the last sync are read.
+        """
+        started = timezone.now()
+        if crime_ids is None or self._synced_at is None:
+            current = dict(CyberCrime.objects.values_list('id', 'updated_at'))
+            stale = [crime_id for crime_id in self._counts if crime_id not in current]
+        else:
+            current = dict(CyberCrime.objects.filter(
+                Q(pk__in=crime_ids) | Q(updated_at__gte=self._synced_at)
+            ).values_list('id', 'updated_at'))
+            stale = [crime_id for crime_id in crime_ids if crime_id not in current]
+        self._synced_at = started
+        for crime_id in stale:
+            self.discard(crime_id)
+        changed = [crime_id for crime_id, updated in current.items() if self._updated.get(crime_id) != updated]
+        for start in range(0, len(changed), 2000):
+            chunk = changed[start:start + 2000]
+            texts = crime_texts(chunk)
+            for crime_id in chunk:
+                self.add(crime_id, texts.get(crime_id, ''))
+                self._updated[crime_id] = current[crime_id]
+
+    def add(self, crime_id, text):
+        self.discard(crime_id)
+        counts = Counter(tokenize(text))
+        self._counts[crime_id] = counts
+        self._df.update(counts.keys())
+        if self._vectors is not None:
+            self._index(crime_id, self._vector(counts))
+
+    def discard(self, crime_id):
+        counts = self._counts.pop(crime_id, None)
+        self._updated.pop(crime_id, None)
+        if counts is None:
+            return
+        self._df.subtract(counts.keys())
+        for token in counts:
+            if not self._df[token]:
+                del self._df[token]
+        if self._vectors is not None:
+            for token in self._vectors.pop(crime_id, ()):
+                entries = [entry for entry in self._postings.get(token, ()) if entry[1] != crime_id]
+                if entries:
+                    self._postings[token] = entries
+                else:
+                    self._postings.pop(token, None)
+
+    def build(self):
+        """Weight every crime against the current document frequencies"""
+        total = len(self._counts)
+        idf = {token: math.log((1 + total) / (1 + df)) + 1 for token, df in self._df.items()}
+        self._vectors = {}
+        postings = defaultdict(list)
+        for crime_id, counts in self._counts.items():
+            vector = self._vector(counts, idf)
+            self._vectors[crime_id] = vector
+            for token, weight in vector.items():
+                postings[token].append((weight, crime_id))
+        self._postings = {
+            token: nlargest(self.postings_per_term, entries) if len(entries) > self.postings_per_term else entries
+            for token, entries in postings.items()
+        }
+
+    def _vector(self, counts, idf=None):
+        total = len(self._counts)
+        weights = {
+            token: (1 + math.log(count)) * (idf[token] if idf else math.log((1 + total) / (1 + self._df[token])) + 1)
+            for token, count in counts.items()
+        }
+        norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+        return {token: weight / norm for token, weight in weights.items()}
+
+    def _index(self, crime_id, vector):
+        self._vectors[crime_id] = vector
+        for token, weight in vector.items():
+            entries = self._postings.setdefault(token, [])
+            entries.append((weight, crime_id))
+            if len(entries) > self.postings_per_term:
+                entries.remove(min(entries))
+
+    def scores(self, crime_id):
+        """Cosine similarity of crime_id to its most promising candidates"""
+        if self._vectors is None:
+            self.build()
+        vector = self._vectors.get(crime_id)
+        if not vector:
+            return {}
+        partial = defaultdict(float)
+        for token, weight in nlargest(self.terms_per_crime, vector.items(), key=lambda item: item[1]):
+            for other_weight, other_id in self._postings.get(token, ()):
+                partial[other_id] += weight * other_weight
+        partial.pop(crime_id, None)
+        scores = {}
+        for other_id, _ in nlargest(self.rescore, partial.items(), key=lambda item: item[1]):
+            other = self._vectors[other_id]
+            scores[other_id] = sum(weight * other.get(token, 0) for token, weight in vector.items())
+        return scores
+
+    def neighbours(self, crime_id, k):
+        """The k most similar crimes as [(crime_id, score)], best first"""
+        return nlargest(k, self.scores(crime_id).items(), key=lambda item: item[1])
+
+    def all_neighbours(self, k):
+        self.build()
+        return {crime_id: self.neighbours(crime_id, k) for crime_id in self._vectors}
+
+
+def store_neighbours(neighbours):
+    """Replace the stored related crimes of each crime in neighbours"""
+    rows = [
+        RelatedCrime(crime_id=crime_id, related_id=related_id, rank=rank, score=round(score, 6))
+        for crime_id, related in neighbours.items()
+        for rank, (related_id, score) in enumerate(related, 1)
+    ]
+    crime_ids = list(neighbours)
+    with transaction.atomic():
+        for start in range(0, len(crime_ids), 500):
+            RelatedCrime.objects.filter(crime_id__in=crime_ids[start:start + 500]).delete()
+        RelatedCrime.objects.bulk_create(rows, batch_size=1000)
+
+
+class RelatedCrimeUpdater:
+    """Keeps the stored related crime lists current as crimes are edited.
+
+    Refreshes run on one background thread so admin saves don't wait on
+    them: schedule() only adds ids to a pending set under a short lock, and
+    the index is guarded by a separate lock held while a refresh or rebuild
+    runs. A changed crime gets a new list, and so does every crime that
+    listed it or would now rank it above its weakest stored neighbour; other
+    lists keep their slightly older scores until the next full rebuild.
+    """
+
+    def __init__(self, count=3):
+        self.count = count
+        self.index = RelatedCrimeIndex()
+        self._lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._pending = set()
+        self._running = False
+
+    def rebuild(self):
+        """Recompute every crime's related list; returns the number of crimes"""
+        with self._index_lock:
+            self.index.sync()
+            neighbours = self.index.all_neighbours(self.count)
+            with transaction.atomic():
+                RelatedCrime.objects.all().delete()
+                store_neighbours(neighbours)
+        catalog_cache.bump()
+        return len(neighbours)
+
+    def schedule(self, crime_ids):
+        with self._lock:
+            self._pending.update(crime_ids)
+            if self._running:
+                return
+            self._running = True
+        threading.Thread(target=self._run, name='related-crimes-refresh', daemon=True).start()
+
+    def refresh(self, crime_ids):
+        """Update the related lists affected by changes to crime_ids (edited, added or deleted)"""
+        with self._index_lock:
+            self._refresh(crime_ids)
+        catalog_cache.bump()
+
+    def _refresh(self, crime_ids):
+        self.index.sync(crime_ids)
+        changed = [crime_id for crime_id in crime_ids if crime_id in self.index]
+        affected = set(changed)
+        affected.update(RelatedCrime.objects.filter(related_id__in=crime_ids).values_list('crime_id', flat=True))
+
+        # Crimes the changed ones are now similar to, whose stored lists may need to make room
+        candidates = {}
+        for crime_id in changed:
+            for other_id, score in self.index.scores(crime_id).items():
+                candidates[other_id] = max(score, candidates.get(other_id, 0))
+        candidate_ids = list(candidates)
+        weakest = {}
+        for start in range(0, len(candidate_ids), 500):
+            stored = RelatedCrime.objects.filter(crime_id__in=candidate_ids[start:start + 500]).values('crime_id')
+            for row in stored.annotate(weakest=Min('score'), listed=Count('id')):
+                weakest[row['crime_id']] = (row['weakest'], row['listed'])
+        for other_id, score in candidates.items():
+            lowest, listed = weakest.get(other_id, (0, 0))
+            if listed < self.count or score > lowest:
+                affected.add(other_id)
+
+        lists = self._neighbour_lists(affected)
+        # Crimes deleted through another worker may still be in this worker's index
+        listed = {related_id for related in lists.values() for related_id, _ in related}
+        missing = listed - set(CyberCrime.objects.filter(pk__in=listed).values_list('id', flat=True))
+        if missing:
+            for crime_id in missing:
+                self.index.discard(crime_id)
+            lists = self._neighbour_lists(affected)
+        store_neighbours(lists)
+
+    def _neighbour_lists(self, crime_ids):
+        return {
+            crime_id: self.index.neighbours(crime_id, self.count)
+            for crime_id in crime_ids if crime_id in self.index
+        }
+
+    def _run(self):
+        try:
+            while True:
+                with self._lock:
+                    crime_ids, self._pending = self._pending, set()
+                    if not crime_ids:
+                        self._running = False
+                        return
+                self.refresh(crime_ids)
+        except Exception as e:
+            print(f"Failed to refresh related crimes: {e}")
+            with self._lock:
+                self._running = False
+        finally:
+            close_old_connections()
+
+
+related_crimes = RelatedCrimeUpdater(count=settings.RELATED_CRIMES_COUNT)
@@ -0,0 +1,142 @@
+import math
+import re
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+from .models import CyberCrime
+
+
+STOP_WORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'does', 'for',
+    'from', 'how', 'i', 'if', 'in', 'is', 'it', 'me', 'my', 'of', 'on', 'or',
+    'should', 'so', 'that', 'the', 'this', 'to', 'was', 'what', 'when', 'where',
+    'which', 'who', 'why', 'will', 'with', 'you', 'your',
+}
+
+
+def tokenize(text):
+    """Lowercase word tokens with stop words removed"""
+    return [word for word in re.findall(r'[a-z0-9]+', text.lower()) if word not in STOP_WORDS]
+
+
+def crime_document(crime):
+    """Text indexed for a crime: type, category, description, tips and steps"""
+    return ' '.join([
+        crime.type,
+        crime.get_category_display(),
+        crime.description,
+        *crime.get_prevention_tips_list(),
+        *crime.get_reporting_steps_list(),
+    ])
+
+
+def format_crime_context(crime):
+    """Compact prompt block for one crime"""
+    lines = [f"- {crime.type} ({crime.get_category_display()}, {crime.get_severity_display()} severity): {crime.description}"]
+    tips = crime.get_prevention_tips_list()
+    if tips:
+        lines.append(f"  Prevention: {'; '.join(tips)}")
+    steps = crime.get_reporting_steps_list()
+    if steps:
+        lines.append(f"  Reporting: {'; '.join(steps)}")
+    return '\n'.join(lines)
+
+
+class CatalogIndex:
+    """In-process BM25 index over the CyberCrime catalog for grounding chatbot prompts.
+
+    The index is built from the database on first use in each worker, updated
+    incrementally from CyberCrime save/delete signals, and rebuilt in full after
+    refresh_interval seconds so edits made in other workers are picked up.
+    """
+
+    k1 = 1.5
+    b = 0.75
+
+    def __init__(self, refresh_interval=300):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._postings = {}   # token -> {crime_id: term frequency}
+        self._lengths = {}    # crime_id -> document length in tokens
+        self._terms = {}      # crime_id -> distinct tokens, for incremental removal
+        self._contexts = {}   # crime_id -> formatted prompt block
+        self._built_at = None
+
+    def build(self):
+        crimes = list(CyberCrime.objects.prefetch_related('guidance'))
+        with self._lock:
+            self._postings = {}
+            self._lengths = {}
+            self._terms = {}
+            self._contexts = {}
+            for crime in crimes:
+                self._add(crime)
+            self._built_at = time.monotonic()
+
+    def update(self, crime):
+        with self._lock:
+            if self._built_at is None:
+                return
+            self._remove(crime.pk)
+            self._add(crime)
+
+    def remove(self, crime_id):
+        with self._lock:
+            if self._built_at is None:
+                return
+            self._remove(crime_id)
+
+    def search(self, query, limit=3):
+        """Return formatted context blocks for the best matching crimes"""
+        if self._built_at is None or time.monotonic() - self._built_at > self.refresh_interval:
+            self.build()
+
+        tokens = set(tokenize(query))
+        with self._lock:
+            total = len(self._lengths)
+            if not total or not tokens:
+                return []
+            avg_length = sum(self._lengths.values()) / total
+
+            scores = Counter()
+            for token in tokens:
+                postings = self._postings.get(token)
+                if not postings:
+                    continue
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                for crime_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[crime_id] / avg_length)
+                    scores[crime_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+            return [self._contexts[crime_id] for crime_id, _ in scores.most_common(limit)]
+
+    def _add(self, crime):
+        counts = Counter(tokenize(crime_document(crime)))
+        for token, tf in counts.items():
+            self._postings.setdefault(token, {})[crime.pk] = tf
+        self._lengths[crime.pk] = sum(counts.values())
+        self._terms[crime.pk] = list(counts)
+        self._contexts[crime.pk] = format_crime_context(crime)
+
+    def _remove(self, crime_id):
+        if self._lengths.pop(crime_id, None) is None:
+            return
+        self._contexts.pop(crime_id, None)
+        for token in self._terms.pop(crime_id, ()):
+            postings = self._postings[token]
+            postings.pop(crime_id, None)
+            if not postings:
+                del self._postings[token]
+
+
+catalog_index = CatalogIndex(refresh_interval=settings.CHATBOT_GROUNDING_REFRESH)
+
+
+def grounding_context(user_message):
+    """Catalog entries relevant to the user message, formatted for the prompt"""
+    if not settings.CHATBOT_GROUNDING_ENABLED:
+        return ''
+    return '\n'.join(catalog_index.search(user_message, limit=settings.CHATBOT_GROUNDING_TOP_K))
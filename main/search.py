@@ -0,0 +1,390 @@
+import heapq
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Prefetch, Q
+from django.urls import reverse
+
+from .models import CrimeGuidance, CyberCrime
+from .page_cache import catalog_cache
+from .retrieval import tokenize
+
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = 'cybercrime_search'
+
+# FTS5 bm25() weights for (crime_id, type, category, body); Postgres uses setweight() A, B and C
+SQLITE_WEIGHTS = (0.0, 10.0, 5.0, 1.0)
+
+
+def search_fields(crime):
+    """Indexed text of a crime: (type, category, body with description, tips and steps)"""
+    return (
+        crime.type,
+        f"{crime.get_category_display()} {crime.category.replace('_', ' ')}",
+        ' '.join([crime.description, *crime.get_prevention_tips_list(), *crime.get_reporting_steps_list()]),
+    )
+
+
+def query_terms(query):
+    return re.findall(r'\w+', query.lower())
+
+
+class CrimeSearchIndex:
+    """Ranked full-text search over the crime catalog.
+
+    Uses an FTS5 table on SQLite and a tsvector column with a GIN index on
+    Postgres, both created by migration 0010 and kept in sync from CyberCrime
+    save/delete signals. On other backends, or if the index table is missing
+    (e.g. SQLite built without FTS5), search falls back to icontains filters.
+    """
+
+    def __init__(self):
+        self._available = None
+
+    @property
+    def vendor(self):
+        return connection.vendor
+
+    def available(self):
+        if self._available is None:
+            self._available = (
+                self.vendor in ('sqlite', 'postgresql')
+                and SEARCH_TABLE in connection.introspection.table_names()
+            )
+        return self._available
+
+    def update(self, crime):
+        if not self.available():
+            return
+        crime_type, category, body = search_fields(crime)
+        crime_id = CyberCrime._meta.pk.get_db_prep_value(crime.pk, connection)
+        with connection.cursor() as cursor:
+            if self.vendor == 'sqlite':
+                cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE crime_id = %s', [crime_id])
+                cursor.execute(
+                    f'INSERT INTO {SEARCH_TABLE} (crime_id, type, category, body) VALUES (%s, %s, %s, %s)',
+                    [crime_id, crime_type, category, body]
+                )
+            else:
+                cursor.execute(
+                    f"""
+                    INSERT INTO {SEARCH_TABLE} (crime_id, document)
+                    VALUES (%s, setweight(to_tsvector('english', %s), 'A')
+                             || setweight(to_tsvector('english', %s), 'B')
+                             || setweight(to_tsvector('english', %s), 'C'))
+                    ON CONFLICT (crime_id) DO UPDATE SET document = EXCLUDED.document
+                    """,
+                    [crime_id, crime_type, category, body]
+                )
+
+    def remove(self, crime_id):
+        if not self.available():
+            return
+        crime_id = CyberCrime._meta.pk.get_db_prep_value(crime_id, connection)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE crime_id = %s', [crime_id])
+
+    def rebuild(self):
+        """Re-index every crime; returns the number indexed"""
+        if not self.available():
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        count = 0
+        for crime in CyberCrime.objects.prefetch_related('guidance').iterator(chunk_size=2000):
+            self.update(crime)
+            count += 1
+        return count
+
+    def _match(self, query):
+        """SQL condition and params matching the search index against a user query"""
+        terms = query_terms(query)
+        if self.vendor == 'sqlite':
+            # Quote each term so FTS5 operators in user input are treated as text; prefix-match all terms
+            return f'{SEARCH_TABLE} MATCH %s', [' '.join(f'"{term}"*' for term in terms)]
+        return "document @@ to_tsquery('english', %s)", [' & '.join(f'{term}:*' for term in terms)]
+
+    def _joined(self):
+        return f'{SEARCH_TABLE} JOIN {CyberCrime._meta.db_table} c ON c.id = {SEARCH_TABLE}.crime_id'
+
+    def search(self, query, category=''):
+        """Primary keys of crimes matching query, best match first"""
+        condition, params = self._match(query)
+        if category:
+            condition += ' AND c.category = %s'
+            params = params + [category]
+
+        if self.vendor == 'sqlite':
+            order = f'bm25({SEARCH_TABLE}, {", ".join(str(w) for w in SQLITE_WEIGHTS)})'
+        else:
+            order = "ts_rank_cd(document, to_tsquery('english', %s)) DESC"
+            params = params + self._match(query)[1]
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT {SEARCH_TABLE}.crime_id FROM {self._joined()} '
+                f'WHERE {condition} ORDER BY {order}, c.created_at DESC',
+                params
+            )
+            pk_field = CyberCrime._meta.pk
+            return [pk_field.to_python(row[0]) for row in cursor.fetchall()]
+
+    def facets(self, query):
+        """Matching crime counts per category"""
+        condition, params = self._match(query)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT c.category, COUNT(*) FROM {self._joined()} WHERE {condition} GROUP BY c.category',
+                params
+            )
+            return dict(cursor.fetchall())
+
+
+search_index = CrimeSearchIndex()
+
+
+def search_crimes(query, category=''):
+    """Search the catalog.
+
+    Returns (crimes, facets): crimes is a list of matching CyberCrime primary
+    keys in rank order when the full-text index is available, otherwise a
+    filtered queryset; facets maps category to matching crime count before
+    the category filter is applied.
+    """
+    if query_terms(query) and search_index.available():
+        return search_index.search(query, category), search_index.facets(query)
+
+    crimes = CyberCrime.objects.all()
+    if query:
+        crimes = crimes.filter(
+            Q(type__icontains=query) |
+            Q(description__icontains=query) |
+            Q(category__icontains=query)
+        )
+        facets = dict(crimes.order_by().values_list('category').annotate(count=Count('id')))
+    else:
+        # Browsing counts back the dropdown and the listing total; cached until the catalog changes
+        facets = catalog_cache.get_or_set(
+            'categories', lambda: dict(crimes.order_by().values_list('category').annotate(count=Count('id')))
+        )
+    if category:
+        crimes = crimes.filter(category=category)
+    return crimes, facets
+
+
+class SuggestIndex:
+    """In-memory prefix index over crime types, categories and tip text for typeahead.
+
+    Every distinct token maps to a posting list of crime keys kept sorted best
+    first (field weight, then learn-more clicks), and the vocabulary is a
+    sorted list, so a prefix is a bisect range of tokens whose posting lists
+    merge lazily in rank order. Short prefixes match thousands of tokens, so
+    their merged heads are cached until a crime with a matching token changes.
+    Multi-word queries walk the candidates of the term with the fewest
+    postings and check the other terms against each crime's own tokens,
+    scanning at most max_scan candidates.
+
+    Like the chatbot's CatalogIndex it is built on first use, updated from
+    CyberCrime signals, and refreshed after refresh_interval seconds, with
+    refreshes running in a background thread while the old index serves.
+    """
+
+    FIELD_WEIGHTS = {'type': 3, 'category': 2, 'tips': 1}
+    short_prefix = 2
+    max_scan = 2000
+
+    _category_labels = dict(CyberCrime.CATEGORY_CHOICES)
+    _url_placeholder = '00000000-0000-0000-0000-000000000000'
+
+    def __init__(self, refresh_interval=300):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._reset_state()
+        self._built_at = None
+
+    def _reset_state(self):
+        self._postings = {}      # token -> sorted [(-weight, -clicks, type, crime_id)]
+        self._vocab = []         # sorted distinct tokens
+        self._crime_keys = {}    # crime_id -> {token: key}, for removal and term checks
+        self._entries = {}       # crime_id -> (suggestion payload, NUL-prefixed tokens for prefix checks)
+        self._short_cache = {}   # short prefix -> merged head of its posting lists
+
+    def build(self, crimes=None):
+        """Index crimes (all crimes from the database by default)"""
+        if crimes is None:
+            crimes = CyberCrime.objects.only(
+                'id', 'type', 'category', 'severity', 'learn_more_clicks'
+            ).prefetch_related(
+                Prefetch('guidance', queryset=CrimeGuidance.objects.filter(kind=CrimeGuidance.TIP))
+            ).iterator(chunk_size=2000)
+
+        # Resolve the detail URL once and fill in each crime's id, rather than reversing per crime
+        self._detail_url = reverse('crime_detail', args=[self._url_placeholder])
+
+        postings = {}
+        crime_keys = {}
+        entries = {}
+        for crime in crimes:
+            keys, entry = self._crime_keys_for(crime)
+            crime_keys[crime.pk] = keys
+            entries[crime.pk] = entry
+            for token, key in keys.items():
+                postings.setdefault(token, []).append(key)
+        for keys in postings.values():
+            keys.sort()
+
+        with self._lock:
+            self._postings = postings
+            self._vocab = sorted(postings)
+            self._crime_keys = crime_keys
+            self._entries = entries
+            self._short_cache = {}
+            self._built_at = time.monotonic()
+
+    def update(self, crime):
+        with self._lock:
+            if self._built_at is None:
+                return
+            self._remove(crime.pk)
+            keys, entry = self._crime_keys_for(crime)
+            self._crime_keys[crime.pk] = keys
+            self._entries[crime.pk] = entry
+            for token, key in keys.items():
+                if token not in self._postings:
+                    self._postings[token] = []
+                    insort(self._vocab, token)
+                insort(self._postings[token], key)
+            self._invalidate_short(keys)
+
+    def remove(self, crime_id):
+        with self._lock:
+            if self._built_at is None:
+                return
+            self._remove(crime_id)
+
+    def suggest(self, query, limit=8):
+        """Best matching crimes for a partially typed query"""
+        self._ensure_fresh()
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            # Drive the search from the term with the fewest postings
+            driver = None
+            fewest = None
+            for term in terms:
+                start, end = self._token_range(term)
+                count = self._count_postings(start, end, fewest)
+                if fewest is None or count < fewest:
+                    driver, fewest = (term, start, end), count
+            others = [term for term in terms if term != driver[0]]
+
+            results = []
+            seen = set()
+            for scanned, key in enumerate(self._candidates(*driver)):
+                if len(results) >= limit or scanned >= self.max_scan:
+                    break
+                crime_id = key[3]
+                if crime_id in seen:
+                    continue
+                seen.add(crime_id)
+                entry, tokens = self._entries[crime_id]
+                if all(f'\0{term}' in tokens for term in others):
+                    results.append(entry)
+            return results
+
+    def _token_range(self, prefix):
+        return bisect_left(self._vocab, prefix), bisect_left(self._vocab, prefix + '\uffff')
+
+    def _count_postings(self, start, end, limit=None):
+        """Postings in a token range, stopping early once past limit"""
+        count = 0
+        for token in self._vocab[start:end]:
+            count += len(self._postings[token])
+            if limit is not None and count >= limit:
+                break
+        return count
+
+    def _candidates(self, prefix, start, end):
+        lists = [self._postings[token] for token in self._vocab[start:end]]
+        if len(prefix) > self.short_prefix:
+            return heapq.merge(*lists)
+
+        cached = self._short_cache.get(prefix)
+        if cached is None:
+            # Keep enough of the merged head to fill any page after de-duplication
+            cached = self._short_cache[prefix] = list(islice(heapq.merge(*lists), self.max_scan))
+        return iter(cached)
+
+    def _crime_keys_for(self, crime):
+        category_display = self._category_labels.get(crime.category, crime.category)
+        fields = {
+            'type': crime.type,
+            'category': f"{category_display} {crime.category.replace('_', ' ')}",
+            'tips': ' '.join(crime.get_prevention_tips_list()),
+        }
+        weights = {}
+        for field, text in fields.items():
+            for token in tokenize(text):
+                weights[token] = max(weights.get(token, 0), self.FIELD_WEIGHTS[field])
+
+        clicks = crime.learn_more_clicks or 0
+        keys = {token: (-weight, -clicks, crime.type.lower(), crime.pk) for token, weight in weights.items()}
+        entry = {
+            'id': str(crime.pk),
+            'type': crime.type,
+            'category': crime.category,
+            'category_display': category_display,
+            'severity': crime.severity,
+            'url': self._detail_url.replace(self._url_placeholder, str(crime.pk)),
+        }
+        return keys, (entry, ''.join(f'\0{token}' for token in keys))
+
+    def _invalidate_short(self, tokens):
+        """Drop cached short-prefix merges that could include these tokens"""
+        for token in tokens:
+            for length in range(1, self.short_prefix + 1):
+                self._short_cache.pop(token[:length], None)
+
+    def _remove(self, crime_id):
+        old_keys = self._crime_keys.pop(crime_id, {})
+        self._invalidate_short(old_keys)
+        for token, key in old_keys.items():
+            keys = self._postings[token]
+            index = bisect_left(keys, key)
+            if index < len(keys) and keys[index] == key:
+                del keys[index]
+            if not keys:
+                del self._postings[token]
+                del self._vocab[bisect_left(self._vocab, token)]
+        self._entries.pop(crime_id, None)
+
+    def _ensure_fresh(self):
+        if self._built_at is None:
+            self.build()
+        elif time.monotonic() - self._built_at > self.refresh_interval and not self._refreshing:
+            self._refreshing = True
+            threading.Thread(target=self._refresh, name='suggest-index-refresh', daemon=True).start()
+
+    def _refresh(self):
+        try:
+            self.build()
+        except Exception:
+            logger.exception('Failed to refresh the crime suggestion index')
+        finally:
+            self._refreshing = False
+            # This thread ends here; don't leave its database connection open
+            connection.close()
+
+
+suggest_index = SuggestIndex(refresh_interval=settings.CRIME_SUGGEST_REFRESH)
@@ -0,0 +1,55 @@
+from django.urls import reverse
+from rest_framework import serializers
+
+from .models import CyberCrime
+
+
+class CrimeSerializer(serializers.ModelSerializer):
+    """Public catalog representation of a crime; pass fields= to return only some of them"""
+    category_display = serializers.CharField(source='get_category_display', read_only=True)
+    prevention_tips = serializers.ListField(source='get_prevention_tips_list', read_only=True)
+    reporting_steps = serializers.ListField(source='get_reporting_steps_list', read_only=True)
+    url = serializers.SerializerMethodField()
+    page_url = serializers.SerializerMethodField()
+
+    # Model columns each serialized field reads, so list queries can load only those
+    COLUMNS = {
+        'id': ('id',),
+        'type': ('type',),
+        'description': ('description',),
+        'category': ('category',),
+        'category_display': ('category',),
+        'severity': ('severity',),
+        'prevention_tip_count': ('prevention_tip_count',),
+        'prevention_tips': (),
+        'reporting_steps': (),
+        'learn_more_clicks': ('learn_more_clicks',),
+        'created_at': ('created_at',),
+        'updated_at': ('updated_at',),
+        'url': ('id',),
+        'page_url': ('id',),
+    }
+
+    class Meta:
+        model = CyberCrime
+        fields = [
+            'id', 'type', 'description', 'category', 'category_display', 'severity',
+            'prevention_tip_count', 'prevention_tips', 'reporting_steps',
+            'learn_more_clicks', 'created_at', 'updated_at', 'url', 'page_url',
+        ]
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    def get_url(self, crime):
+        return self._absolute(reverse('crime_api_detail', args=[crime.pk]))
+
+    def get_page_url(self, crime):
+        return self._absolute(reverse('crime_detail', args=[crime.pk]))
+
+    def _absolute(self, path):
+        request = self.context.get('request')
+        return request.build_absolute_uri(path) if request else path
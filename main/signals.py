@@ -0,0 +1,52 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from .models import ChatbotConfig, CyberCrime, RelatedCrime
+from .chatbot import response_cache, gemini_clients
+from .retrieval import catalog_index
+from .search import search_index, suggest_index
+from .page_cache import catalog_cache
+from .related import related_crimes
+
+
+@receiver(post_save, sender=ChatbotConfig)
+def clear_chatbot_cache(sender, instance, **kwargs):
+    """Drop cached replies and Gemini clients when the bot configuration changes"""
+    response_cache.clear()
+    gemini_clients.clear()
+
+
+@receiver(post_save, sender=CyberCrime)
+def index_crime(sender, instance, update_fields=None, **kwargs):
+    """Keep the chatbot grounding index and the crime search indexes in sync with crime edits"""
+    # After commit, so tips and steps saved in the same transaction are indexed too
+    transaction.on_commit(lambda: _index_crime(instance, update_fields))
+
+
+def _index_crime(crime, update_fields):
+    catalog_index.update(crime)
+    search_index.update(crime)
+    suggest_index.update(crime)
+    # Click counts alone don't retire cached pages; the cache timeout covers them
+    if update_fields is None or set(update_fields) != {'learn_more_clicks'}:
+        catalog_cache.bump()
+        related_crimes.schedule([crime.pk])
+
+
+@receiver(pre_delete, sender=CyberCrime)
+def remember_related_listers(sender, instance, **kwargs):
+    # The crimes listing this one lose their rows by cascade, so note them while they can be found
+    instance._related_listers = list(
+        RelatedCrime.objects.filter(related_id=instance.pk).values_list('crime_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=CyberCrime)
+def unindex_crime(sender, instance, **kwargs):
+    catalog_index.remove(instance.pk)
+    search_index.remove(instance.pk)
+    suggest_index.remove(instance.pk)
+    catalog_cache.bump()
+    listers = getattr(instance, '_related_listers', [])
+    if listers:
+        transaction.on_commit(lambda: related_crimes.schedule(listers))
@@ -0,0 +1,50 @@
+from django.db.models import Case, Count, IntegerField, Q, Sum, Value, When
+
+from .models import CyberCrime
+from .page_cache import catalog_cache
+
+
+# Numeric weight of each severity for the average shown on the admin crimes page
+SEVERITY_WEIGHTS = {'low': 1, 'medium': 2, 'high': 3, 'critical': 4}
+
+
+def compute_crime_stats():
+    """Totals, per-severity and per-category counts, views and average severity in one query"""
+    aggregates = {
+        'total': Count('id'),
+        'total_views': Sum('learn_more_clicks'),
+        'severity_sum': Sum(Case(
+            *[When(severity=severity, then=Value(weight)) for severity, weight in SEVERITY_WEIGHTS.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )),
+    }
+    for value, _ in CyberCrime.SEVERITY_CHOICES:
+        aggregates[f'severity_{value}'] = Count('id', filter=Q(severity=value))
+    for value, _ in CyberCrime.CATEGORY_CHOICES:
+        aggregates[f'category_{value}'] = Count('id', filter=Q(category=value))
+    row = CyberCrime.objects.order_by().aggregate(**aggregates)
+
+    total = row['total']
+    return {
+        'total': total,
+        'total_views': row['total_views'] or 0,
+        'avg_severity': round((row['severity_sum'] or 0) / total, 1) if total else 0,
+        'severity_counts': [
+            {'value': value, 'label': label, 'count': row[f'severity_{value}']}
+            for value, label in CyberCrime.SEVERITY_CHOICES
+        ],
+        'category_counts': [
+            {'value': value, 'label': label, 'count': row[f'category_{value}']}
+            for value, label in CyberCrime.CATEGORY_CHOICES
+        ],
+    }
+
+
+def crime_stats():
+    """Admin crimes page statistics, cached until the next crime edit.
+
+    Learn-more clicks don't bump the catalog version, so total_views can
+    lag by up to CATALOG_CACHE_TIMEOUT seconds.
+    """
+    return catalog_cache.get_or_set('crime-stats', compute_crime_stats)
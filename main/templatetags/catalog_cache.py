@@ -0,0 +1,34 @@
+from django import template
+
+from ..page_cache import catalog_cache
+
+register = template.Library()
+
+
+class CatalogFragmentNode(template.Node):
+    def __init__(self, nodelist, name, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        parts = [var.resolve(context) for var in self.vary_on]
+        # Querysets used only inside the block are lazy, so a hit skips their queries too
+        return catalog_cache.get_or_set(name, lambda: self.nodelist.render(context), *parts)
+
+
+@register.tag
+def catalog_fragment(parser, token):
+    """Cache the enclosed template block until the crime catalog changes.
+
+    Usage: {% catalog_fragment "name" [vary_on ...] %} ... {% endcatalog_fragment %}
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires a fragment name")
+    nodelist = parser.parse(('endcatalog_fragment',))
+    parser.delete_first_token()
+    return CatalogFragmentNode(
+        nodelist, parser.compile_filter(bits[1]), [parser.compile_filter(bit) for bit in bits[2:]]
+    )
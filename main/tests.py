@@ -1,3 +1,1362 @@
-from django.test import TestCase
+import hashlib
+import json
+import re
+import threading
+import time
+import uuid
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta, timezone as dt_timezone
+from http.server import ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from .chatbot import ChatbotResponseCache, CircuitBreaker, GeminiClientRegistry
+from .click_counter import BufferedClickCounter, click_counter
+from .events import MAX_BODY_BYTES, MAX_EVENTS
+from .live import LiveBoard, LiveCounters, current_minute
+from .management.commands.fake_gemini import SAMPLE_REPLY, FakeGemini, make_handler
+from .metrics import record_conversations, record_widget_opens, summarize
+from .models import (
+    AdminUser, CatalogVersion, ChatbotConfig, ChatbotConversation, ChatbotMetricsRollup, ChatSession, CrimeGuidance,
+    CrimeViewBucket, CyberCrime, LiveActivityMinute,
+)
+from .page_cache import CSRF_PLACEHOLDER, catalog_cache
+from .pagination import decode_cursor, encode_cursor, keyset_paginate
+from .ratelimit import TokenBucketLimiter, UpstreamSlots, chatbot_rate_limit
+from .related import related_crimes
+from .search import SuggestIndex, search_crimes, search_index
+from .stats import compute_crime_stats
+from .trending import HORIZON_HALF_LIVES, add_views, decayed_score, hour_number, rank_trending
+from .utils import get_client_ip
+from .views import chatbot_stream_api
+from .viewers import BloomFilter, HyperLogLog, RecentViews, record_viewers, unique_viewers
+
+
+class ChatbotResponseCacheTests(SimpleTestCase):
+    def test_normalized_questions_share_a_key(self):
+        key = ChatbotResponseCache.make_key('gemini', 'prompt', 'What is phishing?')
+        self.assertEqual(key, ChatbotResponseCache.make_key('gemini', 'prompt', '  what IS   phishing '))
+        self.assertNotEqual(key, ChatbotResponseCache.make_key('gemini', 'other prompt', 'What is phishing?'))
+        self.assertNotEqual(key, ChatbotResponseCache.make_key('other-model', 'prompt', 'What is phishing?'))
+
+    def test_hits_and_misses_are_counted(self):
+        cache = ChatbotResponseCache(max_chars=100, ttl=60)
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', 'reply')
+        self.assertEqual(cache.get('a'), 'reply')
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'hit_rate': 50, 'entries': 1})
+
+    def test_entries_expire_after_ttl(self):
+        cache = ChatbotResponseCache(max_chars=100, ttl=0.05)
+        cache.set('a', 'reply')
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('a'))
+
+    def test_least_recently_used_reply_is_evicted_by_size(self):
+        cache = ChatbotResponseCache(max_chars=10, ttl=60)
+        cache.set('a', 'aaaaa')
+        cache.set('b', 'bbbbb')
+        cache.get('a')
+        cache.set('c', 'ccccc')
+        self.assertEqual(cache.get('a'), 'aaaaa')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 'ccccc')
+
+    def test_replies_larger_than_the_cache_are_not_stored(self):
+        cache = ChatbotResponseCache(max_chars=10, ttl=60)
+        cache.set('a', 'x' * 11)
+        self.assertIsNone(cache.get('a'))
+
+
+class TokenBucketLimiterTests(SimpleTestCase):
+    def test_burst_then_one_request_per_interval(self):
+        limiter = TokenBucketLimiter(burst=3, refill_rate=0.5)
+        with mock.patch('time.time', return_value=1000.0):
+            self.assertEqual([limiter.check('client') for _ in range(3)], [0, 0, 0])
+            self.assertAlmostEqual(limiter.check('client'), 2.0)
+        with mock.patch('time.time', return_value=1001.0):
+            self.assertAlmostEqual(limiter.check('client'), 1.0)
+        with mock.patch('time.time', return_value=1002.0):
+            self.assertEqual(limiter.check('client'), 0)
+            self.assertAlmostEqual(limiter.check('client'), 2.0)
+
+    def test_denied_requests_do_not_use_up_tokens(self):
+        limiter = TokenBucketLimiter(burst=1, refill_rate=1)
+        with mock.patch('time.time', return_value=1000.0):
+            limiter.check('client')
+            for _ in range(10):
+                self.assertAlmostEqual(limiter.check('client'), 1.0)
+        with mock.patch('time.time', return_value=1001.0):
+            self.assertEqual(limiter.check('client'), 0)
+
+    def test_clients_have_separate_buckets(self):
+        limiter = TokenBucketLimiter(burst=1, refill_rate=1)
+        with mock.patch('time.time', return_value=1000.0):
+            self.assertEqual(limiter.check('a'), 0)
+            self.assertTrue(limiter.check('a'))
+            self.assertEqual(limiter.check('b'), 0)
+
+    def test_idle_bucket_refills_to_burst_only(self):
+        limiter = TokenBucketLimiter(burst=2, refill_rate=1)
+        with mock.patch('time.time', return_value=1000.0):
+            limiter.check('client')
+        with mock.patch('time.time', return_value=5000.0):
+            self.assertEqual([limiter.check('client') for _ in range(2)], [0, 0])
+            self.assertTrue(limiter.check('client'))
+
+    def test_invalid_settings_are_rejected(self):
+        for burst, refill_rate in ((5, 0), (5, -1), (0, 1)):
+            with self.assertRaises(ImproperlyConfigured):
+                TokenBucketLimiter(burst=burst, refill_rate=refill_rate)
+
+
+class SharedUpstreamSlotsTests(SimpleTestCase):
+    def slots(self, limit, lease_timeout=60):
+        slots = UpstreamSlots(limit, cache_alias='default', lease_timeout=lease_timeout)
+        slots.cache_key = f'test-upstream-slot-{uuid.uuid4().hex}'
+        return slots
+
+    def test_slots_are_capped_and_released(self):
+        slots = self.slots(2)
+        first, second = slots.acquire(), slots.acquire()
+        self.assertTrue(first and second)
+        self.assertIsNone(slots.acquire())
+        slots.release(first)
+        self.assertTrue(slots.acquire())
+        self.assertIsNone(slots.acquire())
+
+    def test_slot_held_by_a_dead_worker_expires(self):
+        slots = self.slots(1, lease_timeout=0.05)
+        slots.acquire()
+        self.assertIsNone(slots.acquire())
+        time.sleep(0.1)
+        self.assertTrue(slots.acquire())
+
+    def test_releasing_an_expired_lease_keeps_the_new_holder(self):
+        slots = self.slots(1, lease_timeout=0.05)
+        stale = slots.acquire()
+        time.sleep(0.1)
+        current = slots.acquire()
+        slots.release(stale)
+        slots.release(stale)
+        self.assertIsNone(slots.acquire())
+        slots.release(current)
+        self.assertTrue(slots.acquire())
+
+    def test_invalid_limit_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            UpstreamSlots(0)
+
+
+class ChatbotRateLimitTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.view = chatbot_rate_limit(lambda request: HttpResponse('ok'))
+
+    def post(self, **meta):
+        return self.view(self.factory.post('/api/chatbot/', REMOTE_ADDR='203.0.113.7', **meta))
+
+    def test_rotating_x_forwarded_for_does_not_reset_the_bucket(self):
+        with mock.patch('main.ratelimit.chatbot_limiter', TokenBucketLimiter(burst=2, refill_rate=0.01)):
+            statuses = [self.post(HTTP_X_FORWARDED_FOR=f'10.0.0.{n}').status_code for n in range(4)]
+        self.assertEqual(statuses, [200, 200, 429, 429])
+
+    def test_limited_reply_has_retry_after(self):
+        with mock.patch('main.ratelimit.chatbot_limiter', TokenBucketLimiter(burst=1, refill_rate=0.1)):
+            self.post()
+            response = self.post()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '10')
+
+
+class ClientIpTests(SimpleTestCase):
+    def request(self):
+        return RequestFactory().get('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='6.6.6.6, 198.51.100.4')
+
+    def test_forwarded_header_is_ignored_without_trusted_proxies(self):
+        self.assertEqual(get_client_ip(self.request()), '10.0.0.1')
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_address_appended_by_the_trusted_proxy_is_used(self):
+        self.assertEqual(get_client_ip(self.request()), '198.51.100.4')
+
+    @override_settings(TRUSTED_PROXY_COUNT=3)
+    def test_short_forwarded_header_falls_back_to_remote_addr(self):
+        self.assertEqual(get_client_ip(self.request()), '10.0.0.1')
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    COOLDOWN = 0.05
+
+    def open_breaker(self):
+        breaker = CircuitBreaker(threshold=3, cooldown=self.COOLDOWN)
+        for _ in range(3):
+            breaker.record_failure()
+        return breaker
+
+    def test_opens_after_threshold_consecutive_failures(self):
+        breaker = CircuitBreaker(threshold=3, cooldown=60)
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.stats()['trips'], 1)
+
+    def test_success_resets_the_failure_count(self):
+        breaker = CircuitBreaker(threshold=2, cooldown=60)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_only_one_trial_is_allowed_when_half_open(self):
+        breaker = self.open_breaker()
+        time.sleep(self.COOLDOWN * 1.5)
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(breaker.allow())
+
+    def test_successful_trial_closes_the_breaker(self):
+        breaker = self.open_breaker()
+        time.sleep(self.COOLDOWN * 1.5)
+        breaker.allow()
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
+        self.assertTrue(breaker.allow())
+
+    def test_failed_trial_opens_the_breaker_again(self):
+        breaker = self.open_breaker()
+        time.sleep(self.COOLDOWN * 1.5)
+        breaker.allow()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.stats()['trips'], 2)
+
+    def test_released_trial_lets_the_next_request_try(self):
+        breaker = self.open_breaker()
+        time.sleep(self.COOLDOWN * 1.5)
+        self.assertTrue(breaker.allow())
+        breaker.release_trial()
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+    def test_abandoned_trial_stops_blocking_after_a_cooldown(self):
+        breaker = self.open_breaker()
+        time.sleep(self.COOLDOWN * 1.5)
+        self.assertTrue(breaker.allow())
+        time.sleep(self.COOLDOWN * 1.5)
+        self.assertTrue(breaker.allow())
+
+
+class CursorTests(SimpleTestCase):
+    def test_cursor_round_trip(self):
+        crime = CyberCrime(created_at=timezone.now())
+        self.assertEqual(decode_cursor(encode_cursor('n', crime), CyberCrime), ('n', [crime.created_at, crime.pk]))
+        self.assertEqual(decode_cursor(encode_cursor('p', crime), CyberCrime)[0], 'p')
+
+    def test_malformed_cursors_are_ignored(self):
+        crime = CyberCrime(created_at=timezone.now())
+        for cursor in (None, '', 'not-base64!', 'bnVsbA', encode_cursor('x', crime), encode_cursor('n', crime)[:-4]):
+            self.assertIsNone(decode_cursor(cursor, CyberCrime), cursor)
+
+
+class KeysetPaginateTests(TestCase):
+    PER_PAGE = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        CyberCrime.objects.bulk_create([
+            CyberCrime(type=f'Crime {n}', description='-', category='email_fraud', severity='low')
+            for n in range(8)
+        ])
+        # Pairs of crimes share a timestamp, so pages must also break ties on id
+        start = timezone.now()
+        for n, crime in enumerate(CyberCrime.objects.order_by('pk')):
+            CyberCrime.objects.filter(pk=crime.pk).update(created_at=start - timedelta(minutes=n // 2))
+        cls.newest_first = list(
+            CyberCrime.objects.order_by('-created_at', '-id').values_list('pk', flat=True)
+        )
+
+    def page(self, cursor=None):
+        request = RequestFactory().get('/crimes/', {'cursor': cursor} if cursor else {})
+        return keyset_paginate(CyberCrime.objects.all(), request, self.PER_PAGE)
+
+    def ids(self, page):
+        return [crime.pk for crime in page]
+
+    def test_first_page(self):
+        page = self.page()
+        self.assertEqual(self.ids(page), self.newest_first[:3])
+        self.assertTrue(page.has_next)
+        self.assertFalse(page.has_previous)
+        self.assertIsNone(page.previous_cursor)
+
+    def test_next_pages_cover_every_row_once(self):
+        pages = [self.page()]
+        while pages[-1].has_next:
+            pages.append(self.page(pages[-1].next_cursor))
+        self.assertEqual([len(page) for page in pages], [3, 3, 2])
+        self.assertEqual(sum((self.ids(page) for page in pages), []), self.newest_first)
+        self.assertTrue(all(page.has_previous for page in pages[1:]))
+
+    def test_previous_page_returns_the_same_rows(self):
+        second = self.page(self.page().next_cursor)
+        third = self.page(second.next_cursor)
+        self.assertEqual(self.ids(self.page(third.previous_cursor)), self.ids(second))
+
+    def test_previous_page_is_the_rows_just_before_the_cursor(self):
+        crime = CyberCrime.objects.get(pk=self.newest_first[4])
+        page = self.page(encode_cursor('p', crime))
+        self.assertEqual(self.ids(page), self.newest_first[1:4])
+        self.assertTrue(page.has_previous)
+
+    def test_paging_back_to_the_start_shows_a_full_first_page(self):
+        crime = CyberCrime.objects.get(pk=self.newest_first[2])
+        page = self.page(encode_cursor('p', crime))
+        self.assertEqual(self.ids(page), self.newest_first[:3])
+        self.assertFalse(page.has_previous)
+
+    def test_page_queries_keep_other_parameters(self):
+        request = RequestFactory().get('/crimes/', {'category': 'email_fraud', 'page': '4'})
+        query = keyset_paginate(CyberCrime.objects.all(), request, self.PER_PAGE).next_query()
+        self.assertIn('category=email_fraud', query)
+        self.assertNotIn('page=', query)
+        self.assertIn('cursor=', query)
+
+
+
+class AdminCrimesSortTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        severities = ['low', 'critical', 'medium', 'high']
+        CyberCrime.objects.bulk_create([
+            CyberCrime(
+                type=f'Crime {n:02}', description='-', category='email_fraud',
+                severity=severities[n % 4], learn_more_clicks=(n * 7) % 30,
+            )
+            for n in range(30)
+        ])
+        cls.admin = AdminUser.objects.create_user(username='admin', email='admin@example.com', password='pw')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def crimes(self, **params):
+        response = self.client.get(reverse('admin_crimes'), {'format': 'json', **params})
+        return response.json()
+
+    def walk(self, **params):
+        """Every row of a sorted listing, following the next links"""
+        rows, page = [], self.crimes(**params)
+        rows += page['results']
+        while page['next']:
+            page = self.client.get(reverse('admin_crimes') + page['next']).json()
+            rows += page['results']
+        return rows
+
+    def test_top_n_most_viewed_covers_the_whole_catalog(self):
+        page = self.crimes(sort='views', show=5)
+        self.assertEqual([row['learn_more_clicks'] for row in page['results']], [29, 28, 27, 26, 25])
+        self.assertIsNone(page['next'])
+
+    def test_sorted_pages_follow_the_order_across_cursors(self):
+        rows = self.walk(sort='views_least')
+        self.assertEqual(len(rows), 30)
+        self.assertEqual([row['learn_more_clicks'] for row in rows], sorted(range(30)))
+
+        rank = {'low': 1, 'medium': 2, 'high': 3, 'critical': 4}
+        rows = self.walk(sort='severity')
+        self.assertEqual(len({row['id'] for row in rows}), 30)
+        ranks = [rank[row['severity']] for row in rows]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+
+    def test_unknown_sort_and_count_fall_back_to_newest_first(self):
+        page = self.crimes(sort='nope', show=7)
+        self.assertEqual(len(page['results']), 25)
+        self.assertIsNotNone(page['next'])
+
+class CrimePageConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        crime = CyberCrime.objects.create(type='Phishing', description='-', category='email_fraud', severity='low')
+        cls.changed_at = timezone.now() - timedelta(hours=1)
+        CyberCrime.objects.filter(pk=crime.pk).update(updated_at=cls.changed_at)
+        CatalogVersion.objects.update_or_create(pk=1, defaults={'version': 1, 'bumped_at': cls.changed_at})
+        cls.url = reverse('crime_detail', args=[crime.pk])
+
+    def setUp(self):
+        # Forget the version read by earlier tests instead of waiting out the poll interval
+        catalog_cache._state = None
+
+    def test_page_has_validators(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        self.assertEqual(response['Last-Modified'], http_date(self.changed_at.timestamp()))
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_catalog_version_bump_changes_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        catalog_cache.bump()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_catalog_version_bump_moves_last_modified(self):
+        since = http_date(self.changed_at.timestamp() + 1)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=since).status_code, 304)
+        catalog_cache.bump()
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Last-Modified'], http_date(catalog_cache.bumped_at().timestamp()))
+
+
+class CatalogPageCacheTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(related_crimes, 'schedule')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+        catalog_cache._state = None
+        with self.captureOnCommitCallbacks(execute=True):
+            self.crime = CyberCrime(type='Phishing', description='Fake emails.', category='email_fraud', severity='high')
+            self.crime.save_with_guidance(['Check the sender'], ['Call the bank'])
+
+    def page_hits(self):
+        return next((row['hits'] for row in catalog_cache.stats() if row['section'] == 'page'), 0)
+
+    def page_token(self, response):
+        return re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', response.content.decode()).group(1)
+
+    def test_each_visitor_gets_their_own_csrf_token_from_a_cached_page(self):
+        first, second = Client(enforce_csrf_checks=True), Client(enforce_csrf_checks=True)
+        first_token = self.page_token(first.get(reverse('home')))
+        content, _ = catalog_cache.get('page', reverse('home'))
+        self.assertIn(CSRF_PLACEHOLDER, content)
+        self.assertNotIn(first_token.encode(), content)
+
+        hits = self.page_hits()
+        second_token = self.page_token(second.get(reverse('home')))
+        self.assertEqual(self.page_hits(), hits + 1)
+        self.assertNotEqual(second_token, first_token)
+
+        login = {'email': 'nobody@example.com', 'password': 'x'}
+        self.assertEqual(second.post(reverse('admin_login'), {**login, 'csrfmiddlewaretoken': second_token}).status_code, 200)
+        # The other visitor's token doesn't match this visitor's CSRF cookie
+        self.assertEqual(second.post(reverse('admin_login'), {**login, 'csrfmiddlewaretoken': first_token}).status_code, 403)
+
+    def test_admin_edit_replaces_cached_pages(self):
+        url = reverse('cyber_crimes')
+        self.assertContains(self.client.get(url), 'Phishing')
+        # Writes that skip the signals don't reach the cached page
+        CyberCrime.objects.filter(pk=self.crime.pk).update(type='Smishing')
+        self.assertContains(self.client.get(url), 'Phishing')
+        self.assertNotContains(self.client.get(url), 'Smishing')
+
+        admin = Client()
+        admin.force_login(AdminUser.objects.create_user(username='admin', email='admin@example.com', password='pw'))
+        with self.captureOnCommitCallbacks(execute=True), redirect_stdout(StringIO()):
+            admin.post(reverse('admin_crimes'), {
+                'crime_id': self.crime.pk, 'type': 'Vishing', 'description': 'Fake calls.',
+                'category': 'email_fraud', 'severity': 'high', 'prevention_tip_1': 'Hang up',
+            })
+
+        response = self.client.get(url)
+        self.assertContains(response, 'Vishing')
+        self.assertNotContains(response, 'Phishing')
+
+
+def hash64(value):
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'big')
+
+
+class HyperLogLogTests(SimpleTestCase):
+    def test_estimate_is_close_for_many_items(self):
+        sketch = HyperLogLog()
+        for n in range(10000):
+            sketch.add(hash64(n))
+        self.assertAlmostEqual(sketch.count(), 10000, delta=500)
+
+    def test_small_counts_are_nearly_exact(self):
+        sketch = HyperLogLog()
+        for n in range(50):
+            sketch.add(hash64(n))
+            sketch.add(hash64(n))
+        self.assertAlmostEqual(sketch.count(), 50, delta=2)
+        self.assertEqual(HyperLogLog().count(), 0)
+
+    def test_merge_counts_overlapping_sets_once(self):
+        first, second = HyperLogLog(), HyperLogLog()
+        for n in range(6000):
+            first.add(hash64(n))
+        for n in range(4000, 10000):
+            second.add(hash64(n))
+        first.merge(second)
+        self.assertAlmostEqual(first.count(), 10000, delta=500)
+
+    def test_update_matches_add(self):
+        added, updated = HyperLogLog(), HyperLogLog()
+        ranks = {}
+        for n in range(1000):
+            added.add(hash64(n))
+            index, rank = HyperLogLog.register_rank(hash64(n))
+            ranks[index] = max(rank, ranks.get(index, 0))
+        updated.update(ranks)
+        self.assertEqual(updated.to_bytes(), added.to_bytes())
+        self.assertEqual(HyperLogLog(registers=added.to_bytes()).count(), added.count())
+
+
+class BloomFilterTests(SimpleTestCase):
+    def test_added_values_are_found(self):
+        bloom = BloomFilter(capacity=1000)
+        values = [hash64(n) for n in range(1000)]
+        self.assertFalse(any(bloom.add(value) for value in values[:1]))
+        for value in values:
+            bloom.add(value)
+        self.assertTrue(all(value in bloom for value in values))
+        self.assertTrue(bloom.add(values[0]))
+
+    def test_false_positive_rate_stays_near_the_target(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for n in range(1000):
+            bloom.add(hash64(n))
+        false_positives = sum(hash64(n) in bloom for n in range(1000, 11000))
+        self.assertLess(false_positives, 300)
+
+
+class RecentViewsTests(SimpleTestCase):
+    def test_repeat_views_are_seen_within_the_window(self):
+        recent = RecentViews(window=60, capacity=100)
+        crime_id = uuid.uuid4()
+        self.assertFalse(recent.seen(1, crime_id))
+        self.assertTrue(recent.seen(1, crime_id))
+        self.assertFalse(recent.seen(2, crime_id))
+        self.assertFalse(recent.seen(1, uuid.uuid4()))
+
+    def test_repeat_views_are_seen_in_the_next_window(self):
+        recent = RecentViews(window=0.05, capacity=100)
+        crime_id = uuid.uuid4()
+        recent.seen(1, crime_id)
+        time.sleep(0.06)
+        self.assertTrue(recent.seen(1, crime_id))
+
+    def test_views_are_forgotten_after_two_windows(self):
+        recent = RecentViews(window=0.05, capacity=100)
+        crime_id = uuid.uuid4()
+        recent.seen(1, crime_id)
+        for visitor in (2, 3):
+            time.sleep(0.06)
+            recent.seen(visitor, crime_id)
+        self.assertFalse(recent.seen(1, crime_id))
+
+
+class DailyViewersTests(TestCase):
+    def test_recorded_sketches_add_up_per_crime(self):
+        crime = CyberCrime.objects.create(type='Phishing', description='-', category='email_fraud', severity='low')
+        other = CyberCrime.objects.create(type='Vishing', description='-', category='email_fraud', severity='low')
+        today = timezone.localdate()
+        for batch in (range(0, 300), range(200, 500)):
+            ranks = {}
+            for n in batch:
+                index, rank = HyperLogLog.register_rank(hash64(n))
+                ranks[index] = max(rank, ranks.get(index, 0))
+            record_viewers({(crime.pk, today): ranks})
+        counts = unique_viewers([crime.pk, other.pk])
+        self.assertAlmostEqual(counts[crime.pk], 500, delta=25)
+        self.assertEqual(counts[other.pk], 0)
+
+
+class EventsApiTests(TestCase):
+    def setUp(self):
+        self.url = reverse('events_api')
+        self.crime_id = str(CyberCrime.objects.create(
+            type='Phishing', description='-', category='email_fraud', severity='low'
+        ).pk)
+        cache.clear()
+        click_counter = mock.patch('main.events.click_counter')
+        self.click_counter = click_counter.start()
+        self.click_counter.increment.return_value = True
+        self.addCleanup(click_counter.stop)
+        live_counters = mock.patch('main.events.live_counters')
+        self.live_counters = live_counters.start()
+        self.addCleanup(live_counters.stop)
+
+    def post(self, body):
+        if not isinstance(body, (str, bytes)):
+            body = json.dumps(body)
+        return self.client.post(self.url, body, content_type='text/plain')
+
+    def assertRejected(self, body, error):
+        response = self.post(body)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()['success'])
+        self.assertIn(error, ' '.join(response.json()['errors']))
+        self.click_counter.increment.assert_not_called()
+
+    def test_invalid_json_is_rejected(self):
+        self.assertRejected('{"events": [', 'not valid JSON')
+
+    def test_empty_or_missing_event_list_is_rejected(self):
+        for body in ({'events': []}, [], {}, {'events': 'view'}):
+            self.assertRejected(body, 'non-empty list')
+
+    def test_unknown_event_type_is_rejected(self):
+        self.assertRejected([{'type': 'purchase'}], 'Event 0: type must be one of')
+        self.assertRejected(['view'], 'Event 0: type must be one of')
+
+    def test_bad_crime_id_is_rejected(self):
+        self.assertRejected([{'type': 'click', 'crime_id': 'nope'}], 'Event 0: crime_id')
+        self.assertRejected([{'type': 'view'}], 'Event 0: crime_id')
+
+    def test_one_bad_event_rejects_the_whole_batch(self):
+        self.assertRejected(
+            [{'type': 'click', 'crime_id': self.crime_id}, {'type': 'view', 'crime_id': 'nope'}], 'Event 1'
+        )
+        self.assertFalse(ChatbotMetricsRollup.objects.exists())
+
+    def test_oversized_batches_are_rejected(self):
+        self.assertRejected([{'type': 'chatbot_open'}] * (MAX_EVENTS + 1), f'At most {MAX_EVENTS} events')
+        self.assertRejected(' ' * (MAX_BODY_BYTES + 1), f'larger than {MAX_BODY_BYTES} bytes')
+
+    def test_only_post_is_allowed(self):
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+    def test_valid_batch_is_counted(self):
+        self.click_counter.increment.side_effect = [True, False]
+        response = self.post({'events': [
+            {'type': 'click', 'crime_id': self.crime_id},
+            {'type': 'view', 'crime_id': self.crime_id},
+            {'type': 'chatbot_open'},
+            {'type': 'chatbot_open'},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'success': True, 'received': 4, 'counted': 3})
+
+        calls = self.click_counter.increment.call_args_list
+        self.assertEqual([(call.args[0], call.kwargs['clicks']) for call in calls],
+                         [(uuid.UUID(self.crime_id), 1), (uuid.UUID(self.crime_id), 0)])
+        self.live_counters.add.assert_called_once_with('widget_opens', 2)
+        self.assertEqual(
+            sorted(ChatbotMetricsRollup.objects.values_list('period', 'widget_opens')), [('day', 2), ('hour', 2)]
+        )
+
+    def test_events_for_unknown_crimes_are_not_counted(self):
+        response = self.post({'events': [{'type': 'click', 'crime_id': str(uuid.uuid4())}]})
+        self.assertEqual(response.json(), {'success': True, 'received': 1, 'counted': 0})
+        self.click_counter.increment.assert_not_called()
+
+
+class BufferedClickCounterTests(TestCase):
+    def setUp(self):
+        # No background flush thread or live activity counts; the tests flush by hand
+        for target in ('main.click_counter.threading.Thread', 'main.click_counter.live_counters'):
+            patcher = mock.patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.counter = BufferedClickCounter(flush_interval=60, max_pending=2)
+        self.first, self.second = CyberCrime.objects.bulk_create([
+            CyberCrime(type=f'Crime {n}', description='-', category='email_fraud', severity='low') for n in range(2)
+        ])
+
+    def clicks(self, crime):
+        return CyberCrime.objects.values_list('learn_more_clicks', 'updated_at').get(pk=crime.pk)
+
+    def test_flush_adds_the_pending_clicks(self):
+        updated_at = self.clicks(self.first)[1]
+        for crime in (self.first, self.first, self.first, self.second):
+            self.counter.increment(crime.pk)
+        self.assertEqual(self.counter.pending(self.first.pk), 3)
+        self.assertEqual(self.clicks(self.first)[0], 0)
+
+        self.counter.flush()
+
+        self.assertEqual(self.clicks(self.first), (3, updated_at))
+        self.assertEqual(self.clicks(self.second)[0], 1)
+        self.assertEqual(dict(CrimeViewBucket.objects.values_list('crime', 'views')), {self.first.pk: 3, self.second.pk: 1})
+        self.assertEqual(self.counter.stats(), {'queued': 0, 'written': 4, 'dropped': 0, 'duplicates': 0})
+
+        self.counter.increment(self.first.pk)
+        self.counter.flush()
+        self.assertEqual(self.clicks(self.first)[0], 4)
+
+    def test_clicks_beyond_max_pending_crimes_are_dropped(self):
+        third = CyberCrime.objects.create(type='Crime 2', description='-', category='email_fraud', severity='low')
+        self.assertTrue(self.counter.increment(self.first.pk))
+        self.assertTrue(self.counter.increment(self.second.pk))
+        self.assertFalse(self.counter.increment(third.pk))
+        self.assertTrue(self.counter.increment(self.first.pk))
+        self.counter.flush()
+        self.assertEqual(self.clicks(third)[0], 0)
+        self.assertEqual(self.counter.stats()['dropped'], 1)
+
+    def test_clicks_of_crimes_deleted_before_the_flush_are_skipped(self):
+        self.counter.increment(self.first.pk, visitor=hash64('visitor'))
+        self.counter.increment(self.second.pk, visitor=hash64('visitor'))
+        self.second.delete()
+        self.counter.flush()
+        self.assertEqual(self.clicks(self.first)[0], 1)
+        self.assertEqual(self.counter.stats()['written'], 1)
+        self.assertEqual(list(CrimeViewBucket.objects.values_list('crime', flat=True)), [self.first.pk])
+
+
+class IncrementClicksTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(click_counter, 'increment')
+        self.increment = patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+        catalog_cache._state = None
+
+    def post(self, crime_id):
+        return self.client.post(reverse('increment_clicks'), json.dumps({'crime_id': str(crime_id)}),
+                                content_type='application/json')
+
+    def test_clicks_on_a_crime_are_counted(self):
+        crime = CyberCrime.objects.create(type='Phishing', description='-', category='email_fraud', severity='low')
+        response = self.post(crime.pk)
+        self.assertEqual(response.json(), {'success': True})
+        self.assertEqual(self.increment.call_args.args, (crime.pk,))
+
+    def test_unknown_crime_is_not_found(self):
+        response = self.post(uuid.uuid4())
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.json()['success'])
+        self.increment.assert_not_called()
+
+    def test_new_crimes_are_found_after_the_catalog_changes(self):
+        with mock.patch.object(related_crimes, 'schedule'), self.captureOnCommitCallbacks(execute=True):
+            self.post(uuid.uuid4())  # Caches the catalog's ids
+            crime = CyberCrime.objects.create(type='Phishing', description='-', category='email_fraud', severity='low')
+        self.assertEqual(self.post(crime.pk).status_code, 200)
+
+
+class TrendingScoreTests(TestCase):
+    now = datetime(2026, 3, 2, 12, 30, tzinfo=dt_timezone.utc)
+
+    def crime(self, name, clicks=0):
+        return CyberCrime.objects.create(
+            type=name, description='-', category='email_fraud', severity='low', learn_more_clicks=clicks
+        )
+
+    def view(self, crime, views, hours_ago):
+        CyberCrime.objects.filter(pk=crime.pk).update(**add_views(views, self.now - timedelta(hours=hours_ago)))
+
+    def score(self, crime, hours_later=0):
+        number = hour_number(self.now + timedelta(hours=hours_later))
+        return CyberCrime.objects.annotate(score=decayed_score(number)).get(pk=crime.pk).score
+
+    def test_score_halves_every_half_life(self):
+        crime = self.crime('Phishing')
+        self.view(crime, 8, hours_ago=0)
+        self.assertAlmostEqual(self.score(crime), 8)
+        self.assertAlmostEqual(self.score(crime, hours_later=12), 8 * 0.5 ** 0.5)
+        self.assertAlmostEqual(self.score(crime, hours_later=24), 4)
+        self.assertAlmostEqual(self.score(crime, hours_later=48), 2)
+
+    @override_settings(TRENDING_HALF_LIFE_HOURS=6)
+    def test_half_life_comes_from_settings(self):
+        crime = self.crime('Phishing')
+        self.view(crime, 8, hours_ago=0)
+        self.assertAlmostEqual(self.score(crime, hours_later=6), 4)
+        self.assertAlmostEqual(self.score(crime, hours_later=24), 0.5)
+
+    def test_new_views_are_added_to_the_decayed_score(self):
+        crime = self.crime('Phishing')
+        self.view(crime, 8, hours_ago=24)
+        self.view(crime, 3, hours_ago=0)
+        self.assertEqual(CyberCrime.objects.get(pk=crime.pk).trending_hour, hour_number(self.now))
+        self.assertAlmostEqual(self.score(crime), 4 + 3)
+
+    def test_scores_past_the_horizon_are_zero(self):
+        crime = self.crime('Phishing')
+        self.view(crime, 1000, hours_ago=HORIZON_HALF_LIVES * 24 + 1)
+        self.assertEqual(self.score(crime), 0)
+
+    def test_ranking_orders_by_decayed_views_then_clicks(self):
+        old_burst = self.crime('Old burst', clicks=5)  # 16 views two days ago: 4 now
+        steady = self.crime('Steady', clicks=1)  # 5 views now
+        tied = self.crime('Tied', clicks=9)  # 4 views now, more clicks than old_burst
+        forgotten = self.crime('Forgotten', clicks=50)  # past the horizon; only fills by clicks
+        unviewed = self.crime('Unviewed', clicks=2)
+        self.view(old_burst, 16, hours_ago=48)
+        self.view(steady, 5, hours_ago=0)
+        self.view(tied, 4, hours_ago=0)
+        self.view(forgotten, 1000, hours_ago=HORIZON_HALF_LIVES * 24 + 1)
+
+        with mock.patch('django.utils.timezone.now', return_value=self.now):
+            self.assertEqual(rank_trending(3), [steady.pk, tied.pk, old_burst.pk])
+            self.assertEqual(rank_trending(5), [steady.pk, tied.pk, old_burst.pk, forgotten.pk, unviewed.pk])
+
+
+class CrimeStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        catalog_cache._state = None
+
+    def add(self, category, severity, clicks):
+        CyberCrime.objects.create(
+            type='-', description='-', category=category, severity=severity, learn_more_clicks=clicks
+        )
+
+    def test_aggregates(self):
+        self.add('email_fraud', 'low', 10)
+        self.add('email_fraud', 'critical', 5)
+        self.add('harassment', 'high', 0)
+        self.add('job_fraud', 'critical', 7)
+
+        stats = compute_crime_stats()
+
+        self.assertEqual(stats['total'], 4)
+        self.assertEqual(stats['total_views'], 22)
+        self.assertEqual(stats['avg_severity'], 3.0)  # (1 + 4 + 3 + 4) / 4
+        self.assertEqual(
+            {row['value']: row['count'] for row in stats['severity_counts']},
+            {'low': 1, 'medium': 0, 'high': 1, 'critical': 2},
+        )
+        categories = {row['value']: row['count'] for row in stats['category_counts']}
+        self.assertEqual(list(categories), [value for value, _ in CyberCrime.CATEGORY_CHOICES])
+        self.assertEqual((categories['email_fraud'], categories['harassment'], categories['job_fraud']), (2, 1, 1))
+        self.assertEqual(sum(categories.values()), 4)
+
+    def test_empty_catalog(self):
+        stats = compute_crime_stats()
+        self.assertEqual((stats['total'], stats['total_views'], stats['avg_severity']), (0, 0, 0))
+        self.assertTrue(all(row['count'] == 0 for row in stats['severity_counts'] + stats['category_counts']))
+
+    def test_admin_crimes_page_shows_the_stats(self):
+        self.add('email_fraud', 'medium', 3)
+        self.add('social_media', 'critical', 4)
+        self.client.force_login(AdminUser.objects.create_user(username='admin', email='admin@example.com', password='pw'))
+        context = self.client.get(reverse('admin_crimes')).context
+        self.assertEqual(
+            (context['total_crimes'], context['critical_count'], context['total_views'], context['avg_severity']),
+            (2, 1, 7, 3.0),
+        )
+
+
+class LiveBoardTests(TestCase):
+    def setUp(self):
+        self.minute = current_minute()
+        LiveActivityMinute.objects.create(minute=self.minute - 20, conversations=4, conversation_failures=2, clicks=7)
+        LiveActivityMinute.objects.create(minute=self.minute - 1, conversations=6, clicks=1, views=3)
+        # This worker's counts that are not written yet
+        self.counters = mock.Mock(spec=LiveCounters)
+        self.counters.pending.return_value = {self.minute: {'views': 2, 'conversations': 1, 'conversation_failures': 1}}
+
+    def test_snapshot_adds_stored_and_pending_counts(self):
+        snapshot = LiveBoard(self.counters).snapshot(self.minute - 30)
+        self.assertEqual(snapshot['totals'], {
+            'conversations': 11, 'conversation_failures': 3, 'clicks': 8,
+            'views': 5, 'widget_opens': 0, 'audit_events': 0,
+        })
+        # Only the last 15 minutes count towards the failure rate
+        self.assertEqual(snapshot['failure_rate'], round(1 / 7 * 100, 1))
+        self.assertEqual(LiveBoard(self.counters).snapshot(self.minute)['totals']['views'], 2)
+
+    def test_dashboards_share_one_read_per_tick(self):
+        board = LiveBoard(self.counters, tick=60)
+        with self.assertNumQueries(2):
+            first = board.snapshot(self.minute - 30)
+        with self.assertNumQueries(0):
+            for _ in range(10):
+                self.assertEqual(board.snapshot(self.minute - 30), first)
+                board.snapshot(self.minute)
+
+
+
+def conversation(moment, response_time=1.0, success=True, prompt_tokens=None):
+    return ChatbotConversation(
+        user_message='q', bot_response='a', created_at=moment,
+        response_time=response_time, success=success, prompt_tokens=prompt_tokens,
+    )
+
+
+class LatencyHistogramTests(SimpleTestCase):
+    def test_bucket_bounds_are_inclusive(self):
+        cases = {0: 0, 0.25: 0, 0.2501: 1, 1: 2, 1.01: 3, 30: 9, 30.01: 10, 300: 10}
+        for seconds, bucket in cases.items():
+            self.assertEqual(ChatbotMetricsRollup.latency_bucket(seconds), bucket, seconds)
+
+    def test_percentiles_interpolate_within_a_bucket(self):
+        histogram = [0] * 11
+        histogram[2] = 100  # all between 0.5 and 1 s
+        self.assertAlmostEqual(ChatbotMetricsRollup.latency_percentile(histogram, 0.5), 0.75)
+        self.assertAlmostEqual(ChatbotMetricsRollup.latency_percentile(histogram, 0.95), 0.975)
+
+    def test_percentiles_of_a_split_distribution(self):
+        histogram = [0] * 11
+        histogram[0] = histogram[3] = 50  # half under 0.25 s, half between 1 and 2 s
+        self.assertAlmostEqual(ChatbotMetricsRollup.latency_percentile(histogram, 0.5), 0.25)
+        self.assertAlmostEqual(ChatbotMetricsRollup.latency_percentile(histogram, 0.95), 1.9)
+        histogram[10] = 900
+        self.assertEqual(ChatbotMetricsRollup.latency_percentile(histogram, 0.95), 30.0)
+        self.assertEqual(ChatbotMetricsRollup.latency_percentile([0] * 11, 0.5), 0.0)
+
+
+class ChatbotRollupTests(TestCase):
+    def moment(self, day, hour, minute=0, second=0):
+        return timezone.make_aware(datetime(2026, 3, day, hour, minute, second))
+
+    def test_conversations_are_added_to_their_hour_and_day(self):
+        record_conversations([
+            conversation(self.moment(1, 10, 0), response_time=0.2, prompt_tokens=100),
+            conversation(self.moment(1, 10, 59, 59), response_time=4, prompt_tokens=300),
+            conversation(self.moment(1, 11), success=False, response_time=20),
+            conversation(self.moment(2, 0), response_time=0.6),
+        ])
+        rows = {
+            (row.period, row.bucket_start): row for row in ChatbotMetricsRollup.objects.all()
+        }
+        self.assertEqual(sorted((period, start.day, start.hour) for period, start in rows), [
+            ('day', 1, 0), ('day', 2, 0), ('hour', 1, 10), ('hour', 1, 11), ('hour', 2, 0),
+        ])
+
+        ten = rows[('hour', self.moment(1, 10))]
+        self.assertEqual((ten.conversations, ten.successes, ten.latency_sum), (2, 2, 4.2))
+        self.assertEqual((ten.latency_0, ten.latency_5), (1, 1))
+        self.assertEqual((ten.prompt_tokens_sum, ten.prompt_turns), (400, 2))
+
+        eleven = rows[('hour', self.moment(1, 11))]
+        self.assertEqual((eleven.conversations, eleven.successes, sum(eleven.latency_histogram)), (1, 0, 0))
+
+        day = rows[('day', self.moment(1, 0))]
+        self.assertEqual((day.conversations, day.successes, sum(day.latency_histogram)), (3, 2, 2))
+
+    def test_batches_add_to_existing_rows(self):
+        record_conversations([conversation(self.moment(1, 10))])
+        record_conversations([conversation(self.moment(1, 10, 30)), conversation(self.moment(1, 10, 45))])
+        self.assertEqual(ChatbotMetricsRollup.objects.get(period='hour').conversations, 3)
+
+    def test_summary_of_rows(self):
+        record_conversations(
+            [conversation(self.moment(1, 10), response_time=0.1)] * 3
+            + [conversation(self.moment(1, 10), response_time=1.5), conversation(self.moment(1, 10), success=False)]
+        )
+        summary = summarize(ChatbotMetricsRollup.objects.filter(period='hour'))
+        self.assertEqual(summary['conversations'], 5)
+        self.assertEqual(summary['success_rate'], 80)
+        self.assertEqual(summary['avg_response_time'], 0.5)
+        self.assertEqual(summary['p50'], 0.2)
+
+class RebuildChatbotRollupsTests(TestCase):
+    def rebuild(self):
+        call_command('rebuild_chatbot_rollups', stdout=StringIO())
+
+    def test_widget_opens_survive_a_rebuild(self):
+        moment = timezone.now() - timedelta(days=3)
+        record_widget_opens(5, moment)
+        record_widget_opens(2)
+        ChatbotConversation.objects.create(
+            user_message='hi', bot_response='hello', response_time=1.5, success=True, created_at=moment
+        )
+        self.rebuild()
+        self.rebuild()
+        rows = ChatbotMetricsRollup.objects.filter(period='day').order_by('bucket_start')
+        self.assertEqual([(row.widget_opens, row.conversations) for row in rows], [(5, 1), (2, 0)])
+
+    def test_rebuild_matches_the_conversation_log(self):
+        moments = [timezone.now() - timedelta(hours=hours) for hours in (0, 1, 30)]
+        logged = [conversation(moment, response_time=n + 0.5) for n, moment in enumerate(moments)]
+        ChatbotConversation.objects.bulk_create(logged)
+        record_conversations(logged)
+        expected = sorted(ChatbotMetricsRollup.objects.values_list(
+            'period', 'bucket_start', 'conversations', 'latency_sum', *ChatbotMetricsRollup.HISTOGRAM_FIELDS
+        ))
+        # Counted twice, e.g. by a retried flush
+        record_conversations(logged)
+        self.rebuild()
+        self.assertEqual(sorted(ChatbotMetricsRollup.objects.values_list(
+            'period', 'bucket_start', 'conversations', 'latency_sum', *ChatbotMetricsRollup.HISTOGRAM_FIELDS
+        )), expected)
+
+
+class GeminiClientRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.fake = FakeGemini(latency=0, jitter=0, distribution='fixed', error_rate=0, rate_limit_rate=0, chunks=2)
+        server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(self.fake))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        settings_patch = override_settings(CHATBOT_GEMINI_ENDPOINT=f'http://127.0.0.1:{server.server_port}')
+        settings_patch.enable()
+        self.addCleanup(settings_patch.disable)
+        self.registry = GeminiClientRegistry()
+
+    def test_models_send_requests_through_the_registered_client(self):
+        model = self.registry.get_model('test-key', 'gemini-test')
+        client = self.registry._clients['test-key']
+        with mock.patch('google.generativeai.client.get_default_generative_client') as default_client, \
+                mock.patch.object(client, 'generate_content', wraps=client.generate_content) as generate:
+            self.assertEqual(model.generate_content('How do I spot phishing?').text, SAMPLE_REPLY)
+            streamed = ''.join(chunk.text for chunk in model.generate_content('Hi', stream=True))
+        default_client.assert_not_called()
+        generate.assert_called_once()
+        self.assertEqual(streamed.split(), SAMPLE_REPLY.split())
+        self.assertEqual((self.fake.counts['generate'], self.fake.counts['stream']), (1, 1))
+
+    def test_models_share_one_client_per_api_key(self):
+        flash = self.registry.get_model('test-key', 'gemini-flash')
+        self.assertIs(self.registry.get_model('test-key', 'gemini-flash'), flash)
+        pro = self.registry.get_model('test-key', 'gemini-pro')
+        other = self.registry.get_model('other-key', 'gemini-flash')
+        self.assertIs(pro._client, flash._client)
+        self.assertIsNot(other._client, flash._client)
+
+    def test_library_without_the_client_attribute_is_rejected(self):
+        with mock.patch('google.generativeai.GenerativeModel', return_value=object()):
+            with self.assertRaises(ImproperlyConfigured):
+                self.registry.get_model('test-key', 'gemini-test')
+
+
+class ChatbotStreamTests(TestCase):
+    def setUp(self):
+        ChatbotConfig.objects.create(gemini_api_key='test-key', gemini_model='gemini-test')
+        self.slots = UpstreamSlots(limit=1)
+        self.breaker = CircuitBreaker(threshold=3, cooldown=60)
+        self.logger = mock.Mock()
+        self.get_model = mock.Mock()
+        model = self.get_model.return_value
+        model.generate_content.return_value = iter([mock.Mock(text='Stay '), mock.Mock(text='safe.')])
+        for target, value in (
+            ('main.views.upstream_slots', self.slots),
+            ('main.views.gemini_breaker', self.breaker),
+            ('main.views.conversation_logger', self.logger),
+            ('main.views.gemini_clients.get_model', self.get_model),
+            ('main.ratelimit.chatbot_limiter', mock.Mock(**{'check.return_value': 0})),
+        ):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def stream(self, message='How do I spot phishing?'):
+        request = RequestFactory().post(
+            '/api/chatbot/stream/', json.dumps({'message': message}), content_type='application/json'
+        )
+        return chatbot_stream_api(request)
+
+    def test_streamed_reply_releases_the_slot(self):
+        body = b''.join(self.stream())
+        self.assertIn(b'event: chunk', body)
+        self.assertIn(b'event: done', body)
+        self.assertTrue(self.slots.acquire())
+
+    def test_closing_an_unread_stream_releases_the_slot(self):
+        response = self.stream()
+        self.assertFalse(self.slots.acquire())
+        response.close()
+        self.assertTrue(self.slots.acquire())
+        self.logger.log.assert_not_called()
+
+    def test_model_setup_failure_is_an_error_event(self):
+        self.get_model.side_effect = ValueError('invalid API key')
+        response = self.stream()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.startswith(b'event: error'))
+        self.assertEqual(self.logger.log.call_args.kwargs['success'], False)
+        self.assertEqual(self.breaker.failures, 1)
+        self.assertTrue(self.slots.acquire())
+
+
+@override_settings(ALLOWED_HOSTS=['one.example', 'two.example'])
+class CrimeApiCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        CyberCrime.objects.bulk_create([
+            CyberCrime(type=f'Crime {n}', description='-', category='email_fraud', severity='low') for n in range(3)
+        ])
+
+    def test_cached_pages_keep_the_requesting_host_in_links(self):
+        url = reverse('crime_api_list') + '?page_size=1'
+        first = self.client.get(url, HTTP_HOST='one.example').json()
+        second = self.client.get(url, HTTP_HOST='two.example', secure=True).json()
+        self.assertTrue(first['next'].startswith('http://one.example/api/crimes/?'))
+        self.assertTrue(second['next'].startswith('https://two.example/api/crimes/?'))
+        self.assertEqual([crime['id'] for crime in first['results']], [crime['id'] for crime in second['results']])
+        self.assertIn('://two.example/', json.dumps(second['results']))
+        self.assertNotIn('one.example', json.dumps(second['results']))
+
+
+class SuggestIndexRefreshTests(SimpleTestCase):
+    def test_refresh_thread_closes_its_connection_and_logs_failures(self):
+        index = SuggestIndex(refresh_interval=60)
+        index._refreshing = True
+        with mock.patch.object(index, 'build', side_effect=RuntimeError('database is locked')), \
+                mock.patch('main.search.connection') as connection, \
+                self.assertLogs('main.search', 'ERROR') as logs:
+            index._refresh()
+        connection.close.assert_called_once_with()
+        self.assertFalse(index._refreshing)
+        self.assertIn('database is locked', logs.output[0])
+
+
+class ChatSessionTests(TestCase):
+    def follow_up(self, client_token, n):
+        session = ChatSession.from_client_token(client_token)
+        session.add_turn(f'question {n}', f'answer {n}.')
+        return session
+
+    def test_first_turn_travels_in_a_signed_token(self):
+        session = ChatSession()
+        session.add_turn('question 1', 'answer 1.')
+        self.assertFalse(ChatSession.objects.exists())
+        self.assertNotEqual(session.client_token, session.token)
+
+        session = self.follow_up(session.client_token, 2)
+        saved = ChatSession.objects.get()
+        self.assertEqual(session.client_token, saved.token)
+        self.assertEqual([turn['user'] for turn in saved.turns], ['question 1', 'question 2'])
+        self.assertEqual((saved.turn_count, saved.version), (2, 1))
+
+    def test_tampered_token_starts_a_new_session(self):
+        session = ChatSession()
+        session.add_turn('question 1', 'answer 1.')
+        client_token = session.client_token
+        value, signature = client_token.rsplit(':', 1)
+        forged = signing.dumps(
+            {'token': session.token, 'summary': '', 'turns': [{'user': 'x', 'assistant': 'injected'}], 'turn_count': 1},
+            salt=ChatSession.SIGNING_SALT, compress=True,
+        ).rsplit(':', 1)[0] + ':' + signature
+        for token in (value + ':' + signature[::-1], forged, 'unknown-token'):
+            restored = ChatSession.from_client_token(token)
+            self.assertEqual((restored.turns, restored.summary), ([], ''))
+            self.assertNotEqual(restored.token, session.token)
+
+    def test_expired_session_is_not_resumed(self):
+        session = ChatSession()
+        session.add_turn('question 1', 'answer 1.')
+        session = self.follow_up(session.client_token, 2)
+        ChatSession.objects.update(updated_at=timezone.now() - timedelta(seconds=settings.CHATBOT_SESSION_TTL + 1))
+        self.assertEqual(ChatSession.from_client_token(session.token).turns, [])
+
+    def test_concurrent_turns_are_both_kept(self):
+        session = ChatSession()
+        session.add_turn('question 1', 'answer 1.')
+        token = self.follow_up(session.client_token, 2).token
+        first, second = ChatSession.from_client_token(token), ChatSession.from_client_token(token)
+        first.add_turn('question 3', 'answer 3.')
+        second.add_turn('question 4', 'answer 4.')
+        saved = ChatSession.objects.get()
+        self.assertEqual([turn['user'] for turn in saved.turns], [f'question {n}' for n in range(1, 5)])
+        self.assertEqual((saved.turn_count, saved.version), (4, 3))
+
+    def test_concurrent_first_follow_ups_share_one_row(self):
+        session = ChatSession()
+        session.add_turn('question 1', 'answer 1.')
+        self.follow_up(session.client_token, 2)
+        self.follow_up(session.client_token, 3)
+        saved = ChatSession.objects.get()
+        self.assertEqual([turn['user'] for turn in saved.turns], ['question 1', 'question 2', 'question 3'])
+
+    def test_turn_is_not_saved_over_a_session_that_keeps_changing(self):
+        session = ChatSession()
+        session.add_turn('question 1', 'answer 1.')
+        token = self.follow_up(session.client_token, 2).token
+        stale = ChatSession.from_client_token(token)
+        ChatSession.from_client_token(token).add_turn('question 3', 'answer 3.')
+        with mock.patch.object(ChatSession, 'refresh_from_db'), self.assertRaises(RuntimeError):
+            stale.add_turn('question 4', 'answer 4.')
+        self.assertEqual(ChatSession.objects.get().turn_count, 3)
+
+    @override_settings(CHATBOT_HISTORY_TOKENS=40, CHATBOT_SUMMARY_TOKENS=40)
+    def test_old_turns_roll_over_into_a_bounded_summary(self):
+        session = ChatSession()
+        for n in range(1, 9):
+            session.add_turn(f'question {n} ' + 'x' * 40, f'answer {n}. More detail that is dropped.')
+        session = ChatSession.objects.get()
+        self.assertEqual(session.turn_count, 8)
+        self.assertEqual(session.turns[-1]['user'][:10], 'question 8')
+        self.assertLess(len(session.turns), 8)
+        lines = session.summary.split('\n')
+        self.assertTrue(all(line.startswith('- User asked: question') for line in lines))
+        self.assertNotIn('More detail', session.summary)
+        self.assertNotIn('question 1 ', session.summary)
+        self.assertIn(f'question {8 - len(session.turns)} ', lines[-1])
+
+
+class CrimeSearchTests(TestCase):
+    def setUp(self):
+        # Signals schedule related-crime refreshes on a background thread; not needed here
+        patcher = mock.patch.object(related_crimes, 'schedule')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.in_type = self.crime('Phishing emails', 'Messages that imitate banks.', 'email_fraud')
+        self.in_body = self.crime('Fake invoices', 'Often sent with phishing links.', 'financial_fraud')
+        self.in_tip = self.crime('Account takeover', 'Stolen passwords.', 'personal_data', tips=['Beware of phishing'])
+        self.unrelated = self.crime('Cyberstalking', 'Repeated unwanted contact.', 'harassment')
+
+    def crime(self, crime_type, description, category, tips=()):
+        with self.captureOnCommitCallbacks(execute=True):
+            crime = CyberCrime(type=crime_type, description=description, category=category, severity='high')
+            crime.save_with_guidance(list(tips), [])
+        return crime
+
+    def test_index_is_available_on_sqlite(self):
+        self.assertTrue(search_index.available())
+
+    def test_matches_in_the_type_rank_first(self):
+        crimes, facets = search_crimes('phishing')
+        self.assertEqual(crimes[0], self.in_type.pk)
+        self.assertEqual(set(crimes), {self.in_type.pk, self.in_body.pk, self.in_tip.pk})
+        self.assertEqual(facets, {'email_fraud': 1, 'financial_fraud': 1, 'personal_data': 1})
+
+    def test_terms_match_as_prefixes_and_all_must_match(self):
+        self.assertEqual(search_crimes('phish invo')[0], [self.in_body.pk])
+        self.assertEqual(search_crimes('cybersta')[0], [self.unrelated.pk])
+
+    def test_category_filter_keeps_the_unfiltered_facets(self):
+        crimes, facets = search_crimes('phishing', 'financial_fraud')
+        self.assertEqual(crimes, [self.in_body.pk])
+        self.assertEqual(sum(facets.values()), 3)
+
+    def test_search_syntax_in_queries_is_treated_as_text(self):
+        for query in ('phishing OR stalking', 'phishing"', 'NEAR(phishing', 'phishing*', '-phishing'):
+            crimes, _ = search_crimes(query)
+            self.assertIsInstance(crimes, list, query)
+
+    def test_edits_and_deletes_update_the_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.unrelated.type = 'Sextortion'
+            self.unrelated.save()
+        self.assertEqual(search_crimes('sextortion')[0], [self.unrelated.pk])
+        self.assertEqual(search_crimes('cybersta')[0], [])
+
+        self.in_type.delete()
+        self.assertNotIn(self.in_type.pk, search_crimes('phishing')[0])
+
+    def test_rebuild_reindexes_every_crime(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM cybercrime_search')
+        self.assertEqual(search_crimes('phishing')[0], [])
+        self.assertEqual(search_index.rebuild(), 4)
+        self.assertEqual(len(search_crimes('phishing')[0]), 3)
+
+    def test_like_fallback_without_the_index(self):
+        with mock.patch.object(search_index, 'available', return_value=False):
+            crimes, facets = search_crimes('phishing')
+            self.assertEqual(set(crimes.values_list('pk', flat=True)), {self.in_type.pk, self.in_body.pk})
+            self.assertEqual(facets, {'email_fraud': 1, 'financial_fraud': 1})
+            crimes, _ = search_crimes('PHISHING', 'email_fraud')
+            self.assertEqual(list(crimes), [self.in_type])
+
+
+class SaveWithGuidanceTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(related_crimes, 'schedule')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def guidance(self, crime, kind):
+        return list(crime.guidance.filter(kind=kind).values_list('position', 'text'))
+
+    def test_items_are_stored_in_the_given_order(self):
+        crime = CyberCrime(type='Phishing', description='Fake emails.', category='email_fraud', severity='high')
+        crime.save_with_guidance(['Check the sender', 'Do not click links'], ['Report to the bank'])
+
+        self.assertEqual(self.guidance(crime, CrimeGuidance.TIP), [(1, 'Check the sender'), (2, 'Do not click links')])
+        self.assertEqual(self.guidance(crime, CrimeGuidance.STEP), [(1, 'Report to the bank')])
+        self.assertEqual(CyberCrime.objects.get(pk=crime.pk).prevention_tip_count, 2)
+
+    def test_saving_again_replaces_the_items(self):
+        crime = CyberCrime(type='Phishing', description='Fake emails.', category='email_fraud', severity='high')
+        crime.save_with_guidance(['Old tip', 'Another old tip'], ['Old step'])
+        list(CyberCrime.objects.prefetch_related('guidance').get(pk=crime.pk).guidance.all())
+
+        crime.save_with_guidance(['New tip'], ['First step', 'Second step'])
+
+        self.assertEqual(self.guidance(crime, CrimeGuidance.TIP), [(1, 'New tip')])
+        self.assertEqual(self.guidance(crime, CrimeGuidance.STEP), [(1, 'First step'), (2, 'Second step')])
+        self.assertEqual(CrimeGuidance.objects.count(), 3)
+        self.assertEqual(CyberCrime.objects.get(pk=crime.pk).prevention_tip_count, 1)
+
+
+class GuidanceMigrationTests(TransactionTestCase):
+    before = [('main', '0011_cybercrime_keyset_indexes')]
+    after = [('main', '0012_crime_guidance')]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        self.latest = executor.loader.graph.leaf_nodes('main')
+        executor.migrate(self.before)
+        self.addCleanup(self.migrate, self.latest)
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def test_legacy_columns_become_ordered_guidance(self):
+        old_apps = MigrationExecutor(connection).loader.project_state(self.before).apps
+        OldCrime = old_apps.get_model('main', 'CyberCrime')
+        listed = OldCrime.objects.create(
+            type='Phishing', description='Fake emails.', category='email_fraud', severity='high',
+            prevention_tips=['Check the sender', ' ', 'Do not click links'], reporting_steps=['Call the bank'],
+            prevention_tip_5='Use two-factor login', reporting_step_6='Report to the police',
+        )
+        empty = OldCrime.objects.create(
+            type='Cyberstalking', description='Unwanted contact.', category='harassment', severity='low',
+            prevention_tips=[], reporting_steps=[],
+        )
+        # Older databases also carry numbered columns the migration state never knew about
+        with connection.cursor() as cursor:
+            cursor.execute('ALTER TABLE cybercrime_data ADD COLUMN prevention_tip_1 varchar(500) NULL')
+            cursor.execute("UPDATE cybercrime_data SET prevention_tip_1 = 'Block the sender' WHERE id = %s", [listed.pk.hex])
+
+        new_apps = self.migrate(self.after)
+
+        Guidance = new_apps.get_model('main', 'CrimeGuidance')
+        tips = Guidance.objects.filter(crime=listed.pk, kind='tip').order_by('position')
+        self.assertEqual(
+            list(tips.values_list('position', 'text')),
+            [(1, 'Check the sender'), (2, 'Do not click links'), (3, 'Block the sender'), (4, 'Use two-factor login')],
+        )
+        steps = Guidance.objects.filter(crime=listed.pk, kind='step').order_by('position')
+        self.assertEqual(list(steps.values_list('text', flat=True)), ['Call the bank', 'Report to the police'])
+        self.assertFalse(Guidance.objects.filter(crime=empty.pk).exists())
+
+        NewCrime = new_apps.get_model('main', 'CyberCrime')
+        self.assertEqual(NewCrime.objects.get(pk=listed.pk).prevention_tip_count, 4)
+        self.assertEqual(NewCrime.objects.get(pk=empty.pk).prevention_tip_count, 0)
+        with connection.cursor() as cursor:
+            columns = {column.name for column in connection.introspection.get_table_description(cursor, 'cybercrime_data')}
+        self.assertFalse(columns & {'prevention_tips', 'reporting_steps', 'prevention_tip_1', 'prevention_tip_5'})
+
+    def test_reversing_writes_the_guidance_back_into_the_lists(self):
+        new_apps = self.migrate(self.after)
+        NewCrime = new_apps.get_model('main', 'CyberCrime')
+        crime = NewCrime.objects.create(type='Phishing', description='Fake emails.', category='email_fraud', severity='high')
+        Guidance = new_apps.get_model('main', 'CrimeGuidance')
+        Guidance.objects.bulk_create([
+            Guidance(crime=crime, kind='tip', position=2, text='Second tip'),
+            Guidance(crime=crime, kind='tip', position=1, text='First tip'),
+            Guidance(crime=crime, kind='step', position=1, text='Only step'),
+        ])
+
+        old_apps = self.migrate(self.before)
+
+        restored = old_apps.get_model('main', 'CyberCrime').objects.get(pk=crime.pk)
+        self.assertEqual(restored.prevention_tips, ['First tip', 'Second tip'])
+        self.assertEqual(restored.reporting_steps, ['Only step'])
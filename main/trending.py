@@ -0,0 +1,111 @@
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Power
+from django.utils import timezone
+
+from .models import CrimeViewBucket, CyberCrime
+
+
+TRENDING_KEY = 'trending-crime-ids'
+
+# Scores this many half-lives old are treated as zero rather than computed (and underflowing)
+HORIZON_HALF_LIVES = 64
+
+
+def hour_number(moment):
+    """Whole hours since the Unix epoch"""
+    return int(moment.timestamp() // 3600)
+
+
+def hour_start(moment):
+    return timezone.localtime(moment, dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def decayed_score(number):
+    """trending_score decayed from its own trending_hour to hour number"""
+    half_life = settings.TRENDING_HALF_LIFE_HOURS
+    return Case(
+        When(
+            trending_hour__gte=number - int(HORIZON_HALF_LIVES * half_life),
+            then=F('trending_score') * Power(Value(0.5), (Value(number) - F('trending_hour')) / Value(half_life)),
+        ),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def add_views(views, moment):
+    """Update fields adding views at moment to a crime's trending score.
+
+    The score is a view count where each view's weight halves every
+    TRENDING_HALF_LIFE_HOURS; decaying the stored score to the current hour
+    and adding the new views keeps it exact without revisiting old buckets.
+    """
+    number = hour_number(moment)
+    return {
+        'trending_score': decayed_score(number) + Value(float(views)),
+        'trending_hour': number,
+    }
+
+
+def record_view_buckets(counts, moment):
+    """Add {crime_id: views} to the crimes' buckets for the hour containing moment"""
+    hour = hour_start(moment)
+    CrimeViewBucket.objects.bulk_create(
+        [CrimeViewBucket(crime_id=crime_id, hour=hour) for crime_id in counts], ignore_conflicts=True
+    )
+    by_views = {}
+    for crime_id, views in counts.items():
+        by_views.setdefault(views, []).append(crime_id)
+    for views, crime_ids in by_views.items():
+        CrimeViewBucket.objects.filter(hour=hour, crime_id__in=crime_ids).update(views=F('views') + views)
+
+
+def rank_trending(limit):
+    """Ids of the crimes with the highest decayed view counts right now.
+
+    Only crimes viewed within the horizon are scored, through the
+    trending_hour index; if too few were viewed, all-time clicks fill the rest.
+    """
+    number = hour_number(timezone.now())
+    recent = CyberCrime.objects.filter(
+        trending_hour__gte=number - int(HORIZON_HALF_LIVES * settings.TRENDING_HALF_LIFE_HOURS),
+        trending_score__gt=0,
+    )
+    ids = list(
+        recent.annotate(current_score=decayed_score(number))
+        .order_by('-current_score', '-learn_more_clicks').values_list('pk', flat=True)[:limit]
+    )
+    if len(ids) < limit:
+        ids += CyberCrime.objects.exclude(pk__in=ids).order_by('-learn_more_clicks').values_list(
+            'pk', flat=True
+        )[:limit - len(ids)]
+    return ids
+
+
+def trending_crimes(limit):
+    """The top trending crimes for listings, from a ranking refreshed every TRENDING_REFRESH seconds"""
+    ids = cache.get(TRENDING_KEY)
+    if ids is None:
+        ids = rank_trending(max(settings.TRENDING_TOP_K, limit))
+        cache.set(TRENDING_KEY, ids, settings.TRENDING_REFRESH)
+    crimes = CyberCrime.objects.only(*CyberCrime.LISTING_FIELDS).in_bulk(ids[:limit])
+    return [crimes[pk] for pk in ids[:limit] if pk in crimes]
+
+
+def view_series(crime_id, hours=168):
+    """Hourly views of one crime over the last `hours` hours, oldest first, with empty hours as zero"""
+    end = hour_start(timezone.now())
+    start = end - timedelta(hours=hours - 1)
+    views = dict(
+        CrimeViewBucket.objects.filter(crime_id=crime_id, hour__gte=start).values_list('hour', 'views')
+    )
+    series = []
+    for offset in range(hours):
+        hour = start + timedelta(hours=offset)
+        series.append({'hour': hour.isoformat(), 'views': views.get(hour, 0)})
+    return series
+
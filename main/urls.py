@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     
@@ -14,10 +14,18 @@ urlpatterns = [
     path('admin/dashboard/', views.admin_dashboard, name='admin_dashboard'),
     path('admin/crimes/', views.admin_crimes, name='admin_crimes'),
     path('admin/chatbot/', views.admin_chatbot, name='admin_chatbot'),
+    path('admin/live/', views.admin_live_activity, name='admin_live_activity'),
+    path('admin/live/stream/', views.admin_live_stream, name='admin_live_stream'),
     path('admin/customize-bot/', views.customize_bot, name='customize_bot'),
     
     path('api/chatbot/', views.chatbot_api, name='chatbot_api'),
+    path('api/chatbot/stream/', views.chatbot_stream_api, name='chatbot_stream_api'),
     path('api/increment-clicks/', views.increment_clicks, name='increment_clicks'),
+    path('api/events/', views.events_api, name='events_api'),
+    path('api/crimes/', api.CrimeListAPIView.as_view(), name='crime_api_list'),
+    path('api/crimes/<uuid:crime_id>/', api.CrimeDetailAPIView.as_view(), name='crime_api_detail'),
+    path('api/crimes/suggest/', views.crime_suggest_api, name='crime_suggest_api'),
     path('admin/crimes/<uuid:crime_id>/data/', views.crime_data_api, name='crime_data_api'),
+    path('admin/crimes/<uuid:crime_id>/views/', views.crime_views_api, name='crime_views_api'),
 
 ] 
\ No newline at end of file
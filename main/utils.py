@@ -1,6 +1,8 @@
 import re
 import html
+from django.conf import settings
 from django.utils import timezone
+from .live import live_counters
 from .models import AuditLog
 
 
@@ -16,18 +18,25 @@ def log_audit_action(admin_user, action, resource_type, resource_id=None, detail
             ip_address='127.0.0.1',  # Will be updated with actual IP
             user_agent='Django App'
         )
+        live_counters.add('audit_events')
     except Exception as e:
         print(f"Failed to log audit action: {e}")
 
 
 def get_client_ip(request):
-    """Get client IP address from request"""
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR')
-    return ip
+    """Get client IP address from request.
+
+    X-Forwarded-For is only trusted as far as TRUSTED_PROXY_COUNT proxies:
+    each one appends the address it received the request from, so the client
+    is that many entries from the right. Anything further left is sent by the
+    client itself and may be forged.
+    """
+    proxies = settings.TRUSTED_PROXY_COUNT
+    if proxies:
+        hops = [hop.strip() for hop in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if hop.strip()]
+        if len(hops) >= proxies:
+            return hops[-proxies]
+    return request.META.get('REMOTE_ADDR')
 
 
 def sanitize_input(text):
@@ -0,0 +1,152 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CrimeDailyViewers
+from .utils import get_client_ip
+
+
+def visitor_fingerprint(request):
+    """64-bit keyed hash of the client IP and user agent; the raw values are never stored"""
+    visitor = f"{get_client_ip(request)}|{request.META.get('HTTP_USER_AGENT', '')}"
+    key = hashlib.sha256(settings.SECRET_KEY.encode('utf-8')).digest()
+    return int.from_bytes(hashlib.blake2b(visitor.encode('utf-8'), digest_size=8, key=key).digest(), 'big')
+
+
+class HyperLogLog:
+    """Distinct-count sketch: 2**precision one-byte registers, about 1.04 / sqrt(2**precision) error.
+
+    Sketches of the same precision merge by taking the larger of each
+    register, so per-worker and per-day sketches combine into one for any
+    set of workers and days without double counting.
+    """
+
+    def __init__(self, precision=11, registers=None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers) if registers else bytearray(self.size)
+
+    @staticmethod
+    def register_rank(value, precision=11):
+        """Register index and rank (leading zeros + 1 of the remaining bits) of a 64-bit hash"""
+        index = value >> (64 - precision)
+        rest = value & ((1 << (64 - precision)) - 1)
+        return index, (64 - precision) - rest.bit_length() + 1
+
+    def add(self, value):
+        index, rank = self.register_rank(value, self.precision)
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, ranks):
+        """Fold in {index: rank} pairs collected with register_rank()"""
+        for index, rank in ranks.items():
+            if rank > self.registers[index]:
+                self.registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size * self.size / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            # Linear counting is more accurate while many registers are still empty
+            estimate = self.size * math.log(self.size / zeros)
+        return round(estimate)
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+
+class BloomFilter:
+    """Fixed-size set membership with false positives at about error_rate once capacity items are added"""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.array = bytearray((self.bits + 7) // 8)
+
+    def _positions(self, value):
+        # Double hashing: k positions from two halves of one 64-bit hash
+        first, second = value >> 32, (value & 0xFFFFFFFF) | 1
+        return [(first + i * second) % self.bits for i in range(self.hashes)]
+
+    def add(self, value):
+        """Add value; returns whether it may have been added before"""
+        seen = True
+        for position in self._positions(value):
+            byte, bit = divmod(position, 8)
+            if not self.array[byte] & (1 << bit):
+                seen = False
+                self.array[byte] |= 1 << bit
+        return seen
+
+    def __contains__(self, value):
+        return all(self.array[byte] & (1 << bit) for byte, bit in (divmod(p, 8) for p in self._positions(value)))
+
+
+class RecentViews:
+    """Per-worker duplicate suppression for (visitor, crime) views within a time window.
+
+    Two Bloom filters take turns: views go into the current one, and the
+    previous one is dropped when the current one is window seconds old, so a
+    repeat is caught for at least window seconds and memory stays fixed.
+    """
+
+    def __init__(self, window, capacity):
+        self.window = window
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._current = BloomFilter(capacity)
+        self._previous = BloomFilter(capacity)
+        self._started = time.monotonic()
+
+    def seen(self, visitor, crime_id):
+        """Record a view; True if the same visitor viewed the same crime recently"""
+        value = int.from_bytes(
+            hashlib.blake2b(crime_id.bytes + visitor.to_bytes(8, 'big'), digest_size=8).digest(), 'big'
+        )
+        with self._lock:
+            if time.monotonic() - self._started >= self.window:
+                self._previous, self._current = self._current, BloomFilter(self.capacity)
+                self._started = time.monotonic()
+            return self._current.add(value) or value in self._previous
+
+
+def record_viewers(pending):
+    """Merge {(crime_id, day): {index: rank}} into the stored daily sketches"""
+    with transaction.atomic():
+        for day in sorted({day for _, day in pending}):
+            crime_ids = [crime_id for crime_id, pending_day in pending if pending_day == day]
+            CrimeDailyViewers.objects.bulk_create(
+                [CrimeDailyViewers(crime_id=crime_id, day=day) for crime_id in crime_ids], ignore_conflicts=True
+            )
+            rows = list(CrimeDailyViewers.objects.select_for_update().filter(day=day, crime_id__in=crime_ids))
+            for row in rows:
+                sketch = HyperLogLog(registers=row.registers)
+                sketch.update(pending[(row.crime_id, day)])
+                row.registers = sketch.to_bytes()
+            CrimeDailyViewers.objects.bulk_update(rows, ['registers'])
+
+
+def unique_viewers(crime_ids, days=1):
+    """Approximate distinct visitors per crime over the last `days` days, including today"""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    sketches = {}
+    for crime_id, registers in CrimeDailyViewers.objects.filter(
+        crime_id__in=crime_ids, day__gte=since
+    ).values_list('crime_id', 'registers'):
+        sketch = HyperLogLog(registers=registers)
+        if crime_id in sketches:
+            sketches[crime_id].merge(sketch)
+        else:
+            sketches[crime_id] = sketch
+    return {crime_id: sketches[crime_id].count() if crime_id in sketches else 0 for crime_id in crime_ids}
@@ -1,28 +1,68 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.core.paginator import Paginator
-from django.db.models import Q, Count, Sum
+from django.db.models import Case, Count, IntegerField, Value, When
 from django.db import connection
 from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 from django.contrib import messages
 from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
 import json
-from datetime import datetime, timedelta
+import threading
+import time
+import uuid
+from datetime import timedelta
 from dotenv import load_dotenv
-import google.generativeai as genai
 from .models import (
-    AdminUser, CyberCrime, 
-    ChatbotConfig, ChatbotConversation, AuditLog
+    AdminUser, CyberCrime, RelatedCrime,
+    ChatbotConfig, ChatbotConversation, ChatSession, AuditLog, estimate_tokens
 )
 from .forms import ChatbotConfigForm
 from .utils import log_audit_action, get_client_ip, sanitize_input
+from .conversation_log import conversation_logger
+from .click_counter import click_counter, crime_exists
+from .trending import trending_crimes, view_series
+from .viewers import unique_viewers, visitor_fingerprint
+from .events import apply_events, parse_events
+from .stats import SEVERITY_WEIGHTS, crime_stats
+from .live import LiveStream, current_minute, live_board
+from .search import search_crimes, suggest_index
+from .pagination import KeysetPage, keyset_paginate
+from .page_cache import cache_catalog_page, catalog_cache, conditional_crime_view
+from .metrics import chatbot_metrics
+from .retrieval import grounding_context
+from .ratelimit import chatbot_rate_limit, upstream_slots, too_many_requests
+from .chatbot import (
+    build_chatbot_prompt, chatbot_error_message, chunk_text, sse_event,
+    response_cache, gemini_clients, gemini_breaker, upstream_request_options,
+    offline_fallback_answer
+)
 
 load_dotenv()
 
+UPSTREAM_BUSY_MESSAGE = 'I\'m currently experiencing high demand. Please wait a moment and try again.'
+CRIMES_PER_PAGE = 9
+ADMIN_CRIMES_PER_PAGE = 25
+# Admin crimes list orderings (?sort=); each ends in id so every row has one cursor position
+ADMIN_CRIME_SORTS = {
+    'created_at': ('Date Created (Newest)', ('-created_at', '-id')),
+    'created_at_old': ('Date Created (Oldest)', ('created_at', 'id')),
+    'type': ('Crime Type (A-Z)', ('type', 'id')),
+    'type_desc': ('Crime Type (Z-A)', ('-type', '-id')),
+    'severity': ('Severity (High to Low)', ('-severity_rank', '-created_at', '-id')),
+    'severity_low': ('Severity (Low to High)', ('severity_rank', '-created_at', '-id')),
+    'views': ('Most Viewed', ('-learn_more_clicks', '-id')),
+    'views_least': ('Least Viewed', ('learn_more_clicks', 'id')),
+}
+ADMIN_CRIME_TOP_N = (5, 10, 15)
+
 
 def clean_chatbot_response(text):
     """Clean up chatbot response text for better formatting"""
@@ -42,48 +82,54 @@ def clean_chatbot_response(text):
     return text
 
 
+@cache_catalog_page
 def home(request):
     """Home page view"""
     # Get statistics
-    total_crimes = CyberCrime.objects.count()
-    
-    trending_crimes = CyberCrime.objects.order_by('-learn_more_clicks')[:4]
+    total_crimes = catalog_cache.get_or_set('crime-count', CyberCrime.objects.count)
     
     context = {
         'total_crimes': total_crimes,
-        'trending_crimes': trending_crimes,
+        # Ranked by recent views with time decay; only looked up when the trending fragment isn't cached
+        'trending_crimes': SimpleLazyObject(lambda: trending_crimes(4)),
     }
     return render(request, 'main/home.html', context)
 
 
+@cache_catalog_page
 def cyber_crimes(request):
     """Cyber crimes listing page"""
     search_query = request.GET.get('search', '')
     category_filter = request.GET.get('category', '')
     
-    crimes = CyberCrime.objects.all()
-    
-    if search_query:
-        crimes = crimes.filter(
-            Q(type__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(category__icontains=search_query)
-        )
+    # Ranked full-text search with per-category counts for the filter dropdown
+    crimes, facets = search_crimes(search_query, category_filter)
+    result_count = facets.get(category_filter, 0) if category_filter else sum(facets.values())
     
-    # Apply category filter
-    if category_filter:
-        crimes = crimes.filter(category=category_filter)
+    if isinstance(crimes, list):
+        # Search results are ranked primary keys already in memory; load just this page's crimes in rank order
+        paginator = Paginator(crimes, CRIMES_PER_PAGE)
+        page_obj = paginator.get_page(request.GET.get('page'))
+        page_crimes = CyberCrime.objects.only(*CyberCrime.LISTING_FIELDS).in_bulk(page_obj.object_list)
+        page_obj.object_list = [page_crimes[pk] for pk in page_obj.object_list if pk in page_crimes]
+        keyset = False
+    else:
+        # Browsing newest first: cursor pagination, so deep pages cost the same as page one
+        page_obj = keyset_paginate(crimes.only(*CyberCrime.LISTING_FIELDS), request, CRIMES_PER_PAGE)
+        keyset = True
     
-    # Pagination
-    paginator = Paginator(crimes, 9)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if request.GET.get('format') == 'json':
+        return crime_page_json(request, page_obj, keyset, result_count)
     
-    # Get categories for filter
-    categories = CyberCrime.CATEGORY_CHOICES
+    # Get categories with match counts for filter
+    categories = [
+        (value, label, facets.get(value, 0)) for value, label in CyberCrime.CATEGORY_CHOICES
+    ]
     
     context = {
         'page_obj': page_obj,
+        'keyset': keyset,
+        'result_count': result_count,
         'categories': categories,
         'search_query': search_query,
         'category_filter': category_filter,
@@ -91,8 +137,63 @@ def cyber_crimes(request):
     return render(request, 'main/cyber_crimes.html', context)
 
 
+def crime_summary(crime):
+    """JSON-friendly listing fields for a crime"""
+    return {
+        'id': str(crime.id),
+        'type': crime.type,
+        'description': crime.description,
+        'category': crime.category,
+        'category_display': crime.get_category_display(),
+        'severity': crime.severity,
+        'learn_more_clicks': crime.learn_more_clicks,
+        'created_at': crime.created_at.isoformat(),
+        'url': reverse('crime_detail', args=[crime.id]),
+    }
+
+
+def crime_page_json(request, page_obj, keyset, count):
+    """JSON version of a crime listing page with links to its neighbours"""
+    if keyset:
+        next_query = page_obj.next_query() if page_obj.has_next else None
+        previous_query = page_obj.previous_query() if page_obj.has_previous else None
+    else:
+        def page_query(number):
+            query = request.GET.copy()
+            query['page'] = number
+            return query.urlencode()
+        next_query = page_query(page_obj.next_page_number()) if page_obj.has_next() else None
+        previous_query = page_query(page_obj.previous_page_number()) if page_obj.has_previous() else None
+    return JsonResponse({
+        'count': count,
+        'next': f'?{next_query}' if next_query else None,
+        'previous': f'?{previous_query}' if previous_query else None,
+        'results': [crime_summary(crime) for crime in page_obj],
+    })
+
+
+@require_http_methods(["GET"])
+def crime_suggest_api(request):
+    """Typeahead suggestions for the crime search box"""
+    start_time = time.perf_counter()
+    query = request.GET.get('q', '').strip()[:100]
+    try:
+        limit = min(max(int(request.GET.get('limit', 8)), 1), 20)
+    except ValueError:
+        limit = 8
+
+    results = suggest_index.suggest(query, limit=limit)
+
+    response = JsonResponse({'query': query, 'results': results})
+    response['Server-Timing'] = f'suggest;dur={(time.perf_counter() - start_time) * 1000:.3f}'
+    return response
+
+
+@conditional_crime_view()
+@cache_catalog_page
 def crime_detail(request, crime_id):
     """Individual crime detail page"""
+    # Tips and steps are loaded by the template only when the cached crime body misses
     crime = get_object_or_404(CyberCrime, id=crime_id)
     
     # Note: Click count is now handled by the increment_clicks API endpoint
@@ -100,6 +201,10 @@ def crime_detail(request, crime_id):
     
     context = {
         'crime': crime,
+        # Precomputed by main.related; only queried when the related fragment isn't cached
+        'related_crimes': RelatedCrime.objects.filter(crime=crime).select_related('related').only(
+            'rank', 'crime_id', 'related__id', 'related__type', 'related__description', 'related__severity'
+        ),
     }
     return render(request, 'main/crime_detail.html', context)
 
@@ -182,16 +287,24 @@ def admin_dashboard(request):
     # Get statistics
     total_crimes = CyberCrime.objects.count()
     
-    # Get trending crimes
-    trending_crimes = CyberCrime.objects.order_by('-learn_more_clicks')[:5]
-    
     # Get recent activity
     recent_activity = AuditLog.objects.select_related('admin_user').order_by('-timestamp')[:10]
     
+    # Approximate unique viewers from the daily HyperLogLog sketches
+    trending = trending_crimes(5)
+    viewers_today = unique_viewers([crime.pk for crime in trending], days=1)
+    viewers_week = unique_viewers([crime.pk for crime in trending], days=7)
+    
     context = {
         'total_crimes': total_crimes,
-        'trending_crimes': trending_crimes,
+        'trending_crimes': trending,
+        'trending_viewers': [
+            {'crime': crime, 'today': viewers_today[crime.pk], 'week': viewers_week[crime.pk]}
+            for crime in trending
+        ],
         'recent_activity': recent_activity,
+        'catalog_cache_stats': catalog_cache.stats(),
+        'click_counter_stats': click_counter.stats(),
     }
     return render(request, 'admin/dashboard.html', context)
 
@@ -199,7 +312,7 @@ def admin_dashboard(request):
 @login_required
 def admin_crimes(request):
     """Admin crimes management"""
-    crimes = CyberCrime.objects.all()
+    crimes = CyberCrime.objects.only(*CyberCrime.LISTING_FIELDS)
     
     if request.method == 'POST':
         # Handle delete operation first
@@ -227,75 +340,22 @@ def admin_crimes(request):
         category = request.POST.get('category')
         severity = request.POST.get('severity')
         
-        # Get individual prevention tips
-        prevention_tip_1 = request.POST.get('prevention_tip_1', '').strip()
-        prevention_tip_2 = request.POST.get('prevention_tip_2', '').strip()
-        prevention_tip_3 = request.POST.get('prevention_tip_3', '').strip()
-        prevention_tip_4 = request.POST.get('prevention_tip_4', '').strip()
-        prevention_tip_5 = request.POST.get('prevention_tip_5', '').strip()
-        prevention_tip_6 = request.POST.get('prevention_tip_6', '').strip()
-        
-        # Get individual reporting steps
-        reporting_step_1 = request.POST.get('reporting_step_1', '').strip()
-        reporting_step_2 = request.POST.get('reporting_step_2', '').strip()
-        reporting_step_3 = request.POST.get('reporting_step_3', '').strip()
-        reporting_step_4 = request.POST.get('reporting_step_4', '').strip()
-        reporting_step_5 = request.POST.get('reporting_step_5', '').strip()
-        reporting_step_6 = request.POST.get('reporting_step_6', '').strip()
+        # Get individual prevention tips and reporting steps from the six inputs of each
+        prevention_tips = [request.POST.get(f'prevention_tip_{i}', '').strip() for i in range(1, 7)]
+        reporting_steps = [request.POST.get(f'reporting_step_{i}', '').strip() for i in range(1, 7)]
         
         # Debug: Print all POST data
         print(f"DEBUG - All POST data:")
         for key, value in request.POST.items():
             print(f"  {key}: {value}")
         
-        # Debug: Print form data
-        print(f"DEBUG - Form Data:")
-        print(f"Type: {crime_type}")
-        print(f"Description: {description}")
-        print(f"Category: {category}")
-        print(f"Severity: {severity}")
-        print(f"Prevention Tip 1: {prevention_tip_1}")
-        print(f"Prevention Tip 2: {prevention_tip_2}")
-        print(f"Prevention Tip 3: {prevention_tip_3}")
-        print(f"Prevention Tip 4: {prevention_tip_4}")
-        print(f"Prevention Tip 5: {prevention_tip_5}")
-        print(f"Prevention Tip 6: {prevention_tip_6}")
-        print(f"Reporting Step 1: {reporting_step_1}")
-        print(f"Reporting Step 2: {reporting_step_2}")
-        print(f"Reporting Step 3: {reporting_step_3}")
-        print(f"Reporting Step 4: {reporting_step_4}")
-        print(f"Reporting Step 5: {reporting_step_5}")
-        print(f"Reporting Step 6: {reporting_step_6}")
-        
         # Sanitize inputs
         crime_type = sanitize_input(crime_type)
         description = sanitize_input(description)
-        prevention_tip_1 = sanitize_input(prevention_tip_1)
-        prevention_tip_2 = sanitize_input(prevention_tip_2)
-        prevention_tip_3 = sanitize_input(prevention_tip_3)
-        prevention_tip_4 = sanitize_input(prevention_tip_4)
-        prevention_tip_5 = sanitize_input(prevention_tip_5)
-        prevention_tip_6 = sanitize_input(prevention_tip_6)
-        reporting_step_1 = sanitize_input(reporting_step_1)
-        reporting_step_2 = sanitize_input(reporting_step_2)
-        reporting_step_3 = sanitize_input(reporting_step_3)
-        reporting_step_4 = sanitize_input(reporting_step_4)
-        reporting_step_5 = sanitize_input(reporting_step_5)
-        reporting_step_6 = sanitize_input(reporting_step_6)
-        
-        # Combine prevention tips and reporting steps into lists
-        prevention_tips = [
-            prevention_tip_1, prevention_tip_2, prevention_tip_3, prevention_tip_4,
-            prevention_tip_5, prevention_tip_6
-        ]
-        reporting_steps = [
-            reporting_step_1, reporting_step_2, reporting_step_3, reporting_step_4,
-            reporting_step_5, reporting_step_6
-        ]
         
-        # Filter out empty tips/steps but keep non-empty ones
-        prevention_tips = [sanitize_input(tip) for tip in prevention_tips if tip and tip.strip()]
-        reporting_steps = [sanitize_input(step) for step in reporting_steps if step and step.strip()]
+        # Filter out empty tips/steps but keep non-empty ones, in order
+        prevention_tips = [sanitize_input(tip) for tip in prevention_tips if tip]
+        reporting_steps = [sanitize_input(step) for step in reporting_steps if step]
         
         print(f"DEBUG - After filtering:")
         print(f"  Prevention tips (filtered): {prevention_tips}")
@@ -307,12 +367,6 @@ def admin_crimes(request):
         if not reporting_steps:
             print("WARNING: No reporting steps found!")
         
-        print(f"DEBUG - Final prevention_tips count: {len(prevention_tips)}")
-        print(f"DEBUG - Final reporting_steps count: {len(reporting_steps)}")
-        
-        # Create new crime using Django ORM with individual fields
-        print(f"DEBUG - Creating crime with individual fields")
-        
         # Check if this is an update (crime_id provided)
         crime_id = request.POST.get('crime_id')
         if crime_id:
@@ -323,19 +377,7 @@ def admin_crimes(request):
                 crime.description = description
                 crime.category = category
                 crime.severity = severity
-                crime.prevention_tip_1 = prevention_tip_1
-                crime.prevention_tip_2 = prevention_tip_2
-                crime.prevention_tip_3 = prevention_tip_3
-                crime.prevention_tip_4 = prevention_tip_4
-                crime.prevention_tip_5 = prevention_tip_5
-                crime.prevention_tip_6 = prevention_tip_6
-                crime.reporting_step_1 = reporting_step_1
-                crime.reporting_step_2 = reporting_step_2
-                crime.reporting_step_3 = reporting_step_3
-                crime.reporting_step_4 = reporting_step_4
-                crime.reporting_step_5 = reporting_step_5
-                crime.reporting_step_6 = reporting_step_6
-                crime.save()
+                crime.save_with_guidance(prevention_tips, reporting_steps)
                 
                 print(f"DEBUG - Crime updated with ID: {crime.id}")
                 messages.success(request, 'Crime updated successfully!')
@@ -346,86 +388,70 @@ def admin_crimes(request):
                 return redirect('admin_crimes')
         else:
             # Create new crime
-            crime = CyberCrime.objects.create(
+            crime = CyberCrime(
                 type=crime_type,
                 description=description,
                 category=category,
                 severity=severity,
-                prevention_tip_1=prevention_tip_1,
-                prevention_tip_2=prevention_tip_2,
-                prevention_tip_3=prevention_tip_3,
-                prevention_tip_4=prevention_tip_4,
-                prevention_tip_5=prevention_tip_5,
-                prevention_tip_6=prevention_tip_6,
-                reporting_step_1=reporting_step_1,
-                reporting_step_2=reporting_step_2,
-                reporting_step_3=reporting_step_3,
-                reporting_step_4=reporting_step_4,
-                reporting_step_5=reporting_step_5,
-                reporting_step_6=reporting_step_6
             )
+            crime.save_with_guidance(prevention_tips, reporting_steps)
             
             print(f"DEBUG - Crime created with ID: {crime.id}")
             messages.success(request, 'Crime added successfully!')
         
         return redirect('admin_crimes')
     
-    # Calculate statistics
-    total_crimes = crimes.count()
-    critical_count = crimes.filter(severity='CRITICAL').count()
-    total_views = crimes.aggregate(total=Sum('learn_more_clicks'))['total'] or 0
+    # One aggregate query, cached until the next crime edit
+    stats = crime_stats()
+    total_crimes = stats['total']
     
-    # Calculate average severity (convert to numeric for calculation)
-    severity_values = {'LOW': 1, 'MEDIUM': 2, 'HIGH': 3, 'CRITICAL': 4}
-    total_severity = sum(severity_values.get(crime.severity, 0) for crime in crimes)
-    avg_severity = round(total_severity / total_crimes, 1) if total_crimes > 0 else 0
+    # Sorted over the whole catalog in the database, one cursor page (or the top N rows) at a time
+    sort = request.GET.get('sort')
+    if sort not in ADMIN_CRIME_SORTS:
+        sort = 'created_at'
+    order = ADMIN_CRIME_SORTS[sort][1]
+    if 'severity_rank' in {name.lstrip('-') for name in order}:
+        crimes = crimes.annotate(severity_rank=Case(
+            *[When(severity=severity, then=Value(weight)) for severity, weight in SEVERITY_WEIGHTS.items()],
+            default=Value(0), output_field=IntegerField(),
+        ))
+    try:
+        show = int(request.GET.get('show', ''))
+    except ValueError:
+        show = None
+    if show in ADMIN_CRIME_TOP_N:
+        page_obj = KeysetPage(list(crimes.order_by(*order)[:show]), False, False, request.GET, order)
+    else:
+        show = None
+        page_obj = keyset_paginate(crimes, request, ADMIN_CRIMES_PER_PAGE, order)
+    if request.GET.get('format') == 'json':
+        return crime_page_json(request, page_obj, True, total_crimes)
     
     context = {
-        'crimes': crimes,
+        'crimes': page_obj,
+        'page_obj': page_obj,
         'categories': CyberCrime.CATEGORY_CHOICES,
         'severity_choices': CyberCrime.SEVERITY_CHOICES,
         'total_crimes': total_crimes,
-        'critical_count': critical_count,
-        'total_views': total_views,
-        'avg_severity': avg_severity,
+        'critical_count': next(row['count'] for row in stats['severity_counts'] if row['value'] == 'critical'),
+        'total_views': stats['total_views'],
+        'avg_severity': stats['avg_severity'],
+        'severity_counts': stats['severity_counts'],
+        'category_counts': stats['category_counts'],
+        'sort': sort,
+        'sort_choices': [(value, label) for value, (label, _) in ADMIN_CRIME_SORTS.items()],
+        'show': show,
+        'top_choices': ADMIN_CRIME_TOP_N,
     }
     return render(request, 'admin/crimes.html', context)
 
 
 @login_required
+@conditional_crime_view('learn_more_clicks')
 def crime_data_api(request, crime_id):
     """API endpoint to get crime data for view/edit"""
     try:
-        crime = get_object_or_404(CyberCrime, id=crime_id)
-        
-        # Convert individual fields to lists for compatibility
-        prevention_tips = []
-        if crime.prevention_tip_1:
-            prevention_tips.append(crime.prevention_tip_1)
-        if crime.prevention_tip_2:
-            prevention_tips.append(crime.prevention_tip_2)
-        if crime.prevention_tip_3:
-            prevention_tips.append(crime.prevention_tip_3)
-        if crime.prevention_tip_4:
-            prevention_tips.append(crime.prevention_tip_4)
-        if crime.prevention_tip_5:
-            prevention_tips.append(crime.prevention_tip_5)
-        if crime.prevention_tip_6:
-            prevention_tips.append(crime.prevention_tip_6)
-            
-        reporting_steps = []
-        if crime.reporting_step_1:
-            reporting_steps.append(crime.reporting_step_1)
-        if crime.reporting_step_2:
-            reporting_steps.append(crime.reporting_step_2)
-        if crime.reporting_step_3:
-            reporting_steps.append(crime.reporting_step_3)
-        if crime.reporting_step_4:
-            reporting_steps.append(crime.reporting_step_4)
-        if crime.reporting_step_5:
-            reporting_steps.append(crime.reporting_step_5)
-        if crime.reporting_step_6:
-            reporting_steps.append(crime.reporting_step_6)
+        crime = get_object_or_404(CyberCrime.objects.prefetch_related('guidance'), id=crime_id)
         
         data = {
             'id': str(crime.id),
@@ -433,8 +459,8 @@ def crime_data_api(request, crime_id):
             'description': crime.description,
             'category': crime.category,
             'severity': crime.severity,
-            'prevention_tips': prevention_tips,
-            'reporting_steps': reporting_steps,
+            'prevention_tips': crime.get_prevention_tips_list(),
+            'reporting_steps': crime.get_reporting_steps_list(),
             'learn_more_clicks': crime.learn_more_clicks,
             'created_at': crime.created_at.isoformat(),
         }
@@ -444,6 +470,17 @@ def crime_data_api(request, crime_id):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@login_required
+def crime_views_api(request, crime_id):
+    """API endpoint for a crime's hourly views, for the admin views chart"""
+    try:
+        hours = min(max(int(request.GET.get('hours', 168)), 1), 24 * 90)
+    except ValueError:
+        return JsonResponse({'error': 'hours must be a whole number'}, status=400)
+    crime = get_object_or_404(CyberCrime.objects.only('id'), id=crime_id)
+    return JsonResponse({'id': str(crime.id), 'hours': view_series(crime.id, hours)})
+
+
 
 
 
@@ -458,50 +495,30 @@ def admin_chatbot(request):
             system_prompt="You are CyberSafe AI Assistant, a friendly yet professional cybersecurity advisor specializing in Indian cyber safety laws, threats, and prevention. Provide clear, human-like explanations that are informative but not overly long—just enough to cover the essential details. Always prioritize accuracy, practicality, and user safety.\n\nWhen giving advice:\n\nFocus on cyber threats, prevention tips, and safe online practices relevant to India.\n\nUse simple, relatable language without jargon unless necessary.\n\nWhere applicable, include relevant Indian laws (e.g., IT Act 2000) and real-world examples.\n\nWhen asked about reporting cybercrime:\n\nAlways guide users to official Indian government portals only, such as:\n\nNational Cyber Crime Reporting Portal: https://cybercrime.gov.in/\n\nIndian CERT: https://www.cert-in.org.in/\n\nDo not promote or mention non-governmental sites for reporting.\nIf the query is out of scope, politely decline and redirect to safe, official resources."
         )
     
-    # Calculate real statistics
-    
-    # Get current month's conversations
-    current_month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    monthly_conversations = ChatbotConversation.objects.filter(
-        created_at__gte=current_month_start
-    ).count()
-    
-    # Calculate average response time (last 100 conversations)
-    recent_conversations = ChatbotConversation.objects.filter(
-        success=True
-    ).order_by('-created_at')[:100]
-    
-    if recent_conversations:
-        avg_response_time = sum(conv.response_time for conv in recent_conversations) / len(recent_conversations)
-        avg_response_time = round(avg_response_time, 1)
-    else:
-        avg_response_time = 0.0
-    
-    # Calculate satisfaction rate (successful conversations in last 100)
-    total_recent = ChatbotConversation.objects.order_by('-created_at')[:100].count()
-    successful_recent = ChatbotConversation.objects.filter(
-        success=True
-    ).order_by('-created_at')[:100].count()
-    
-    if total_recent > 0:
-        satisfaction_rate = round((successful_recent / total_recent) * 100)
-    else:
-        satisfaction_rate = 100
+    # Statistics come from the hourly and daily rollups, not the conversation table
+    metrics = chatbot_metrics()
     
     context = {
         'config': config,
-        'total_conversations': monthly_conversations,
-        'avg_response_time': avg_response_time,
-        'satisfaction_rate': satisfaction_rate,
+        'total_conversations': metrics['month_conversations'],
+        'avg_response_time': metrics['last_24h']['avg_response_time'],
+        'satisfaction_rate': metrics['last_24h']['success_rate'],
+        'avg_prompt_tokens': metrics['last_24h']['avg_prompt_tokens'],
+        'latency_p50': metrics['last_24h']['p50'],
+        'latency_p95': metrics['last_24h']['p95'],
+        'metrics_trend': metrics['trend'],
+        'widget_opens': metrics['last_24h']['widget_opens'],
+        'cache_stats': response_cache.stats(),
+        'breaker_stats': gemini_breaker.stats(),
     }
     return render(request, 'admin/chatbot.html', context)
 
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@chatbot_rate_limit
 def chatbot_api(request):
     """Chatbot API endpoint - forwards user prompt to Gemini with system prompt from config"""
-    import time
     start_time = time.time()
     
     try:
@@ -524,20 +541,40 @@ def chatbot_api(request):
                 'response': 'The AI assistant is not configured yet. Please ask an admin to set the Gemini API key in the Chatbot settings.'
             })
 
-        # Configure Gemini with stored API key
-        genai.configure(api_key=config.gemini_api_key)
-        
         # Use the saved model from config
         model_id = config.gemini_model or 'gemini-1.5-flash'
         
+        # Ground the prompt in the most relevant catalog entries
+        context = grounding_context(user_message)
+        session = _load_chat_session(data.get('session'))
+        
+        # Serve repeated opening questions from the response cache
+        cache_key = None
+        if not session.turns and not session.summary:
+            cache_key = response_cache.make_key(model_id, config.system_prompt + context, user_message)
+            cached_text = response_cache.get(cache_key)
+            if cached_text is not None:
+                session.add_turn(user_message, cached_text)
+                conversation_logger.log(
+                    user_message=user_message,
+                    bot_response=cached_text,
+                    response_time=time.time() - start_time,
+                    success=True,
+                    cache_hit=True,
+                    session=_saved_session(session),
+                    ip_address=get_client_ip(request),
+                    user_agent=request.META.get('HTTP_USER_AGENT', '')
+                )
+                return JsonResponse({'response': cached_text, 'session': session.client_token})
+        
         try:
-            # Create model without system instruction for better compatibility
-            model = genai.GenerativeModel(model_id)
+            # Reuse the worker's model handle for this API key and model
+            model = gemini_clients.get_model(config.gemini_api_key, model_id)
         except Exception as e:
             print(f"Error creating model: {e}")
             # Log failed conversation
             response_time = time.time() - start_time
-            ChatbotConversation.objects.create(
+            conversation_logger.log(
                 user_message=user_message,
                 bot_response=f'Error creating AI model: {str(e)}',
                 response_time=response_time,
@@ -551,11 +588,33 @@ def chatbot_api(request):
             }, status=500)
         
         try:
-            # Prepare the full message with system prompt from database
-            full_message = f"{config.system_prompt}\n\nUser: {user_message}\n\nAssistant:"
+            # Prepare the full message with system prompt from database and the session history
+            full_message = build_chatbot_prompt(
+                config.system_prompt, user_message, context, session.summary, session.turns
+            )
+            prompt_tokens = estimate_tokens(full_message)
             
-            # Generate response
-            response = model.generate_content(full_message)
+            # Answer from the catalog straight away while Gemini is failing
+            if not gemini_breaker.allow():
+                return JsonResponse({'response': _offline_fallback(
+                    config, user_message, start_time,
+                    get_client_ip(request), request.META.get('HTTP_USER_AGENT', '')
+                ), 'session': session.client_token})
+            
+            # Generate response, holding one of the worker's upstream call slots
+            slot = upstream_slots.acquire()
+            if not slot:
+                gemini_breaker.release_trial()
+                return too_many_requests(UPSTREAM_BUSY_MESSAGE, retry_after=1)
+            try:
+                response = model.generate_content(full_message, request_options=upstream_request_options())
+            except Exception:
+                gemini_breaker.record_failure()
+                raise
+            else:
+                gemini_breaker.record_success()
+            finally:
+                upstream_slots.release(slot)
             
             # Calculate response time
             response_time = time.time() - start_time
@@ -566,59 +625,59 @@ def chatbot_api(request):
                 
                 # Clean up the response text
                 cleaned_text = clean_chatbot_response(text)
+                if cache_key:
+                    response_cache.set(cache_key, cleaned_text)
+                session.add_turn(user_message, cleaned_text)
                 
                 # Log successful conversation
-                ChatbotConversation.objects.create(
+                conversation_logger.log(
                     user_message=user_message,
                     bot_response=cleaned_text,
                     response_time=response_time,
                     success=True,
+                    session=_saved_session(session),
+                    prompt_tokens=prompt_tokens,
                     ip_address=get_client_ip(request),
                     user_agent=request.META.get('HTTP_USER_AGENT', '')
                 )
                 
-                return JsonResponse({'response': cleaned_text})
+                return JsonResponse({'response': cleaned_text, 'session': session.client_token})
             else:
                 # Log failed conversation
-                ChatbotConversation.objects.create(
+                conversation_logger.log(
                     user_message=user_message,
                     bot_response='Sorry, I received an empty response. Please try again.',
                     response_time=response_time,
                     success=False,
                     error_message='Empty response from AI model',
+                    session=_saved_session(session),
+                    prompt_tokens=prompt_tokens,
                     ip_address=get_client_ip(request),
                     user_agent=request.META.get('HTTP_USER_AGENT', '')
                 )
-                return JsonResponse({'response': 'Sorry, I received an empty response. Please try again.'})
+                return JsonResponse({
+                    'response': 'Sorry, I received an empty response. Please try again.',
+                    'session': session.client_token
+                })
                 
         except Exception as e:
             print(f"Error generating content: {e}")
             response_time = time.time() - start_time
             
             # Log failed conversation
-            ChatbotConversation.objects.create(
+            conversation_logger.log(
                 user_message=user_message,
                 bot_response=f'Sorry, I encountered an error: {str(e)}',
                 response_time=response_time,
                 success=False,
                 error_message=str(e),
+                session=_saved_session(session),
                 ip_address=get_client_ip(request),
                 user_agent=request.META.get('HTTP_USER_AGENT', '')
             )
             
             # Handle specific quota errors
-            if "429" in str(e) or "quota" in str(e).lower():
-                return JsonResponse({
-                    'response': 'I\'m currently experiencing high demand. Please wait a moment and try again, or contact support if this persists.'
-                })
-            elif "400" in str(e) or "invalid" in str(e).lower():
-                return JsonResponse({
-                    'response': 'I encountered an issue with your request. Please try rephrasing your question.'
-                })
-            else:
-                return JsonResponse({
-                    'response': f'Sorry, I encountered an error: {str(e)}. Please try again or check the server logs.'
-                })
+            return JsonResponse({'response': chatbot_error_message(e), 'session': session.client_token})
 
     except Exception as e:
         import traceback
@@ -627,7 +686,7 @@ def chatbot_api(request):
         
         # Log failed conversation
         response_time = time.time() - start_time
-        ChatbotConversation.objects.create(
+        conversation_logger.log(
             user_message=user_message if 'user_message' in locals() else 'Unknown',
             bot_response=f'Sorry, I encountered an error: {str(e)}',
             response_time=response_time,
@@ -642,23 +701,349 @@ def chatbot_api(request):
         }, status=500)
 
 
+def _release_once(release):
+    """Wrap release so only the first of several callers runs it"""
+    lock = threading.Lock()
+    pending = [True]
+
+    def release_once():
+        with lock:
+            if not pending[0]:
+                return
+            pending[0] = False
+        release()
+    return release_once
+
+
+class _ClosingStream:
+    """Streaming response body that releases the upstream slot when the response is closed.
+
+    Django closes a streaming body along with its response, including one that
+    was never iterated, when a generator's own finally block never runs.
+    """
+
+    def __init__(self, chunks, generator, release):
+        self.chunks = chunks
+        self.generator = generator
+        self.release = release
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        try:
+            self.generator.close()
+        finally:
+            self.release()
+
+
+class _AsyncClosingStream(_ClosingStream):
+    """_ClosingStream over an async iterator, for ASGI"""
+
+    __iter__ = None
+
+    def __aiter__(self):
+        return self.chunks.__aiter__()
+
+
+def _stream_chatbot_events(model, prompt, user_message, session, cache_key, start_time, ip_address, user_agent,
+                           release_slot):
+    """Generate SSE events for a streamed Gemini reply and log the conversation.
+
+    The caller must hold an upstream slot; release_slot is called when the
+    stream ends, and must also be called when the response is closed (see
+    _ClosingStream), since a client that disconnects before the first chunk
+    never starts this generator.
+    """
+    first_token_time = None
+    chunks = []
+
+    try:
+        try:
+            response = model.generate_content(prompt, stream=True, request_options=upstream_request_options())
+
+            for chunk in response:
+                text = chunk_text(chunk)
+                if not text:
+                    continue
+                if first_token_time is None:
+                    first_token_time = time.time() - start_time
+                chunks.append(text)
+                yield sse_event('chunk', {'text': text})
+        except Exception:
+            gemini_breaker.record_failure()
+            raise
+        else:
+            gemini_breaker.record_success()
+
+        response_time = time.time() - start_time
+        text = ''.join(chunks).strip()
+
+        if text:
+            # Send the cleaned full reply so the client can replace the raw chunks
+            cleaned_text = clean_chatbot_response(text)
+            if cache_key:
+                response_cache.set(cache_key, cleaned_text)
+            session.add_turn(user_message, cleaned_text)
+            conversation_logger.log(
+                user_message=user_message,
+                bot_response=cleaned_text,
+                response_time=response_time,
+                first_token_time=first_token_time,
+                success=True,
+                session=_saved_session(session),
+                prompt_tokens=estimate_tokens(prompt),
+                ip_address=ip_address,
+                user_agent=user_agent
+            )
+            yield sse_event('done', {'response': cleaned_text, 'session': session.client_token})
+        else:
+            conversation_logger.log(
+                user_message=user_message,
+                bot_response='Sorry, I received an empty response. Please try again.',
+                response_time=response_time,
+                first_token_time=first_token_time,
+                success=False,
+                error_message='Empty response from AI model',
+                session=_saved_session(session),
+                prompt_tokens=estimate_tokens(prompt),
+                ip_address=ip_address,
+                user_agent=user_agent
+            )
+            yield sse_event('done', {
+                'response': 'Sorry, I received an empty response. Please try again.',
+                'session': session.client_token
+            })
+
+    except Exception as e:
+        print(f"Error streaming content: {e}")
+        conversation_logger.log(
+            user_message=user_message,
+            bot_response=f'Sorry, I encountered an error: {str(e)}',
+            response_time=time.time() - start_time,
+            first_token_time=first_token_time,
+            success=False,
+            error_message=str(e),
+            session=_saved_session(session),
+            prompt_tokens=estimate_tokens(prompt),
+            ip_address=ip_address,
+            user_agent=user_agent
+        )
+        yield sse_event('error', {'response': chatbot_error_message(e), 'session': session.client_token})
+
+    finally:
+        release_slot()
+
+
+def _load_chat_session(token):
+    """Chat session for the client's token, or a new unsaved one.
+
+    New sessions are only written once a follow-up turn completes, so one-off
+    questions and failed first messages do not leave session rows behind.
+    """
+    if token:
+        return ChatSession.from_client_token(str(token))
+    return ChatSession()
+
+
+def _saved_session(session):
+    """Session to attach to a conversation log row, or None if it was never saved"""
+    return None if session._state.adding else session
+
+
+def _offline_fallback(config, user_message, start_time, ip_address, user_agent):
+    """Build and log the catalog fallback reply served while the circuit breaker is open"""
+    fallback = offline_fallback_answer(config.system_prompt, user_message)
+    conversation_logger.log(
+        user_message=user_message,
+        bot_response=fallback,
+        response_time=time.time() - start_time,
+        success=False,
+        error_message='Gemini circuit breaker open; served offline fallback',
+        ip_address=ip_address,
+        user_agent=user_agent
+    )
+    return fallback
+
+
+async def _iterate_in_thread(iterator):
+    """Drive a blocking iterator from the ASGI event loop one item at a time"""
+    sentinel = object()
+    while True:
+        item = await sync_to_async(next)(iterator, sentinel)
+        if item is sentinel:
+            break
+        yield item
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@chatbot_rate_limit
+def chatbot_stream_api(request):
+    """Chatbot streaming endpoint - relays Gemini output as Server-Sent Events"""
+    start_time = time.time()
+
+    try:
+        data = json.loads(request.body)
+        user_message = data.get('message', '').strip()
+    except (ValueError, AttributeError):
+        return JsonResponse({'response': 'Invalid request.'}, status=400)
+
+    if not user_message:
+        return JsonResponse({'response': 'Please enter a message.'})
+
+    config = ChatbotConfig.objects.first()
+    if not config or not config.gemini_api_key:
+        return JsonResponse({
+            'response': 'The AI assistant is not configured yet. Please ask an admin to set the Gemini API key in the Chatbot settings.'
+        })
+
+    model_id = config.gemini_model or 'gemini-1.5-flash'
+    ip_address = get_client_ip(request)
+    user_agent = request.META.get('HTTP_USER_AGENT', '')
+    context = grounding_context(user_message)
+    session = _load_chat_session(data.get('session'))
+
+    # Serve repeated opening questions from the response cache in a single event
+    cache_key = None
+    if not session.turns and not session.summary:
+        cache_key = response_cache.make_key(model_id, config.system_prompt + context, user_message)
+        cached_text = response_cache.get(cache_key)
+        if cached_text is not None:
+            response_time = time.time() - start_time
+            session.add_turn(user_message, cached_text)
+            conversation_logger.log(
+                user_message=user_message,
+                bot_response=cached_text,
+                response_time=response_time,
+                first_token_time=response_time,
+                success=True,
+                cache_hit=True,
+                session=_saved_session(session),
+                ip_address=ip_address,
+                user_agent=user_agent
+            )
+            return HttpResponse(
+                sse_event('done', {'response': cached_text, 'session': session.client_token}),
+                content_type='text/event-stream'
+            )
+
+    # Answer from the catalog straight away while Gemini is failing
+    if not gemini_breaker.allow():
+        fallback = _offline_fallback(config, user_message, start_time, ip_address, user_agent)
+        return HttpResponse(
+            sse_event('done', {'response': fallback, 'session': session.client_token}),
+            content_type='text/event-stream'
+        )
+
+    # A half-open trial granted above must be handed back if the call is not made
+    slot = upstream_slots.acquire()
+    if not slot:
+        gemini_breaker.release_trial()
+        return too_many_requests(UPSTREAM_BUSY_MESSAGE, retry_after=1)
+
+    release_slot = _release_once(lambda: upstream_slots.release(slot))
+    try:
+        model = gemini_clients.get_model(config.gemini_api_key, model_id)
+    except Exception as e:
+        release_slot()
+        # Also hands back a half-open trial granted above
+        gemini_breaker.record_failure()
+        print(f"Error creating model: {e}")
+        conversation_logger.log(
+            user_message=user_message,
+            bot_response=f'Error creating AI model: {str(e)}',
+            response_time=time.time() - start_time,
+            success=False,
+            error_message=str(e),
+            session=_saved_session(session),
+            ip_address=ip_address,
+            user_agent=user_agent
+        )
+        return HttpResponse(
+            sse_event('error', {'response': chatbot_error_message(e), 'session': session.client_token}),
+            content_type='text/event-stream'
+        )
+
+    events = _stream_chatbot_events(
+        model, build_chatbot_prompt(config.system_prompt, user_message, context, session.summary, session.turns),
+        user_message, session, cache_key, start_time, ip_address, user_agent, release_slot
+    )
+
+    # Under ASGI an async iterator lets each chunk flush as soon as Gemini sends it;
+    # a sync iterator would be buffered in full by Django before sending.
+    if isinstance(request, ASGIRequest):
+        body = _AsyncClosingStream(_iterate_in_thread(events), events, release_slot)
+    else:
+        body = _ClosingStream(events, events, release_slot)
+
+    response = StreamingHttpResponse(body, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def increment_clicks(request):
     """API endpoint to increment learn more clicks"""
     try:
         data = json.loads(request.body)
-        crime_id = data.get('crime_id')
-        
-        crime = get_object_or_404(CyberCrime, id=crime_id)
-        crime.learn_more_clicks += 1
-        crime.save()
+        crime_id = uuid.UUID(str(data.get('crime_id')))
+        if not crime_exists(crime_id):
+            return JsonResponse({'success': False, 'error': 'Crime not found.'}, status=404)
+        # Counted in memory and flushed in bulk
+        click_counter.increment(crime_id, visitor=visitor_fingerprint(request))
         
         return JsonResponse({'success': True})
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
 
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def events_api(request):
+    """Batched analytics events (learn-more clicks, crime page views, chatbot opens) sent with sendBeacon"""
+    events, errors = parse_events(request.body)
+    if errors:
+        return JsonResponse({'success': False, 'errors': errors}, status=400)
+    counted = apply_events(events, visitor_fingerprint(request))
+    return JsonResponse({'success': True, 'received': len(events), 'counted': counted})
+
+
+def _live_since(request):
+    """Minute the dashboard started counting from (its `since` parameter), or now"""
+    try:
+        return int(request.GET.get('since', ''))
+    except ValueError:
+        return current_minute()
+
+
+@login_required
+def admin_live_activity(request):
+    """Live activity counts for the admin dashboard and chatbot pages as JSON, polled under WSGI"""
+    response = JsonResponse(live_board.snapshot(_live_since(request)))
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@login_required
+def admin_live_stream(request):
+    """Server-Sent Events with live activity counts, served only under ASGI.
+
+    Under WSGI an open stream would hold a worker for as long as the page is
+    open, so it answers 204 No Content, which tells EventSource not to
+    reconnect, and the page polls admin_live_activity instead.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    response = StreamingHttpResponse(LiveStream(_live_since(request)), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 def customize_bot(request):
     """Customize bot configuration page"""
@@ -3,6 +3,8 @@ class Chatbot {
     constructor() {
         this.isOpen = false;
         this.messages = [];
+        // Server-side chat session, so follow-up questions keep their context
+        this.sessionToken = sessionStorage.getItem('cysafeChatSession');
         this.init();
     }
 
@@ -102,6 +104,7 @@ How can I assist you today?`,
         const widget = document.getElementById('chatbot-widget');
         widget.style.display = 'flex';
         this.isOpen = true;
+        analytics.track('chatbot_open');
         widget.classList.add('fade-in-up');
         document.getElementById('chatbot-input').focus();
     }
@@ -136,24 +139,55 @@ How can I assist you today?`,
 
     async sendToBackend(message) {
         try {
-            const response = await fetch('/api/chatbot/', {
+            const response = await fetch('/api/chatbot/stream/', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                     'X-CSRFToken': this.getCSRFToken()
                 },
-                body: JSON.stringify({ message: message })
+                body: JSON.stringify({ message: message, session: this.sessionToken })
             });
 
-            const data = await response.json();
-            
-            // Remove typing indicator
-            this.removeTypingIndicator();
+            const contentType = response.headers.get('Content-Type') || '';
+
+            // Validation and configuration replies come back as plain JSON
+            if (!contentType.includes('text/event-stream') || !response.body) {
+                const data = await response.json();
+                this.saveSession(data.session);
+                this.removeTypingIndicator();
+                this.addMessage({
+                    type: 'bot',
+                    text: data.response,
+                    timestamp: new Date()
+                });
+                return;
+            }
 
-            // Add bot response
-            this.addMessage({
+            let streamedText = '';
+            let content = null;
+
+            await readEventStream(response, (event, data) => {
+                if (!content) {
+                    // Swap the typing indicator for the reply bubble on the first event
+                    this.removeTypingIndicator();
+                    content = this.renderStreamingMessage();
+                }
+
+                if (event === 'chunk') {
+                    streamedText += data.text;
+                    content.innerHTML = this.formatBotMessage(streamedText);
+                } else {
+                    streamedText = data.response;
+                    content.innerHTML = this.formatBotMessage(streamedText);
+                    this.saveSession(data.session);
+                }
+                this.scrollToBottom();
+            });
+
+            this.removeTypingIndicator();
+            this.messages.push({
                 type: 'bot',
-                text: data.response,
+                text: streamedText,
                 timestamp: new Date()
             });
 
@@ -168,6 +202,26 @@ How can I assist you today?`,
         }
     }
 
+    saveSession(token) {
+        if (token) {
+            this.sessionToken = token;
+            sessionStorage.setItem('cysafeChatSession', token);
+        }
+    }
+
+    renderStreamingMessage() {
+        const messagesContainer = document.getElementById('chatbot-messages');
+        const messageDiv = document.createElement('div');
+        messageDiv.className = 'message bot';
+
+        const content = document.createElement('div');
+        content.className = 'message-content';
+
+        messageDiv.appendChild(content);
+        messagesContainer.appendChild(messageDiv);
+        return content;
+    }
+
     addMessage(message) {
         this.messages.push(message);
         this.renderMessage(message);
@@ -244,38 +298,90 @@ How can I assist you today?`,
     }
 }
 
+// Analytics events are queued and sent in batches: every few seconds, when the queue
+// fills up, and when the page is hidden (navigating away, switching tabs, closing)
+const analytics = {
+    endpoint: '/api/events/',
+    maxBatch: 100,
+    interval: 10000,
+    queue: [],
+
+    track(type, data = {}) {
+        this.queue.push({ type, ...data });
+        if (this.queue.length >= this.maxBatch) {
+            this.flush();
+        }
+    },
+
+    flush() {
+        while (this.queue.length) {
+            const body = JSON.stringify({ events: this.queue.splice(0, this.maxBatch) });
+            // sendBeacon survives page unloads; fall back to a keepalive fetch where it is missing or refused
+            if (navigator.sendBeacon && navigator.sendBeacon(this.endpoint, new Blob([body], { type: 'application/json' }))) {
+                continue;
+            }
+            fetch(this.endpoint, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body,
+                keepalive: true
+            }).catch(error => {
+                console.error('Error sending analytics events:', error);
+            });
+        }
+    }
+};
+
+setInterval(() => analytics.flush(), analytics.interval);
+document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'hidden') {
+        analytics.flush();
+    }
+});
+window.addEventListener('pagehide', () => analytics.flush());
+
 // Utility functions
 function incrementClicks(crimeId) {
-    // Prevent multiple rapid clicks
-    if (window.clickInProgress && window.clickInProgress === crimeId) {
-        return;
-    }
-    
-    window.clickInProgress = crimeId;
-    
-    fetch('/api/increment-clicks/', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-            'X-CSRFToken': getCSRFToken()
-        },
-        body: JSON.stringify({ crime_id: crimeId })
-    })
-    .then(response => response.json())
-    .then(data => {
-        if (data.success) {
-            console.log('Clicks incremented successfully');
+    // Sent with the next batch; the server ignores repeat clicks by the same visitor
+    analytics.track('click', { crime_id: crimeId });
+}
+
+function trackEvent(type, data) {
+    analytics.track(type, data);
+}
+
+// Read a fetch() response body as Server-Sent Events, calling onEvent(event, data)
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    data += line.slice(5).trim();
+                }
+            });
+
+            if (data) {
+                onEvent(event, JSON.parse(data));
+            }
         }
-    })
-    .catch(error => {
-        console.error('Error incrementing clicks:', error);
-    })
-    .finally(() => {
-        // Reset after a short delay to prevent rapid clicking
-        setTimeout(() => {
-            window.clickInProgress = null;
-        }, 1000);
-    });
+    }
 }
 
 function getCSRFToken() {
@@ -326,6 +432,78 @@ function filterCrimes() {
     });
 }
 
+// Typeahead suggestions from the server-side crime index
+function initCrimeSuggest(searchInput) {
+    const list = document.createElement('div');
+    list.className = 'list-group position-absolute w-100 shadow-sm d-none';
+    list.style.top = '100%';
+    list.style.zIndex = '1000';
+    searchInput.parentElement.classList.add('position-relative');
+    searchInput.parentElement.appendChild(list);
+
+    let timer = null;
+    let controller = null;
+
+    const hide = () => list.classList.add('d-none');
+
+    const runSearch = () => {
+        const params = new URLSearchParams();
+        if (searchInput.value.trim()) params.set('search', searchInput.value.trim());
+        const category = document.getElementById('category-filter')?.value;
+        if (category) params.set('category', category);
+        window.location.search = params.toString();
+    };
+
+    searchInput.addEventListener('input', () => {
+        clearTimeout(timer);
+        const query = searchInput.value.trim();
+        if (!query) {
+            hide();
+            return;
+        }
+
+        timer = setTimeout(async () => {
+            if (controller) controller.abort();
+            controller = new AbortController();
+            try {
+                const response = await fetch(`/api/crimes/suggest/?q=${encodeURIComponent(query)}`, {
+                    signal: controller.signal
+                });
+                const data = await response.json();
+
+                list.innerHTML = '';
+                data.results.forEach(result => {
+                    const item = document.createElement('a');
+                    item.className = 'list-group-item list-group-item-action d-flex justify-content-between align-items-center';
+                    item.href = result.url;
+                    item.textContent = result.type;
+                    const badge = document.createElement('small');
+                    badge.className = 'text-muted ms-2';
+                    badge.textContent = result.category_display;
+                    item.appendChild(badge);
+                    list.appendChild(item);
+                });
+                list.classList.toggle('d-none', data.results.length === 0);
+            } catch (error) {
+                if (error.name !== 'AbortError') {
+                    console.error('Error loading suggestions:', error);
+                }
+            }
+        }, 150);
+    });
+
+    searchInput.addEventListener('keydown', event => {
+        if (event.key === 'Enter') {
+            event.preventDefault();
+            runSearch();
+        } else if (event.key === 'Escape') {
+            hide();
+        }
+    });
+    searchInput.addEventListener('blur', () => setTimeout(hide, 200));
+    searchInput.parentElement.querySelector('.search-btn')?.addEventListener('click', runSearch);
+}
+
 // Initialize when DOM is loaded
 document.addEventListener('DOMContentLoaded', function() {
     // Initialize chatbot
@@ -335,6 +513,7 @@ document.addEventListener('DOMContentLoaded', function() {
     const searchInput = document.getElementById('search-input');
     if (searchInput) {
         searchInput.addEventListener('input', filterCrimes);
+        initCrimeSuggest(searchInput);
     }
 
     const categoryFilter = document.getElementById('category-filter');
@@ -391,6 +570,8 @@ document.addEventListener('DOMContentLoaded', function() {
 
 // Export functions for global access
 window.incrementClicks = incrementClicks;
+window.trackEvent = trackEvent;
 window.addFormField = addFormField;
 window.removeFormField = removeFormField;
-window.filterCrimes = filterCrimes; 
\ No newline at end of file
+window.filterCrimes = filterCrimes;
+window.readEventStream = readEventStream; 
\ No newline at end of file